@@ -1,10 +1,19 @@
-import random
+import asyncio
+import struct
+import time
 
-from aiocache import caches, Cache
+from aiocache import caches
+from aiocache.base import BaseCache
 from aiocache.serializers import JsonSerializer
+from collections import OrderedDict
+from decimal import Decimal
+from functools import partial
 
 import app.config
-from typing import ClassVar
+from app.memcached import ShardedMemcachedCache
+from typing import Any, Awaitable, Callable, ClassVar, Dict, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
 
 
 # Special token representing a cached None value.
@@ -40,15 +49,255 @@ class JsonSerializerWithNoneToken(JsonSerializer):
             return super().loads(value)
 
 
+class _UnsupportedValue(Exception):
+    pass
+
+
+class BinarySerializer(JsonSerializer):
+    """
+    Serializes cached candidate sets and metrics rows to a compact binary format, which is smaller in memcached and
+    faster to load than json. Candidate sets store item ids and feed ids as packed int64 arrays, and publishers as
+    indexes into a list of distinct publishers. Metrics rows store their counts as fixed-width float64 columns.
+    Other values are stored as json.
+
+    Like JsonSerializerWithNoneToken, None is cached and loaded as NoneValue. Every value starts with FORMAT_VERSION.
+    Values with a different version, e.g. values cached by a previous release, are loaded as None, which aiocache
+    treats as a cache miss.
+    """
+
+    DEFAULT_ENCODING = None
+    FORMAT_VERSION = 1
+
+    _NONE = 0
+    _JSON = 1
+    _CANDIDATE_SET_ENTRY = 2
+    _METRICS_ROW = 3
+
+    # Format version and kind of value.
+    _HEADER = struct.Struct('<BB')
+    # Refresh time and number of items of a candidate set entry.
+    _ENTRY_HEADER = struct.Struct('<dI')
+    # Created time, version, number of candidates, feed ids flag, and the lengths of the id and publishers of a
+    # candidate set item, followed by the id, NUL-separated publishers, item ids, publisher indexes and feed ids.
+    _ITEM_HEADER = struct.Struct('<qqIBII')
+    _NO_FEED_IDS = 0
+    _ALL_FEED_IDS = 1
+    _SOME_FEED_IDS = 2
+    # Counts, timestamps, and the lengths of the primary key name and value of a metrics row, followed by the primary
+    # key name and value.
+    _METRICS_ROW_HEADER = struct.Struct('<8d2qII')
+
+    # Stands in for absent optional integers, such as feed ids and timestamps.
+    _ABSENT = -2 ** 63
+    _METRICS_COUNTS = (
+        'trailing_1_day_opens', 'trailing_1_day_impressions',
+        'trailing_7_day_opens', 'trailing_7_day_impressions',
+        'trailing_14_day_opens', 'trailing_14_day_impressions',
+        'trailing_28_day_opens', 'trailing_28_day_impressions',
+    )
+    _METRICS_TIMESTAMPS = ('created_at', 'expires_at')
+    _METRICS_FIELDS = frozenset(_METRICS_COUNTS + _METRICS_TIMESTAMPS)
+
+    def dumps(self, value) -> bytes:
+        """
+        :return: value serialized to bytes
+        """
+        if value is None or value == NoneValue:
+            return self._HEADER.pack(self.FORMAT_VERSION, self._NONE)
+
+        try:
+            if isinstance(value, dict) and 'refresh_at' in value:
+                return self._HEADER.pack(self.FORMAT_VERSION, self._CANDIDATE_SET_ENTRY) + \
+                    self._dump_candidate_set_entry(value)
+            elif isinstance(value, dict) and 'trailing_28_day_impressions' in value:
+                return self._HEADER.pack(self.FORMAT_VERSION, self._METRICS_ROW) + self._dump_metrics_row(value)
+        except _UnsupportedValue:
+            pass
+
+        return self._HEADER.pack(self.FORMAT_VERSION, self._JSON) + super().dumps(value).encode()
+
+    def loads(self, value: Optional[bytes]):
+        """
+        :return: NoneValue if None was cached, None if value is None or has a different format version, otherwise
+                 the deserialized value
+        """
+        if value is None or len(value) < self._HEADER.size:
+            return None
+
+        version, kind = self._HEADER.unpack_from(value)
+        if version != self.FORMAT_VERSION:
+            return None
+
+        if kind == self._METRICS_ROW:
+            return self._load_metrics_row(value, self._HEADER.size)
+        elif kind == self._CANDIDATE_SET_ENTRY:
+            return self._load_candidate_set_entry(value, self._HEADER.size)
+        elif kind == self._NONE:
+            return NoneValue
+        elif kind == self._JSON:
+            return super().loads(value[self._HEADER.size:].decode())
+        else:
+            return None
+
+    @classmethod
+    def _to_int(cls, value) -> int:
+        """
+        :return: value as int, if it's an integer that fits in an int64, e.g. a Decimal returned by DynamoDB
+        """
+        if type(value) is not int:
+            if not isinstance(value, Decimal) or not value.is_finite() or value != int(value):
+                raise _UnsupportedValue()
+            value = int(value)
+        if not cls._ABSENT < value < 2 ** 63:
+            raise _UnsupportedValue()
+        return value
+
+    @classmethod
+    def _to_optional_int(cls, value) -> int:
+        return cls._ABSENT if value is None else cls._to_int(value)
+
+    @staticmethod
+    def _encode(value) -> bytes:
+        if not isinstance(value, str):
+            raise _UnsupportedValue()
+        return value.encode()
+
+    def _dump_candidate_set_entry(self, entry: dict) -> bytes:
+        """
+        Dumps an entry of DynamoDBCandidateSet._query_cache_entry, which contains the candidate set items.
+        """
+        if entry.keys() != {'value', 'refresh_at'} \
+                or not isinstance(entry['value'], dict) or entry['value'].keys() != {'Items'} \
+                or not isinstance(entry['value']['Items'], list) or not isinstance(entry['refresh_at'], (int, float)):
+            raise _UnsupportedValue()
+
+        items = entry['value']['Items']
+        chunks = [self._ENTRY_HEADER.pack(entry['refresh_at'], len(items))]
+        for item in items:
+            if not isinstance(item, dict) or not {'id', 'candidates', 'version'} <= item.keys() \
+                    or not item.keys() <= {'id', 'candidates', 'version', 'created_at'} \
+                    or not isinstance(item['candidates'], list):
+                raise _UnsupportedValue()
+
+            candidates = item['candidates']
+            if not all(isinstance(c, dict) and {'item_id', 'publisher'} <= c.keys()
+                       and c.keys() <= {'item_id', 'publisher', 'feed_id'} for c in candidates):
+                raise _UnsupportedValue()
+
+            publisher_indexes = {}
+            for candidate in candidates:
+                publisher_indexes.setdefault(candidate['publisher'], len(publisher_indexes))
+            if not all(isinstance(p, str) and '\0' not in p for p in publisher_indexes):
+                raise _UnsupportedValue()
+            publishers = '\0'.join(publisher_indexes).encode()
+
+            feed_ids = [self._to_optional_int(c.get('feed_id')) for c in candidates]
+            absent_feed_ids = feed_ids.count(self._ABSENT)
+            if absent_feed_ids == len(feed_ids):
+                feed_ids_flag = self._NO_FEED_IDS
+            elif absent_feed_ids == 0:
+                feed_ids_flag = self._ALL_FEED_IDS
+            else:
+                feed_ids_flag = self._SOME_FEED_IDS
+
+            cs_id = self._encode(item['id'])
+            n = len(candidates)
+            chunks.append(self._ITEM_HEADER.pack(
+                self._to_optional_int(item.get('created_at')),
+                self._to_int(item['version']),
+                n,
+                feed_ids_flag,
+                len(cs_id),
+                len(publishers)))
+            chunks.append(cs_id)
+            chunks.append(publishers)
+            chunks.append(struct.pack(f'<{n}q', *(self._to_int(c['item_id']) for c in candidates)))
+            chunks.append(struct.pack(f'<{n}I', *(publisher_indexes[c['publisher']] for c in candidates)))
+            if feed_ids_flag != self._NO_FEED_IDS:
+                chunks.append(struct.pack(f'<{n}q', *feed_ids))
+
+        return b''.join(chunks)
+
+    def _load_candidate_set_entry(self, data: bytes, offset: int) -> Dict[str, Any]:
+        refresh_at, item_count = self._ENTRY_HEADER.unpack_from(data, offset)
+        offset += self._ENTRY_HEADER.size
+
+        items = []
+        for _ in range(item_count):
+            created_at, version, n, feed_ids_flag, id_size, publishers_size = \
+                self._ITEM_HEADER.unpack_from(data, offset)
+            offset += self._ITEM_HEADER.size
+            cs_id = data[offset:offset + id_size].decode()
+            offset += id_size
+            publishers = data[offset:offset + publishers_size].decode().split('\0')
+            offset += publishers_size
+            item_ids = struct.unpack_from(f'<{n}q', data, offset)
+            offset += 8 * n
+            publisher_indexes = struct.unpack_from(f'<{n}I', data, offset)
+            offset += 4 * n
+
+            if feed_ids_flag == self._NO_FEED_IDS:
+                candidates = [{'item_id': item_id, 'publisher': publishers[p]}
+                              for item_id, p in zip(item_ids, publisher_indexes)]
+            else:
+                feed_ids = struct.unpack_from(f'<{n}q', data, offset)
+                offset += 8 * n
+                candidates = [{'item_id': item_id, 'publisher': publishers[p], 'feed_id': feed_id}
+                              for item_id, p, feed_id in zip(item_ids, publisher_indexes, feed_ids)]
+                if feed_ids_flag == self._SOME_FEED_IDS:
+                    for candidate in candidates:
+                        if candidate['feed_id'] == self._ABSENT:
+                            del candidate['feed_id']
+
+            item = {'id': cs_id, 'candidates': candidates, 'version': version}
+            if created_at != self._ABSENT:
+                item['created_at'] = created_at
+            items.append(item)
+
+        return {'value': {'Items': items}, 'refresh_at': refresh_at}
+
+    def _dump_metrics_row(self, row: dict) -> bytes:
+        """
+        Dumps a metrics row, which has all count fields, optional timestamps, and a single string primary key.
+        """
+        primary_keys = [key for key in row if key not in self._METRICS_FIELDS]
+        if len(primary_keys) != 1 or not all(field in row for field in self._METRICS_COUNTS):
+            raise _UnsupportedValue()
+        primary_key = self._encode(primary_keys[0])
+        primary_key_value = self._encode(row[primary_keys[0]])
+
+        counts = [row[field] for field in self._METRICS_COUNTS]
+        if not all(isinstance(count, (int, float, Decimal)) and not isinstance(count, bool) for count in counts):
+            raise _UnsupportedValue()
+
+        return self._METRICS_ROW_HEADER.pack(
+            *map(float, counts),
+            *(self._to_optional_int(row.get(field)) for field in self._METRICS_TIMESTAMPS),
+            len(primary_key),
+            len(primary_key_value)) + primary_key + primary_key_value
+
+    def _load_metrics_row(self, data: bytes, offset: int) -> Dict[str, Any]:
+        *counts, created_at, expires_at, key_size, value_size = self._METRICS_ROW_HEADER.unpack_from(data, offset)
+        offset += self._METRICS_ROW_HEADER.size
+
+        row = dict(zip(self._METRICS_COUNTS, counts))
+        row[data[offset:offset + key_size].decode()] = data[offset + key_size:offset + key_size + value_size].decode()
+        if created_at != self._ABSENT:
+            row['created_at'] = created_at
+        if expires_at != self._ABSENT:
+            row['expires_at'] = expires_at
+        return row
+
+
 def get_cache_config(serializer_class: ClassVar):
-    # aiocache doesn't support data partitioning. It only accepts a single server for Memcached and Redis.
-    server = random.choice(app.config.elasticache['servers'])
-    endpoint, port = server.split(':')
+    # aiocache only accepts a single Memcached server, so keys are spread over all servers by ShardedMemcachedCache.
+    servers = [tuple(server.split(':')) for server in app.config.elasticache['servers']]
 
     return {
-        'cache': Cache.MEMCACHED,
-        'endpoint': endpoint,
-        'port': port,
+        'cache': ShardedMemcachedCache,
+        'servers': servers,
+        'retry_interval': app.config.elasticache['dead_server_retry_interval'],
+        'server_timeout': app.config.elasticache['server_timeout'],
         'serializer': {
             'class': serializer_class,
         },
@@ -62,5 +311,153 @@ metrics_alias = 'metrics_cache'
 
 
 def initialize_caches():
-    caches.add(candidate_set_alias, get_cache_config(serializer_class=JsonSerializer))
-    caches.add(metrics_alias, get_cache_config(serializer_class=JsonSerializerWithNoneToken))
+    caches.add(candidate_set_alias, get_cache_config(serializer_class=BinarySerializer))
+    caches.add(metrics_alias, get_cache_config(serializer_class=BinarySerializer))
+
+
+class LocalTTLCache:
+    """
+    In-process cache with a least recently used eviction policy, where values expire `ttl` seconds after they're set.
+    Values are not shared between workers, and are not serialized, so this is suited for small, frequently read
+    values that are expensive to fetch or compute.
+
+    `hits` and `misses` count the calls to get() that did and didn't find a value.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        """
+        :param maxsize: maximum number of values, 0 disables the cache
+        :param ttl: time in seconds after which values expire
+        :param clock: function that returns the current time in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._values: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        :return: the value for key, or default if it's not in the cache or has expired
+        """
+        entry = self._values.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._values[key]
+            self.misses += 1
+            return default
+
+        self._values.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+
+        self._values[key] = (self._clock() + self.ttl, value)
+        self._values.move_to_end(key)
+        if len(self._values) > self.maxsize:
+            self._values.popitem(last=False)
+
+    def clear(self):
+        self._values.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        """
+        :return: True if key has a value that hasn't expired. Unlike get(), this doesn't count as a hit or miss.
+        """
+        entry = self._values.get(key)
+        return entry is not None and entry[0] > self._clock()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key within a worker, such that only the first caller fetches a value, and
+    concurrent callers await the same result. This prevents a burst of identical requests to a database when a
+    cached value expires.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fetch: Callable[[], Awaitable[T]]) -> T:
+        """
+        :param key: identifies the value being fetched
+        :param fetch: function that fetches the value, called unless a call for key is in flight
+        :return: the result of the call for key that is in flight, or of a new call to fetch
+        """
+        # Shield the call, such that a cancelled caller doesn't cancel it for the other callers.
+        return await asyncio.shield(self.start(key, fetch))
+
+    def start(self, key: Hashable, fetch: Callable[[], Awaitable[T]]) -> 'asyncio.Future[T]':
+        """
+        Starts a call to fetch in the background, unless a call for key is in flight.
+
+        :return: the call for key that is in flight
+        """
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fetch())
+            self._calls[key] = future
+            future.add_done_callback(partial(self._remove, key))
+
+        return future
+
+    def _remove(self, key: Hashable, future: asyncio.Future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+async def fetch_with_lock(
+        cache: BaseCache,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        ttl: int,
+        lock_ttl: int,
+        poll_interval: float = 0.05) -> Any:
+    """
+    Fetches a value that is missing from cache, and caches it. If lock_ttl is positive, a lock in the cache ensures
+    that only one caller across all workers fetches the value at a time. Other callers wait for the value to be
+    cached for up to lock_ttl seconds, and then fetch it themselves.
+
+    :param cache: shared cache, e.g. memcached
+    :param key: cache key of the value
+    :param fetch: function that fetches the value
+    :param ttl: time in seconds to cache the value
+    :param lock_ttl: time in seconds after which the lock expires if its holder fails, 0 disables the lock
+    :param poll_interval: time in seconds between checks for the value, while another caller holds the lock
+    :return: the fetched or cached value
+    """
+    lock_key = f'{key}:lock'
+    locked = False
+    if lock_ttl > 0:
+        try:
+            locked = await cache.add(lock_key, 1, ttl=lock_ttl)
+        except ValueError:
+            # Another caller holds the lock. Wait for it to cache the value.
+            deadline = time.monotonic() + lock_ttl
+            while time.monotonic() < deadline:
+                await asyncio.sleep(poll_interval)
+                value = await cache.get(key)
+                if value is not None:
+                    return value
+
+    try:
+        value = await fetch()
+        await cache.set(key, value, ttl=ttl)
+        return value
+    finally:
+        if locked:
+            await cache.delete(lock_key)
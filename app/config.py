@@ -34,6 +34,16 @@ dynamodb = {
         'table': os.getenv('MODELD_SLATE_METRICS_TABLE', 'MODELD-Local-SlateMetrics'),
         'pk': os.getenv('MODELD_SLATE_METRICS_PK', 'slates_pk'),
     },
+    # Maximum number of open connections to DynamoDB per worker
+    'max_pool_connections': int(os.getenv('DYNAMODB_MAX_POOL_CONNECTIONS', 50)),
+    # Time in seconds that idle connections to DynamoDB are kept open
+    'keepalive_timeout': float(os.getenv('DYNAMODB_KEEPALIVE_TIMEOUT', 60)),
+    # Maximum number of concurrent BatchGetItem requests per metrics query
+    'batch_get_concurrency': int(os.getenv('DYNAMODB_BATCH_GET_CONCURRENCY', 8)),
+    # Number of times that keys which DynamoDB left unprocessed are retried
+    'batch_get_max_retries': int(os.getenv('DYNAMODB_BATCH_GET_MAX_RETRIES', 5)),
+    # Time in seconds before the first retry of unprocessed keys, which doubles for every retry
+    'batch_get_retry_delay': float(os.getenv('DYNAMODB_BATCH_GET_RETRY_DELAY', 0.05)),
 }
 
 sentry = {
@@ -45,14 +55,66 @@ sentry = {
 elasticache = {
     # Convert comma-separated string MEMCACHED_SERVERS to list.
     'servers': os.getenv('MEMCACHED_SERVERS', '001.example.com:11211,002.example.com:11211').split(','),
+    # Time in seconds that a memcached server that failed to respond is skipped, before it's tried again. In the
+    # meantime its keys are cached on the next server.
+    'dead_server_retry_interval': int(os.getenv('MEMCACHED_DEAD_SERVER_RETRY_INTERVAL', 30)),
+    # Time in seconds that a memcached server has to respond, before it's considered down and its keys fail over to
+    # the next server. This must be shorter than aiocache's timeout of 5 seconds for a whole cache operation.
+    'server_timeout': float(os.getenv('MEMCACHED_SERVER_TIMEOUT', 1)),
     # Expire time in seconds for engagement metrics
     'metrics_ttl': int(os.getenv('MEMCACHED_METRICS_TTL', 900)),
-    # Expire time in seconds for candidate sets
+    # Expire time in seconds for parsed engagement metrics in the memory of each worker, in front of memcached
+    'metrics_local_ttl': int(os.getenv('LOCAL_METRICS_TTL', 60)),
+    # Maximum number of parsed engagement metrics per metrics factory in the memory of each worker, 0 disables the
+    # in-memory cache
+    'metrics_local_cache_size': int(os.getenv('LOCAL_METRICS_CACHE_SIZE', 20000)),
+    # Time in seconds after which a cached candidate set is refreshed in the background. Requests get the cached
+    # candidate set until it's refreshed.
     'candidate_set_ttl': int(os.getenv('MEMCACHED_CANDIDATE_SET_TTL', 900)),
+    # Expire time in seconds for candidate sets, which bounds how stale a candidate set can be if refreshing fails
+    'candidate_set_hard_ttl': int(os.getenv('MEMCACHED_CANDIDATE_SET_HARD_TTL', 3600)),
+    # Expire time in seconds for the lock that lets one worker at a time fetch a missing candidate set. Other workers
+    # wait up to this long for the candidate set to be cached. 0 disables the lock.
+    'candidate_set_lock_ttl': int(os.getenv('MEMCACHED_CANDIDATE_SET_LOCK_TTL', 0)),
+    # Expire time in seconds for parsed candidate sets in the memory of each worker, in front of memcached
+    'candidate_set_local_ttl': int(os.getenv('LOCAL_CANDIDATE_SET_TTL', 60)),
+    # Maximum number of parsed candidate sets in the memory of each worker, 0 disables the in-memory cache
+    'candidate_set_local_cache_size': int(os.getenv('LOCAL_CANDIDATE_SET_CACHE_SIZE', 1000)),
+    # Time in seconds between reloads of all configured candidate sets into memory. This should be shorter than
+    # candidate_set_local_ttl, such that candidate sets don't expire from memory. 0 disables preloading.
+    'candidate_set_preload_interval': int(os.getenv('CANDIDATE_SET_PRELOAD_INTERVAL', 30)),
+    # Maximum number of candidate sets that are loaded concurrently when preloading
+    'candidate_set_preload_concurrency': int(os.getenv('CANDIDATE_SET_PRELOAD_CONCURRENCY', 10)),
+}
+
+blocklists = {
+    # Time in seconds between checks for changes to app/resources/blocklists.json
+    'reload_interval': int(os.getenv('BLOCKLIST_RELOAD_INTERVAL', 60)),
+}
+
+thompson_sampling = {
+    # Number of presampled rankings to keep per slate experiment, for candidates that aren't personalized. Requests pick
+    # one of them at random, instead of sampling. 0 samples a new ranking for every request.
+    'pool_size': int(os.getenv('THOMPSON_SAMPLING_POOL_SIZE', 0)),
+    # Minimum value of both posterior parameters for an item to be sampled approximately, by experiments that set
+    # thompsonSamplingSampler to 'approximate'.
+    'approximation_min_count': float(os.getenv('THOMPSON_SAMPLING_APPROXIMATION_MIN_COUNT', 1000)),
 }
 
 recit = {
-    'endpoint_url': os.getenv('RECIT_ENDPOINT_URL', 'https://recit.readitlater.com')
+    'endpoint_url': os.getenv('RECIT_ENDPOINT_URL', 'https://recit.readitlater.com'),
+    # Time in seconds to keep a user's topic profile in memory
+    'user_profile_ttl': int(os.getenv('RECIT_USER_PROFILE_TTL', 300)),
+    # Maximum number of user topic profiles to keep in memory per worker
+    'user_profile_cache_size': int(os.getenv('RECIT_USER_PROFILE_CACHE_SIZE', 10000)),
+    # Maximum number of concurrent connections to RecIt per worker. Requests beyond this wait for a connection.
+    'max_connections': int(os.getenv('RECIT_MAX_CONNECTIONS', 100)),
+    # Time in seconds that idle connections to RecIt are kept open
+    'keepalive_timeout': float(os.getenv('RECIT_KEEPALIVE_TIMEOUT', 60)),
+    # Time in seconds to cache the resolved address of RecIt
+    'dns_cache_ttl': int(os.getenv('RECIT_DNS_CACHE_TTL', 300)),
+    # Default time in seconds that a RecIt request may take, including waiting for a connection
+    'timeout': float(os.getenv('RECIT_TIMEOUT', 5)),
 }
 
 # Slates will be replace for the following set of QA users. See qa_slate_maps below.
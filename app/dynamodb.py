@@ -0,0 +1,103 @@
+import logging
+
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Optional
+
+import aioboto3
+from aiobotocore.config import AioConfig
+from boto3.dynamodb.conditions import Key
+
+from app.config import dynamodb as dynamodb_config
+
+
+class DynamoDBResourcePool:
+    """
+    Keeps a single aioboto3 DynamoDB resource open for the lifetime of a worker, such that requests reuse its
+    credentials and its pool of keep-alive connections, instead of creating a client and a TLS connection per query.
+
+    The resource is bound to the event loop that opens it, so it's opened in a FastAPI startup event. Until then, or
+    after it's closed, resource() creates a resource per call, e.g. in tests that run on their own event loop.
+    """
+
+    def __init__(
+            self,
+            endpoint_url: Optional[str] = None,
+            max_pool_connections: int = 10,
+            keepalive_timeout: float = 15):
+        """
+        :param endpoint_url: optional DynamoDB endpoint url, used for local development
+        :param max_pool_connections: maximum number of open connections
+        :param keepalive_timeout: time in seconds that idle connections are kept open
+        """
+        self.endpoint_url = endpoint_url
+        self.max_pool_connections = max_pool_connections
+        self.keepalive_timeout = keepalive_timeout
+        self._resource = None
+        self._exit_stack: Optional[AsyncExitStack] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._resource is not None
+
+    async def open(self):
+        """
+        Creates the shared resource on the running event loop.
+        """
+        if self.is_open:
+            return
+
+        exit_stack = AsyncExitStack()
+        self._resource = await exit_stack.enter_async_context(self._create_resource())
+        self._exit_stack = exit_stack
+
+    async def warm_up(self):
+        """
+        Resolves credentials and opens a connection, by querying a candidate set that doesn't exist, such that the
+        first request doesn't pay for it.
+        """
+        async with self.resource() as dynamodb:
+            table = await dynamodb.Table(dynamodb_config['candidate_sets']['table'])
+            await table.query(KeyConditionExpression=Key('id').eq('warm-up'), Limit=1)
+
+    async def close(self):
+        """
+        Closes the shared resource and its connections.
+        """
+        if self._exit_stack is not None:
+            exit_stack, self._exit_stack, self._resource = self._exit_stack, None, None
+            await exit_stack.aclose()
+
+    @asynccontextmanager
+    async def resource(self):
+        """
+        :return: async context manager for the shared resource, or for a new resource if the pool isn't open
+        """
+        if self._resource is not None:
+            yield self._resource
+        else:
+            async with self._create_resource() as dynamodb:
+                yield dynamodb
+
+    def _create_resource(self):
+        config = AioConfig(
+            max_pool_connections=self.max_pool_connections,
+            connector_args={'keepalive_timeout': self.keepalive_timeout})
+        return aioboto3.resource('dynamodb', endpoint_url=self.endpoint_url, config=config)
+
+
+# Resource pool shared by all requests in this worker.
+dynamodb_pool = DynamoDBResourcePool(endpoint_url=dynamodb_config['endpoint_url'],
+                                     max_pool_connections=dynamodb_config['max_pool_connections'],
+                                     keepalive_timeout=dynamodb_config['keepalive_timeout'])
+
+
+async def open_dynamodb_pool():
+    """
+    Opens dynamodb_pool, and warms it up. A failed warm-up is logged, because requests can still succeed once
+    DynamoDB is reachable.
+    """
+    await dynamodb_pool.open()
+    try:
+        await dynamodb_pool.warm_up()
+    except Exception:
+        logging.exception('Failed to warm up the DynamoDB connection pool')
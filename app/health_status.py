@@ -1,5 +1,6 @@
 from enum import Enum
 import logging
+from typing import Optional
 
 
 class HealthStatus(Enum):
@@ -9,6 +10,7 @@ class HealthStatus(Enum):
 
 
 _health_status: HealthStatus = HealthStatus.UNKNOWN
+_startup_duration: Optional[float] = None
 
 
 def get_health_status():
@@ -19,3 +21,15 @@ def set_health_status(status: HealthStatus):
     global _health_status
     logging.info(f"Changing health status from {_health_status.name} to {status.name}")
     _health_status = status
+
+
+def get_startup_duration() -> Optional[float]:
+    """
+    :return: time in seconds that startup took, or None if startup hasn't completed
+    """
+    return _startup_duration
+
+
+def set_startup_duration(duration: float):
+    global _startup_duration
+    _startup_duration = duration
@@ -1,4 +1,6 @@
+import asyncio
 import logging
+import time
 
 import uvicorn
 import sentry_sdk
@@ -12,15 +14,24 @@ from xraysink.asgi.middleware import xray_middleware
 from xraysink.context import AsyncContext
 
 from app.cache import initialize_caches
-from app.config import ENV, ENV_PROD, ENV_DEV, service, sentry as sentry_config
+from app.config import ENV, ENV_PROD, ENV_DEV, service, sentry as sentry_config, blocklists as blocklists_config, \
+    elasticache as elasticache_config
+from app.dynamodb import dynamodb_pool, open_dynamodb_pool
+from app.recit import recit_client
 from app.graphql.graphql import schema
 from app.graphql.user_middleware import UserMiddleware
 from app.graphql_app import GraphQLAppWithMiddleware, GraphQLSentryMiddleware
-from app.models.candidate_set import candidate_set_factory
+from app.models.candidate_set import find_missing_candidate_sets
+from app.models.candidate_set_preloader import candidate_set_preloader
+from app.models.metrics.recommendation_metrics_factory import RecommendationMetricsFactory
+from app.models.metrics.slate_metrics_factory import SlateMetricsFactory
 from app.models.slate_lineup_experiment import SlateLineupExperimentModel
 from app.models.slate_lineup_config import SlateLineupConfigModel, validate_unique_guids
 from app.models.slate_config import SlateConfigModel
-from app.health_status import get_health_status, set_health_status, HealthStatus
+from app.rankers.blocklists import blocklist_index
+from app.rng import rng_middleware
+from app.health_status import get_health_status, set_health_status, HealthStatus, get_startup_duration, \
+    set_startup_duration
 
 
 sentry_sdk.init(
@@ -39,6 +50,7 @@ xray_recorder.configure(context=AsyncContext(), service=service.get('domain'), p
 app = FastAPI()
 app.add_middleware(BaseHTTPMiddleware, dispatch=xray_middleware)
 app.add_middleware(SentryAsgiMiddleware)
+app.add_middleware(BaseHTTPMiddleware, dispatch=rng_middleware)
 
 # Add our GraphQL route to the main url
 app.add_route("/", GraphQLAppWithMiddleware(
@@ -51,7 +63,21 @@ async def read_root(response: Response):
     if get_health_status() != HealthStatus.HEALTHY:
         response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
 
-    return {"status": get_health_status().name}
+    return {
+        "status": get_health_status().name,
+        # Number of candidate sets in memory, out of all candidate sets that slates refer to.
+        "candidateSets": {
+            "warm": candidate_set_preloader.get_warm_count(),
+            "total": len(candidate_set_preloader.candidate_set_ids),
+        },
+        # Time in seconds it took to load, validate and warm up configs, or None if that hasn't completed.
+        "startupSeconds": get_startup_duration(),
+        # Fractions of metrics that were found in memory and in memcached, since the worker started.
+        "metricsCache": {
+            "recommendations": RecommendationMetricsFactory.metrics_cache.get_hit_ratios(),
+            "slates": SlateMetricsFactory.metrics_cache.get_hit_ratios(),
+        },
+    }
 
 
 class MissingSlateException(ValueError):
@@ -78,8 +104,55 @@ async def initialize_caches_startup_event():
     initialize_caches()
 
 
+@app.on_event("startup")
+async def open_dynamodb_pool_startup_event():
+    # Open and warm up DynamoDB connections before the application becomes healthy, such that the first requests don't
+    # pay for creating a client and connecting. This needs to be on the same event loop as FastAPI.
+    await open_dynamodb_pool()
+
+
+@app.on_event("shutdown")
+async def close_dynamodb_pool():
+    await dynamodb_pool.close()
+
+
+@app.on_event("startup")
+async def open_recit_client():
+    # The session needs to be created on the same event loop as FastAPI.
+    await recit_client.open()
+
+
+@app.on_event("shutdown")
+async def close_recit_client():
+    await recit_client.close()
+
+
+@app.on_event("startup")
+async def load_blocklists():
+    # Load blocklists before the application becomes healthy, such that requests never read the blocklists file.
+    blocklist_index.load()
+    blocklist_index.start_watching(blocklists_config['reload_interval'])
+
+
+@app.on_event("shutdown")
+async def stop_watching_blocklists():
+    await blocklist_index.stop_watching()
+
+
 @app.on_event("startup")
 async def load_slate_configs():
+    # Record startup in its own X-Ray segment, such that its duration can be searched and graphed.
+    async with xray_recorder.in_segment_async('startup', sampling=1) as segment:
+        start_time = time.perf_counter()
+        await _load_and_validate_configs()
+        set_startup_duration(time.perf_counter() - start_time)
+        segment.put_annotation('startup_seconds', get_startup_duration())
+
+    logging.info(f'Loaded and validated configs in {get_startup_duration():.3f}s')
+    set_health_status(HealthStatus.HEALTHY)
+
+
+async def _load_and_validate_configs():
     # parse json into objects
     slate_configs = SlateConfigModel.load_slate_configs()
     SlateConfigModel.SLATE_CONFIGS_BY_ID = {s.id: s for s in slate_configs}
@@ -91,30 +164,48 @@ async def load_slate_configs():
 
     # Validate slate_lineup and slate configs on prod and dev, not locally.
     if ENV in {ENV_PROD, ENV_DEV}:
-        # wow i do not love this nested loop soup, BUT it does give us nice full context for the error message
-        for slate_config in slate_configs:
-            for experiment in slate_config.experiments:
-                for cs in experiment.candidate_sets:
-                    logging.info(f"Validating candidate set {cs}")
-                    csm = candidate_set_factory(cs)
-                    if not await csm.verify_candidate_set(cs):
-                        # Send event to Sentry, but don't raise it, because missing candidate sets should not
-                        # block successfully starting the application.
-                        message = f'candidate set {slate_config.id}|{experiment.description}|{cs} was not found.'
-                        logging.error(message)
-                        sentry_sdk.capture_exception(MissingCandidateSetException(message))
-
         for slate_lineup_config in slate_lineup_configs:
             for experiment in slate_lineup_config.experiments:
                 for slate in experiment.slates:
-                    logging.info(f"Validating slate id {slate}")
                     if not SlateLineupExperimentModel.slate_id_exists(slate):
                         set_health_status(HealthStatus.UNHEALTHY)
                         raise MissingSlateException(
                             f'slate {slate_lineup_config.id}|{experiment.description}|{slate} was not found'
                             f'in json/slate_configs.json - application start failed')
 
-    set_health_status(HealthStatus.HEALTHY)
+    # Load candidate sets into memory before the application becomes healthy, and keep them there. Candidate sets are
+    # loaded concurrently, and each one once, such that startup time doesn't grow with the number of experiments.
+    preload = candidate_set_preloader.start(slate_configs, elasticache_config['candidate_set_preload_interval'])
+
+    if ENV not in {ENV_PROD, ENV_DEV}:
+        await preload
+        return
+
+    # Preloading reads through memcached, so candidate sets are validated against the database, concurrently.
+    try:
+        _, missing_candidate_sets = await asyncio.gather(preload, find_missing_candidate_sets(
+            {cs for s in slate_configs for e in s.experiments for cs in e.candidate_sets},
+            elasticache_config['candidate_set_preload_concurrency']))
+    except Exception:
+        # Candidate sets can't be validated if the database can't be reached, which should block startup.
+        set_health_status(HealthStatus.UNHEALTHY)
+        raise
+
+    # wow i do not love this nested loop soup, BUT it does give us nice full context for the error message
+    for slate_config in slate_configs:
+        for experiment in slate_config.experiments:
+            for cs in experiment.candidate_sets:
+                if cs in missing_candidate_sets:
+                    # Send event to Sentry, but don't raise it, because missing candidate sets should not
+                    # block successfully starting the application.
+                    message = f'candidate set {slate_config.id}|{experiment.description}|{cs} was not found.'
+                    logging.error(message)
+                    sentry_sdk.capture_exception(MissingCandidateSetException(message))
+
+
+@app.on_event("shutdown")
+async def stop_preloading_candidate_sets():
+    await candidate_set_preloader.stop()
 
 
 if __name__ == "__main__":
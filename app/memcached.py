@@ -0,0 +1,212 @@
+import asyncio
+import hashlib
+import logging
+import time
+
+from bisect import bisect
+from collections import defaultdict
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import aiomcache
+from aiocache import MemcachedCache
+
+# Errors that indicate that a memcached server is unreachable or doesn't respond, as opposed to errors in a command.
+SERVER_ERRORS = (OSError, EOFError, asyncio.TimeoutError)
+
+
+def _hash(data: bytes) -> int:
+    return int.from_bytes(hashlib.md5(data).digest()[:4], 'little')
+
+
+class HashRing:
+    """
+    Consistent hash ring, which maps keys to nodes such that adding or removing a node only moves the keys of that
+    node. Each node is placed on the ring at `replicas` points, such that keys are spread evenly.
+    """
+
+    def __init__(self, nodes: List[str], replicas: int = 160):
+        """
+        :param nodes: distinct node names
+        :param replicas: number of points per node on the ring
+        """
+        if not nodes:
+            raise ValueError('HashRing needs at least one node')
+
+        points = sorted((_hash(f'{node}-{i}'.encode()), node) for node in nodes for i in range(replicas))
+        self._hashes = [h for h, _ in points]
+        self._nodes = [node for _, node in points]
+        self._node_count = len(set(nodes))
+
+    def get_node(self, key: bytes) -> str:
+        """
+        :return: the node that key maps to
+        """
+        return next(self.iter_nodes(key))
+
+    def iter_nodes(self, key: bytes) -> Iterator[str]:
+        """
+        :return: all nodes, starting with the node that key maps to, followed by the nodes that key fails over to
+        """
+        start = bisect(self._hashes, _hash(key))
+        seen = set()
+        for i in range(len(self._nodes)):
+            node = self._nodes[(start + i) % len(self._nodes)]
+            if node not in seen:
+                seen.add(node)
+                yield node
+                if len(seen) == self._node_count:
+                    return
+
+
+class ShardedMemcachedClient:
+    """
+    Drop-in replacement for aiomcache.Client, which spreads keys over multiple memcached servers using consistent
+    hashing, such that cache capacity grows with the number of servers. Multi-gets send a single pipelined get to each
+    server. A server that fails to respond within `server_timeout` seconds is skipped for `retry_interval` seconds, and
+    its keys temporarily map to the next server on the ring.
+    """
+
+    def __init__(
+            self,
+            servers: List[Tuple[str, int]],
+            pool_size: int = 2,
+            retry_interval: float = 30,
+            server_timeout: float = 1,
+            clock: Callable[[], float] = time.monotonic,
+            client_factory: Callable[..., aiomcache.Client] = aiomcache.Client):
+        """
+        :param servers: list of (host, port) tuples
+        :param pool_size: number of connections per server
+        :param retry_interval: time in seconds to skip a server after it failed to respond
+        :param server_timeout: time in seconds that a server has to respond to a command, before it's considered down.
+                               This must be shorter than aiocache's timeout, such that a server that doesn't respond
+                               is failed over before aiocache gives up on the whole operation.
+        :param clock: function that returns the current time in seconds
+        :param client_factory: function that creates a client for a single server
+        """
+        self._clients = {f'{host}:{port}': client_factory(host, int(port), pool_size=pool_size) for host, port in servers}
+        self._ring = HashRing(list(self._clients))
+        self.retry_interval = retry_interval
+        self.server_timeout = server_timeout
+        self._clock = clock
+        self._down_until: Dict[str, float] = {}
+
+    def get_server(self, key: bytes) -> str:
+        """
+        :return: the first server on the ring for key that isn't marked as down, or the first server if all are down
+        """
+        now = self._clock()
+        for server in self._ring.iter_nodes(key):
+            if self._down_until.get(server, 0) <= now:
+                return server
+        return self._ring.get_node(key)
+
+    def _mark_down(self, server: str, error: Exception):
+        logging.warning(f'Memcached server {server} failed, skipping it for {self.retry_interval}s: {error!r}')
+        self._down_until[server] = self._clock() + self.retry_interval
+
+    async def _request(self, server: str, method: str, *args, **kwargs):
+        """
+        Sends a command to a single server, and raises asyncio.TimeoutError if it doesn't respond in time.
+        """
+        return await asyncio.wait_for(getattr(self._clients[server], method)(*args, **kwargs), self.server_timeout)
+
+    async def _call(self, method: str, key: bytes, *args, **kwargs):
+        server = self.get_server(key)
+        try:
+            return await self._request(server, method, key, *args, **kwargs)
+        except SERVER_ERRORS as e:
+            self._mark_down(server, e)
+            failover = self.get_server(key)
+            if failover == server:
+                raise
+            return await self._request(failover, method, key, *args, **kwargs)
+
+    async def get(self, key: bytes, default=None):
+        return await self._call('get', key, default)
+
+    async def gets(self, key: bytes, default=None):
+        return await self._call('gets', key, default)
+
+    async def multi_get(self, *keys: bytes) -> tuple:
+        """
+        :return: values in the same order as keys, with None for missing keys
+        """
+        values = await self._multi_get(keys, failover=True)
+        return tuple(values[key] for key in keys)
+
+    async def _multi_get(self, keys, failover: bool) -> dict:
+        keys_by_server = defaultdict(list)
+        for key in dict.fromkeys(keys):
+            keys_by_server[self.get_server(key)].append(key)
+
+        async def get_from_server(server: str, server_keys: List[bytes]) -> dict:
+            try:
+                return dict(zip(server_keys, await self._request(server, 'multi_get', *server_keys)))
+            except SERVER_ERRORS as e:
+                self._mark_down(server, e)
+                if not failover:
+                    raise
+                return await self._multi_get(server_keys, failover=False)
+
+        values = {}
+        for server_values in await asyncio.gather(*(get_from_server(s, k) for s, k in keys_by_server.items())):
+            values.update(server_values)
+        return values
+
+    async def set(self, key: bytes, value: bytes, exptime: int = 0):
+        return await self._call('set', key, value, exptime=exptime)
+
+    async def cas(self, key: bytes, value: bytes, cas_token: int, exptime: int = 0):
+        return await self._call('cas', key, value, cas_token, exptime=exptime)
+
+    async def add(self, key: bytes, value: bytes, exptime: int = 0):
+        return await self._call('add', key, value, exptime=exptime)
+
+    async def append(self, key: bytes, value: bytes, exptime: int = 0):
+        return await self._call('append', key, value, exptime=exptime)
+
+    async def incr(self, key: bytes, increment: int = 1):
+        return await self._call('incr', key, increment)
+
+    async def decr(self, key: bytes, decrement: int = 1):
+        return await self._call('decr', key, decrement)
+
+    async def touch(self, key: bytes, exptime: int):
+        return await self._call('touch', key, exptime)
+
+    async def delete(self, key: bytes):
+        return await self._call('delete', key)
+
+    async def flush_all(self):
+        await asyncio.gather(*(client.flush_all() for client in self._clients.values()))
+
+    async def close(self):
+        await asyncio.gather(*(client.close() for client in self._clients.values()))
+
+
+class ShardedMemcachedCache(MemcachedCache):
+    """
+    aiocache MemcachedCache that spreads keys over all memcached servers with a ShardedMemcachedClient.
+    """
+
+    def __init__(
+            self,
+            servers: List[Tuple[str, int]],
+            retry_interval: float = 30,
+            server_timeout: float = 1,
+            **kwargs):
+        """
+        :param servers: list of (host, port) tuples
+        :param retry_interval: time in seconds to skip a server after it failed to respond
+        :param server_timeout: time in seconds that a server has to respond to a command, which must be shorter than
+                               the timeout of the cache
+        """
+        host, port = servers[0]
+        super().__init__(endpoint=host, port=port, **kwargs)
+        self.servers = servers
+        self.client = ShardedMemcachedClient(
+            servers, pool_size=self.pool_size, retry_interval=retry_interval, server_timeout=server_timeout)
+
+    def __repr__(self):
+        return f'ShardedMemcachedCache ({", ".join(f"{host}:{port}" for host, port in self.servers)})'
@@ -0,0 +1,77 @@
+import numpy as np
+
+from typing import Dict, Iterator, List, Optional
+
+from app.models.candidate import Candidate
+
+
+class CandidateColumns:
+    """
+    Columnar representation of a slate's candidates, which rankers use instead of a list of RecommendationModel
+    objects. Candidates are stored as NumPy arrays with one element per candidate. Ranking a candidate reorders
+    integer indices, and slicing returns views on the arrays, such that no objects are allocated per candidate
+    until the final recommendations are materialized.
+
+    Instances are immutable: take() and slicing return new instances.
+    """
+
+    def __init__(
+            self,
+            item_ids: np.ndarray,
+            publisher_codes: np.ndarray,
+            feed_ids: np.ndarray,
+            publishers: List[Optional[str]]):
+        """
+        :param item_ids: item ids as strings, the key under which item metrics are stored
+        :param publisher_codes: index of each candidate's publisher in `publishers`
+        :param feed_ids: optional feed ids
+        :param publishers: distinct publisher domains, shared by all instances derived from the same candidates
+        """
+        self.item_ids = item_ids
+        self.publisher_codes = publisher_codes
+        self.feed_ids = feed_ids
+        self.publishers = publishers
+
+    @staticmethod
+    def from_candidates(candidates: List[Candidate]) -> 'CandidateColumns':
+        """
+        :param candidates: candidates in the order they should be ranked in
+        :return: columns for the candidates
+        """
+        item_ids = np.empty(len(candidates), dtype=object)
+        publisher_codes = np.empty(len(candidates), dtype=np.intp)
+        feed_ids = np.empty(len(candidates), dtype=object)
+        codes_by_publisher: Dict[Optional[str], int] = {}
+
+        for i, candidate in enumerate(candidates):
+            item_ids[i] = str(candidate.item_id)
+            publisher_codes[i] = codes_by_publisher.setdefault(candidate.publisher, len(codes_by_publisher))
+            feed_ids[i] = candidate.feed_id
+
+        return CandidateColumns(item_ids, publisher_codes, feed_ids, list(codes_by_publisher))
+
+    def take(self, indices: np.ndarray) -> 'CandidateColumns':
+        """
+        :param indices: positions of the candidates to keep, in their new order
+        :return: the candidates at `indices`
+        """
+        return CandidateColumns(self.item_ids[indices], self.publisher_codes[indices], self.feed_ids[indices],
+                                self.publishers)
+
+    def rows(self) -> Iterator[dict]:
+        """
+        :return: the candidates as dicts with the same keys as Candidate, to materialize them as recommendations
+        """
+        for item_id, publisher_code, feed_id in zip(self.item_ids, self.publisher_codes, self.feed_ids):
+            yield {'item_id': item_id, 'publisher': self.publishers[publisher_code], 'feed_id': feed_id}
+
+    def __len__(self) -> int:
+        return len(self.item_ids)
+
+    def __getitem__(self, key: slice) -> 'CandidateColumns':
+        if not isinstance(key, slice):
+            raise TypeError(f'CandidateColumns can only be sliced, got {type(key).__name__}')
+        return CandidateColumns(self.item_ids[key], self.publisher_codes[key], self.feed_ids[key], self.publishers)
+
+    def __repr__(self):
+        return f'CandidateColumns({list(self.item_ids)!r})'
@@ -1,17 +1,30 @@
-import aioboto3
-import aiohttp
+import asyncio
+import time
+
 from aiocache import caches
 import logging
 
+from functools import partial
+
 from aws_xray_sdk.core import xray_recorder
 from boto3.dynamodb.conditions import Key
 from pydantic import BaseModel
-from typing import List, Dict, Any, Union, Type
+from typing import List, Dict, Any, FrozenSet, Iterable, Union, Type
 
 from app.config import dynamodb as dynamodb_config, recit as recit_config
 import app.cache
+from app.dynamodb import dynamodb_pool
+from app.recit import recit_client
 from app.models.candidate import Candidate
 
+# Parsed candidate sets by id, in front of memcached. Candidate sets are the same for all users, so most requests
+# don't need to fetch or deserialize them.
+local_candidate_set_cache = app.cache.LocalTTLCache(
+    maxsize=app.config.elasticache['candidate_set_local_cache_size'],
+    ttl=app.config.elasticache['candidate_set_local_ttl'])
+# Concurrent memcached misses for the same candidate set await a single query.
+candidate_set_single_flight = app.cache.SingleFlight()
+
 
 class CandidateSetModel(BaseModel):
     """
@@ -79,15 +92,13 @@ class RecItCandidateSet(CandidateSetModel):
 
         recit_module_name = RecItCandidateSet._get_module(cs_id)
 
-        #TODO: There should really just be one session shared, not sure how to do this in gunicorn thou
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f'{recit_config["endpoint_url"]}/v1/module/{recit_module_name}/0',
-                                   params={"user_id": user_id, "limit": RECIT_LIMIT}) as resp:
-                if resp.status == 200:
-                    return RecItCandidateSet.parse_recit_response(cs_id, await resp.json())
-                else:
-                    logging.warning("RecIt error with status (%s): %s", resp.status, resp.content)
-                    return RecItCandidateSet(candidates=[], id=cs_id, version=1)
+        async with recit_client.get(f'{recit_config["endpoint_url"]}/v1/module/{recit_module_name}/0',
+                                    params={"user_id": user_id, "limit": RECIT_LIMIT}) as resp:
+            if resp.status == 200:
+                return RecItCandidateSet.parse_recit_response(cs_id, await resp.json())
+            else:
+                logging.warning("RecIt error with status (%s): %s", resp.status, resp.content)
+                return RecItCandidateSet(candidates=[], id=cs_id, version=1)
 
     @staticmethod
     def parse_recit_response(cs_id: str, response: Dict) -> "RecItCandidateSet":
@@ -117,7 +128,22 @@ class DynamoDBCandidateSet(CandidateSetModel):
     @xray_recorder.capture_async('models.dynamodb_candidate_set.get')
     async def get(cs_id: str, user_id: str = None) -> 'DynamoDBCandidateSet':
         """
-        Retrieves a candidate set from the database and instantiates a CandidateSetModel
+        Retrieves a candidate set from the database and instantiates a CandidateSetModel. Parsed candidate sets are
+        kept in memory for app.config.elasticache['candidate_set_local_ttl'] seconds. Callers must not modify them.
+
+        :param cs_id: string id of the candidate set
+        :return: A CandidateSetModel object
+        """
+        candidate_set = local_candidate_set_cache.get(cs_id)
+        if candidate_set is not None:
+            return candidate_set
+
+        return await DynamoDBCandidateSet.load(cs_id)
+
+    @staticmethod
+    async def load(cs_id: str) -> 'DynamoDBCandidateSet':
+        """
+        Retrieves a candidate set from memcached or the database, and replaces it in memory.
 
         :param cs_id: string id of the candidate set
         :return: A CandidateSetModel object
@@ -126,7 +152,9 @@ class DynamoDBCandidateSet(CandidateSetModel):
         if not response['Items']:
             raise KeyError(f'candidate set id {cs_id} was not found in the database')
 
-        return DynamoDBCandidateSet.parse_obj(response['Items'][0])
+        candidate_set = DynamoDBCandidateSet.parse_obj(response['Items'][0])
+        local_candidate_set_cache.set(cs_id, candidate_set)
+        return candidate_set
 
     @staticmethod
     @xray_recorder.capture_async('models.dynamodb_candidate_set._cached_query_by_id')
@@ -135,20 +163,46 @@ class DynamoDBCandidateSet(CandidateSetModel):
         Wrap the _query_by_id function in a cache.
         A nicer solution would be to use the aiocache decorator, but it raises a "different loop" error,
         because the decorator is called before FastAPI starts.
+        On a cache miss, concurrent calls for the same candidate set in this worker share a single query, and
+        optionally a lock in memcached lets only one worker query it.
+        Cached candidate sets are refreshed in the background after app.config.elasticache['candidate_set_ttl']
+        seconds, such that requests don't wait for DynamoDB when a candidate set is due to be refreshed. Until the
+        refresh completes, the cached candidate set is returned, for at most `candidate_set_hard_ttl` seconds.
         :param cs_id: Candidate Set id
         :return: Candidate Set dict
         """
         cache = caches.get(app.cache.candidate_set_alias)
 
-        key = f'candidate_set:{cs_id}'
-        value = await cache.get(key)
-        if value is not None:
-            return value
+        key = f'candidate_set:v3:{cs_id}'
+        fetch = partial(
+            app.cache.fetch_with_lock,
+            cache,
+            key,
+            partial(DynamoDBCandidateSet._query_cache_entry, cs_id),
+            ttl=app.config.elasticache['candidate_set_hard_ttl'],
+            lock_ttl=app.config.elasticache['candidate_set_lock_ttl'])
 
-        result = await DynamoDBCandidateSet._query_by_id(cs_id)
+        entry = await cache.get(key)
+        if entry is None:
+            entry = await candidate_set_single_flight.do(key, fetch)
+        elif time.time() >= entry['refresh_at']:
+            refresh = candidate_set_single_flight.start(key, fetch)
+            refresh.add_done_callback(partial(DynamoDBCandidateSet._log_refresh_error, cs_id))
 
-        await cache.set(key, result, ttl=app.config.elasticache['candidate_set_ttl'])
-        return result
+        return entry['value']
+
+    @staticmethod
+    async def _query_cache_entry(cs_id: str) -> Dict[str, Any]:
+        """
+        :return: dict with the items of the database response for cs_id as 'value', and the time at which to refresh it
+        """
+        response = await DynamoDBCandidateSet._query_by_id(cs_id)
+        return {'value': {'Items': response['Items']}, 'refresh_at': time.time() + app.config.elasticache['candidate_set_ttl']}
+
+    @staticmethod
+    def _log_refresh_error(cs_id: str, refresh: asyncio.Future):
+        if not refresh.cancelled() and refresh.exception() is not None:
+            logging.error(f'Failed to refresh candidate set {cs_id}', exc_info=refresh.exception())
 
     @staticmethod
     @xray_recorder.capture_async('models.dynamodb_candidate_set._query_by_id')
@@ -159,7 +213,7 @@ class DynamoDBCandidateSet(CandidateSetModel):
         :param cs_id: string id of the candidate set
         :return: dictionary database response
         """
-        async with aioboto3.resource('dynamodb', endpoint_url=dynamodb_config['endpoint_url']) as dynamodb:
+        async with dynamodb_pool.resource() as dynamodb:
             table = await dynamodb.Table(dynamodb_config['candidate_sets']['table'])
             key_condition = Key('id').eq(cs_id)
             response = await table.query(KeyConditionExpression=key_condition)
@@ -173,3 +227,24 @@ def candidate_set_factory(candidate_set_id: str) -> Union[Type[RecItCandidateSet
         return RecItCandidateSet
     else:
         return DynamoDBCandidateSet
+
+
+async def find_missing_candidate_sets(cs_ids: Iterable[str], concurrency: int = 10) -> FrozenSet[str]:
+    """
+    Concurrently checks whether candidate sets exist. DynamoDB candidate sets are looked up in the database directly,
+    not through memcached, such that a stale or unavailable cache doesn't hide or invent missing candidate sets.
+
+    :param cs_ids: ids of the candidate sets to check
+    :param concurrency: maximum number of candidate sets to check concurrently
+    :return: ids of the candidate sets that don't exist
+    :raises: any error other than a missing candidate set, e.g. if the database can't be reached
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def exists(cs_id: str) -> bool:
+        async with semaphore:
+            return await candidate_set_factory(cs_id).verify_candidate_set(cs_id)
+
+    cs_ids = list(set(cs_ids))
+    found = await asyncio.gather(*(exists(cs_id) for cs_id in cs_ids))
+    return frozenset(cs_id for cs_id, cs_exists in zip(cs_ids, found) if not cs_exists)
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import random
+
+from typing import FrozenSet, Iterable, NamedTuple, Optional
+
+import app.config
+from app.models.candidate_set import DynamoDBCandidateSet, candidate_set_factory, local_candidate_set_cache
+from app.models.slate_config import SlateConfigModel
+
+# Fraction of the preload interval by which each worker shortens its wait at random, such that workers that start at
+# the same time don't all reload candidate sets at the same time.
+PRELOAD_JITTER = 0.2
+
+
+class PreloadResult(NamedTuple):
+    # Number of candidate sets that were loaded
+    loaded: int
+    # Ids of candidate sets that don't exist in the database
+    missing: FrozenSet[str]
+
+
+class CandidateSetPreloader:
+    """
+    Keeps all DynamoDB candidate sets that slate configs refer to in local_candidate_set_cache, such that requests
+    don't wait for candidate sets to be fetched. Candidate sets are loaded at startup, and reloaded in the background
+    before they expire from memory.
+
+    Reloads go through memcached, which refreshes candidate sets from the database when they're due.
+    """
+
+    def __init__(self, concurrency: int = 10):
+        """
+        :param concurrency: maximum number of candidate sets to load concurrently
+        """
+        self.concurrency = concurrency
+        self.candidate_set_ids: FrozenSet[str] = frozenset()
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def get_candidate_set_ids(slate_configs: Iterable[SlateConfigModel]) -> FrozenSet[str]:
+        """
+        :return: ids of the DynamoDB candidate sets that are used in experiments of slate_configs
+        """
+        return frozenset(
+            cs_id
+            for slate_config in slate_configs
+            for experiment in slate_config.experiments
+            for cs_id in experiment.candidate_sets
+            if candidate_set_factory(cs_id) is DynamoDBCandidateSet
+        )
+
+    def get_warm_count(self) -> int:
+        """
+        :return: number of candidate sets that are in memory
+        """
+        return sum(1 for cs_id in self.candidate_set_ids if cs_id in local_candidate_set_cache)
+
+    async def load_all(self) -> PreloadResult:
+        """
+        Concurrently loads all candidate sets into memory. Failures are logged, and the candidate set is fetched by
+        the next request that needs it instead.
+
+        :return: the number of loaded candidate sets, and the ids of candidate sets that don't exist
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        missing = set()
+
+        async def load(cs_id: str) -> bool:
+            async with semaphore:
+                try:
+                    await DynamoDBCandidateSet.load(cs_id)
+                    return True
+                except KeyError:
+                    missing.add(cs_id)
+                except Exception:
+                    logging.exception(f'Failed to preload candidate set {cs_id}')
+                return False
+
+        loaded = await asyncio.gather(*(load(cs_id) for cs_id in self.candidate_set_ids))
+        return PreloadResult(loaded=sum(loaded), missing=frozenset(missing))
+
+    async def start(self, slate_configs: Iterable[SlateConfigModel], interval: float) -> PreloadResult:
+        """
+        Loads the candidate sets that slate_configs refer to, and starts a background task on the running event loop
+        that reloads them.
+
+        :param slate_configs: all slate configs
+        :param interval: time in seconds between reloads, 0 only loads candidate sets once
+        :return: the result of loading the candidate sets
+        """
+        self.candidate_set_ids = self.get_candidate_set_ids(slate_configs)
+        result = await self.load_all()
+        logging.info(f'Preloaded {result.loaded} of {len(self.candidate_set_ids)} candidate sets')
+
+        if interval > 0:
+            self._task = asyncio.get_event_loop().create_task(self._reload(interval))
+
+        return result
+
+    async def stop(self):
+        """
+        Stops the background task started by start.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _reload(self, interval: float):
+        while True:
+            await asyncio.sleep(interval * (1 - random.uniform(0, PRELOAD_JITTER)))
+            await self.load_all()
+
+
+# Preloader shared by all requests in this worker.
+candidate_set_preloader = CandidateSetPreloader(
+    concurrency=app.config.elasticache['candidate_set_preload_concurrency'])
@@ -1,11 +1,17 @@
 import hashlib
 import json
-import random
+
+import numpy as np
 
 from abc import ABCMeta, abstractmethod
-from typing import List, Type, TypeVar
+from typing import List, Optional, Type, TypeVar
 
+from app.models.metrics.metrics_model import MetricsWindow
+from app.models.metrics.posterior import DEFAULT_METRICS_WINDOW, DEFAULT_THOMPSON_SAMPLING_SAMPLER, \
+    THOMPSON_SAMPLING_SAMPLERS
 from app.rankers import get_all_rankers
+from app.rankers.pipeline import RankerPipeline
+from app.rng import get_rng
 
 
 # defined for parameter and return typing on base static method 'choose_experiment'
@@ -23,7 +29,9 @@ class ExperimentModel(metaclass=ABCMeta):
     # should this be in a config somewhere?
     DEFAULT_WEIGHT = 1
 
-    def __init__(self, experiment_id: str, description: str, rankers: List[str], weight: float = DEFAULT_WEIGHT):
+    def __init__(self, experiment_id: str, description: str, rankers: List[str], weight: float = DEFAULT_WEIGHT,
+                 metrics_window: MetricsWindow = DEFAULT_METRICS_WINDOW,
+                 thompson_sampling_sampler: str = DEFAULT_THOMPSON_SAMPLING_SAMPLER):
         # initialize values
         self.rankers = []
 
@@ -38,9 +46,16 @@ class ExperimentModel(metaclass=ABCMeta):
 
             self.rankers.append(ranker)
 
+        # compile the rankers once, such that requests don't have to work out which items need to be ranked
+        self.pipeline = RankerPipeline(self.rankers)
+
         self.id = experiment_id
         self.description = description
         self.weight = weight
+        # period over which engagement metrics are counted for thompson sampling
+        self.metrics_window = metrics_window
+        # how thompson sampling samples from posteriors, which is part of the experiment id if it's configured
+        self.thompson_sampling_sampler = thompson_sampling_sampler
 
     @staticmethod
     def generate_experiment_id(experiment_dict: dict) -> str:
@@ -58,18 +73,43 @@ class ExperimentModel(metaclass=ABCMeta):
         return hashed[:7]
 
     @staticmethod
-    def choose_experiment(experiments: List[Type[T]]) -> 'T':
+    def parse_metrics_window(experiment_dict: dict) -> MetricsWindow:
+        """
+        :param experiment_dict: dictionary representation of an experiment (after parsing from json)
+        :return: the experiment's metricsWindow, or the default window if it's not set
+        """
+        if 'metricsWindow' not in experiment_dict:
+            return DEFAULT_METRICS_WINDOW
+
+        return MetricsWindow(experiment_dict['metricsWindow'])
+
+    @staticmethod
+    def parse_thompson_sampling_sampler(experiment_dict: dict) -> str:
+        """
+        :param experiment_dict: dictionary representation of an experiment (after parsing from json)
+        :return: the experiment's thompsonSamplingSampler, or the default sampler if it's not set
+        """
+        sampler = experiment_dict.get('thompsonSamplingSampler', DEFAULT_THOMPSON_SAMPLING_SAMPLER)
+        if sampler not in THOMPSON_SAMPLING_SAMPLERS:
+            raise ValueError(f'{sampler} is not a valid thompson sampling sampler')
+
+        return sampler
+
+    @staticmethod
+    def choose_experiment(experiments: List[Type[T]], rng: Optional[np.random.Generator] = None) -> 'T':
         """
         Performs a weighted random choice on the list of experiments
 
         :param experiments: a list of child classes of this class
+        :param rng: random generator, defaults to the generator of the current request
         :return: ExperimentModel object
         """
+        rng = rng or get_rng()
+
         # pull all the weights for each experiment
-        weights = [e.weight for e in experiments]
+        weights = np.array([e.weight for e in experiments], dtype=float)
 
-        # use python's magic to make a random, weighted choice
-        return random.choices(experiments, weights=weights)[0]
+        return experiments[rng.choice(len(experiments), p=weights / weights.sum())]
 
     @staticmethod
     @abstractmethod
@@ -1,18 +1,24 @@
 from abc import ABC # ABC stands for Abstract Base Class
+import asyncio
 import logging
-from typing import List, Dict, Optional
+import random
+from functools import partial
+from typing import List, Dict, Optional, Tuple
 
 import aioboto3
-from aiocache import decorators
 from aws_xray_sdk.core import xray_recorder
-from app.models.metrics.metrics_model import MetricsModel
+from app.models.metrics.metrics_cache import MetricsCache
+from app.models.metrics.metrics_model import MetricsModel, MetricsWindow, PRIOR_METRICS_ID
+from app.models.metrics.posterior import DEFAULT_METRICS_WINDOW, get_prior_parameters, is_valid_prior, with_posteriors
 
-import app.cache
 import app.config
+from app.dynamodb import dynamodb_pool
 
 # batch get has a 100 item limit
 # https://docs.aws.amazon.com/amazondynamodb/latest/APIReference/API_BatchGetItem.html
 _DYNAMODB_BATCH_GET_ITEM_LIMIT = 100
+# Upper bound in seconds on the backoff before retrying unprocessed keys
+_MAX_RETRY_DELAY = 1.0
 
 
 def _chunks(index, n=_DYNAMODB_BATCH_GET_ITEM_LIMIT):
@@ -25,11 +31,19 @@ class AbstractMetricsFactory(ABC):
     _dynamodb_endpoint: str = None
     _dynamodb_table: str = None
     _primary_key_name: str = None
+    # Cache shared by all instances of a factory in this worker, which is set by each subclass.
+    metrics_cache: MetricsCache = None
+    # Read capacity units consumed by metrics queries of a factory in this worker
+    consumed_capacity_units: float = 0
 
     def __init__(self, dynamodb_endpoint: str):
         self._dynamodb_endpoint = dynamodb_endpoint
 
-    async def get(self, module_id: str, ids: List[str]) -> Dict[str, 'MetricsModel']:
+    async def get(
+            self,
+            module_id: str,
+            ids: List[str],
+            window: MetricsWindow = DEFAULT_METRICS_WINDOW) -> Dict[str, 'MetricsModel']:
         """
         Get engagement metrics for recommendations or slates.
         - recommendations: The module is a slate that contains the recommendation.
@@ -37,18 +51,26 @@ class AbstractMetricsFactory(ABC):
         - slates: The module is the slate lineup that contains the slate.
                   The primary key is <lineup id>/<slate id>.
 
+        The prior for the module is stored under the reserved id PRIOR_METRICS_ID. It's fetched in the same request
+        and cached in the same way as the other metrics, such that rankers can use it without an additional lookup.
+        The posterior parameters for `window` are set on the returned metrics when they're parsed into the metrics
+        cache, such that rankers only need to sample.
+
         :param module_id: The first part of the primary key
         :param ids: Used in the second part of the primary key.
-        :return: dictionary of ClickdataModel objects keyed on item (i.e. not including the prefix)
+        :param window: period to count opens and impressions over for the posterior
+        :return: dictionary of ClickdataModel objects keyed on item (i.e. not including the prefix), including the
+                 prior under PRIOR_METRICS_ID if it exists
         """
         # Keys are namespaced by the module we are getting data from. First put them in a set to ensure unique keys.
-        keys = list({self._make_key(module_id, i) for i in ids})
+        prior_key = self._make_key(module_id, PRIOR_METRICS_ID)
+        keys = list({*(self._make_key(module_id, i) for i in ids), prior_key})
 
-        metrics = await self._query_cached_metrics(keys, app.config.elasticache["metrics_ttl"])
+        metrics = await self._query_cached_metrics(keys, window, prior_key)
         # Remove "/<modules>" suffix and remove None values
         # TODO: It might be cleaner if this method just returns List[MetricsBaseModel], and callers create the dict
         # of their choosing.
-        metrics = {k.split("/")[0]: self.parse_from_record(v) for k, v in metrics.items() if v is not None}
+        metrics = {k.split("/")[0]: v for k, v in metrics.items() if v is not None}
 
         if not metrics:
             logging.error(f"No metrics for module {module_id} with keys={keys}")
@@ -64,66 +86,136 @@ class AbstractMetricsFactory(ABC):
         return MetricsModel.parse_obj({**value, 'id': value[self._primary_key_name]})
 
     @xray_recorder.capture_async('models.metrics.MetricsBaseModel._query_cached_metrics')
-    async def _query_cached_metrics(self, metrics_keys: List, ttl: int) -> Dict[str, Optional[Dict]]:
+    async def _query_cached_metrics(
+            self,
+            metrics_keys: List[str],
+            window: MetricsWindow,
+            prior_key: str) -> Dict[str, Optional[MetricsModel]]:
         """
-        Queries metrics from cache if available, falling back to the database if they're unavailable in cache.
-
-        HACK: It would be better if this function could be replaced by aiocache's multi_cached decorator,
-              but the decorator fails in our case, because it's started on import, at which time cache isn't initialized
-              yet by app/cache.py. The cache needs to be initialized in the application event loop, so can't be
-              initialized on import. It might be worth to attempt using the decorator again in the future, because the
-              aiocache documentation seems to be doing something every similar, although not with a custom cache.
-              https://aiocache.readthedocs.io/en/latest/decorators.html#multi-cached
+        Gets parsed metrics from the factory's metrics cache, which falls back to memcached and then to the database.
 
-        :param metrics_keys: The keys to query
-        :param ttl: The time in seconds to keep the data in cache.
-        :return: A dictionary where keys are metrics_keys, and values are a metrics dictionary, or None if unavailable.
+        :param metrics_keys: The keys to query, including prior_key
+        :param window: period to count opens and impressions over for the posterior
+        :param prior_key: key of the prior for the module
+        :return: A dictionary where keys are metrics_keys, and values are parsed metrics, or None if unavailable.
         """
-        multi_cache_wrapper = decorators.multi_cached(
-            keys_from_attr="metrics_keys",
-            ttl=ttl,
-            alias=app.cache.metrics_alias)
-
-        multi_cache = multi_cache_wrapper(self._query_metrics)
-
-        # multi_cache will get metrics from cache when available, and call _query_metrics with all missing keys.
-        results = await multi_cache(metrics_keys=metrics_keys)
+        return await self.metrics_cache.get(
+            metrics_keys,
+            window,
+            ttl=app.config.elasticache['metrics_ttl'],
+            fetch=self._query_metrics,
+            parse=partial(self._parse_records, prior_key, window),
+            depends_on=prior_key)
+
+    def _parse_records(
+            self,
+            prior_key: str,
+            window: MetricsWindow,
+            rows: Dict[str, Optional[Dict]],
+            cached: Dict[str, Optional[MetricsModel]]) -> Dict[str, Optional[MetricsModel]]:
+        """
+        Parses rows and sets the posterior parameters for window on them, using the prior of the module. An invalid
+        prior is logged and left out, such that it's only logged when it's parsed, and the default prior is used.
+
+        :param prior_key: key of the prior for the module
+        :param window: period to count opens and impressions over
+        :param rows: rows by key, or None for missing rows
+        :param cached: metrics that were already parsed by key, which contains the prior if it isn't in rows
+        :return: dictionary where all keys of rows are present as keys, and values are parsed metrics or None
+        """
+        metrics = {key: self.parse_from_record(row) for key, row in rows.items() if row is not None}
+        if prior_key in metrics and not is_valid_prior(metrics[prior_key]):
+            invalid_prior = metrics.pop(prior_key)
+            logging.warning(f'Invalid prior {invalid_prior.id} with opens={invalid_prior.trailing_28_day_opens} and '
+                            f'impressions={invalid_prior.trailing_28_day_impressions}, using the default')
 
-        # Map app.cache's NoneValue to None. aiocache treats None as a cache miss, so we need a special token for this.
-        return {k: None if v == app.cache.NoneValue else v for k, v in results.items()}
+        prior = metrics.get(prior_key) if prior_key in rows else cached.get(prior_key)
+        metrics = with_posteriors(metrics, window, get_prior_parameters(prior))
+        return {key: metrics.get(key) for key in rows}
 
     @xray_recorder.capture_async('models.MetricsBaseModel._query_metrics')
     async def _query_metrics(self, metrics_keys: List) -> Dict[str, Optional[Dict]]:
         """
         Queries metrics from the Dynamodb table specified in self._dynamodb_table, using self._primary_key_name.
+        Keys are queried in chunks of at most 100 keys, of which up to app.config.dynamodb['batch_get_concurrency']
+        are queried concurrently.
 
         :param metrics_keys: Primary keys to match against self._primary_key_name
-        :return: Dictionary where all metrics_keys are present as keys, and values are a metrics dictionary or None.
-        """
-        metrics = {}
-
-        async with aioboto3.resource('dynamodb', endpoint_url=self._dynamodb_endpoint) as dynamodb:
-            for keychunk in _chunks(metrics_keys):
-                request = {
-                    self._dynamodb_table: {
-                        "Keys": [{self._primary_key_name: c} for c in keychunk]
-                    }
-                }
-                responses = await dynamodb.batch_get_item(RequestItems=request)
-
-                # TODO: Write a unit test when there are more than 100  rows. It seems this will fail because it's only
-                #
-                for row in responses["Responses"][self._dynamodb_table]:
-                    pk = row[self._primary_key_name]
-                    metrics[pk] = row
-
-                # TODO: We are somewhat confident that every slate and lineup has at least some metrics available by
-                #  now. If this error does not occur in practice, it would be better to change it to an exception.
-                # We're logging an error here because the full request context is available.
-                if not responses["Responses"][self._dynamodb_table]:
-                    logging.info(f"DynamoDB returned no metrics for query {request}")
-
-        return {k: metrics.get(k) for k in metrics_keys}
+        :return: Dictionary where values are a metrics dictionary, or None if the row doesn't exist. Keys that DynamoDB
+                 left unprocessed after all retries are left out, such that they aren't cached as missing.
+        """
+        semaphore = asyncio.Semaphore(app.config.dynamodb['batch_get_concurrency'])
+
+        async with self._dynamodb_resource() as dynamodb:
+            chunk_rows = await asyncio.gather(
+                *(self._batch_get_item(dynamodb, keychunk, semaphore) for keychunk in _chunks(metrics_keys)))
+
+        metrics = {row[self._primary_key_name]: row for rows, _ in chunk_rows for row in rows}
+        unprocessed_keys = {key for _, keys in chunk_rows for key in keys}
+
+        # TODO: We are somewhat confident that every slate and lineup has at least some metrics available by
+        #  now. If this error does not occur in practice, it would be better to change it to an exception.
+        # We're logging an error here because the full request context is available.
+        if not metrics:
+            logging.info(f"DynamoDB returned no metrics for keys {metrics_keys}")
+
+        return {k: metrics.get(k) for k in metrics_keys if k not in unprocessed_keys}
+
+    async def _batch_get_item(
+            self,
+            dynamodb,
+            keys: List[str],
+            semaphore: asyncio.Semaphore) -> Tuple[List[Dict], List[str]]:
+        """
+        Gets the rows for at most 100 keys. DynamoDB may leave keys unprocessed, e.g. when the table is throttled.
+        These are retried up to app.config.dynamodb['batch_get_max_retries'] times, with jittered exponential backoff.
+
+        :param dynamodb: DynamoDB resource
+        :param keys: Primary keys to match against self._primary_key_name
+        :param semaphore: bounds the number of concurrent requests
+        :return: tuple of the rows that exist, and the keys that are still unprocessed after the last retry
+        """
+        request = {
+            self._dynamodb_table: {
+                "Keys": [{self._primary_key_name: c} for c in keys]
+            }
+        }
+        rows = []
+
+        for attempt in range(app.config.dynamodb['batch_get_max_retries'] + 1):
+            if attempt > 0:
+                delay = app.config.dynamodb['batch_get_retry_delay'] * 2 ** (attempt - 1)
+                await asyncio.sleep(random.uniform(0, min(delay, _MAX_RETRY_DELAY)))
+
+            async with semaphore:
+                response = await dynamodb.batch_get_item(RequestItems=request, ReturnConsumedCapacity='TOTAL')
+
+            rows.extend(response["Responses"].get(self._dynamodb_table, []))
+            self._record_consumed_capacity(response.get('ConsumedCapacity', []))
+
+            request = response.get('UnprocessedKeys')
+            if not request:
+                return rows, []
+
+        unprocessed_keys = [key[self._primary_key_name] for key in request[self._dynamodb_table]['Keys']]
+        logging.warning(f'{len(unprocessed_keys)} keys in {self._dynamodb_table} remained unprocessed')
+        return rows, unprocessed_keys
+
+    @classmethod
+    def _record_consumed_capacity(cls, consumed_capacity: List[Dict]):
+        """
+        Adds the capacity units consumed by a request to cls.consumed_capacity_units, which is kept per factory.
+        """
+        cls.consumed_capacity_units += sum(c.get('CapacityUnits', 0) for c in consumed_capacity)
+
+    def _dynamodb_resource(self):
+        """
+        :return: async context manager for the worker's shared DynamoDB resource, or for a new resource if this
+                 factory connects to a different endpoint
+        """
+        if self._dynamodb_endpoint == dynamodb_pool.endpoint_url:
+            return dynamodb_pool.resource()
+        return aioboto3.resource('dynamodb', endpoint_url=self._dynamodb_endpoint)
 
     def _make_key(self, module: str, item_id: str) -> str:
         """
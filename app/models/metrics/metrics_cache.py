@@ -0,0 +1,115 @@
+import logging
+
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional
+
+from aiocache import caches
+
+import app.cache
+from app.models.metrics.metrics_model import MetricsModel
+
+# Prefix of metrics keys in memcached. Bump the version when the cached format changes, such that workers running
+# different releases during a deploy don't read or overwrite each other's entries.
+MEMCACHED_KEY_PREFIX = 'metrics:v2:'
+
+
+class MetricsCache:
+    """
+    Caches parsed metrics by primary key and metrics window in the memory of each worker, in front of memcached. Keys
+    that aren't in memory are fetched from memcached in a single multi-get, and only the keys that aren't in memcached
+    either are fetched from the database and written back to memcached. Rows are parsed once per window, when they
+    enter the cache, such that the posterior for the window is computed once.
+
+    Missing metrics are cached as well, such that they aren't queried on every request, but metrics that couldn't be
+    fetched aren't. Cached metrics are immutable, and are shared by all requests without copying them.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        """
+        :param maxsize: maximum number of metrics in memory, 0 disables the in-memory cache
+        :param ttl: time in seconds to keep metrics in memory
+        """
+        self._local = app.cache.LocalTTLCache(maxsize=maxsize, ttl=ttl)
+        # Number of keys that were found in memory, found in memcached, or fetched from the database.
+        self.local_hits = 0
+        self.memcached_hits = 0
+        self.misses = 0
+
+    async def get(
+            self,
+            keys: List[str],
+            window: Hashable,
+            ttl: int,
+            fetch: Callable[[List[str]], Awaitable[Dict[str, Optional[Dict]]]],
+            parse: Callable[[Dict[str, Optional[Dict]], Dict[str, Optional[MetricsModel]]],
+                            Dict[str, Optional[MetricsModel]]],
+            depends_on: Optional[str] = None) -> Dict[str, Optional[MetricsModel]]:
+        """
+        :param keys: primary keys of the metrics
+        :param window: metrics window that parse computes the posterior for
+        :param ttl: time in seconds to keep fetched metrics in memcached
+        :param fetch: function that queries rows for a list of keys from the database, and returns None for
+                      missing rows. Keys that it leaves out, e.g. because the table is throttled, aren't cached.
+        :param parse: function that parses rows that weren't in memory, given the rows by key and the metrics that were
+                      found in memory by key, and returns parsed metrics or None by key
+        :param depends_on: optional key that parse needs to parse the other keys, e.g. the prior. If it couldn't be
+                           fetched, the parsed metrics are returned, but not kept in memory.
+        :return: dictionary where all keys are present as keys, and values are metrics or None if unavailable
+        """
+        metrics = {}
+        local_misses = []
+        for key in keys:
+            value = self._local.get((key, window))
+            if value is None:
+                local_misses.append(key)
+            else:
+                metrics[key] = None if value is app.cache.NoneValue else value
+        self.local_hits += len(keys) - len(local_misses)
+
+        if not local_misses:
+            return metrics
+
+        cache = caches.get(app.cache.metrics_alias)
+        try:
+            rows = await cache.multi_get([MEMCACHED_KEY_PREFIX + key for key in local_misses])
+        except Exception:
+            logging.exception('Failed to get metrics from memcached')
+            rows = [None] * len(local_misses)
+
+        rows = dict(zip(local_misses, rows))
+        fetch_keys = [key for key, row in rows.items() if row is None]
+        self.memcached_hits += len(local_misses) - len(fetch_keys)
+        self.misses += len(fetch_keys)
+
+        unknown_keys = set()
+        if fetch_keys:
+            fetched = await fetch(fetch_keys)
+            unknown_keys.update(key for key in fetch_keys if key not in fetched)
+            rows.update((key, app.cache.NoneValue if row is None else row) for key, row in fetched.items())
+            try:
+                await cache.multi_set([(MEMCACHED_KEY_PREFIX + key, rows[key]) for key in fetched], ttl=ttl)
+            except Exception:
+                logging.exception('Failed to set metrics in memcached')
+
+        rows = {key: None if row is app.cache.NoneValue else row for key, row in rows.items()}
+        keep = depends_on not in unknown_keys
+        for key, value in parse(rows, metrics).items():
+            if keep and key not in unknown_keys:
+                self._local.set((key, window), app.cache.NoneValue if value is None else value)
+            metrics[key] = value
+
+        return metrics
+
+    def get_hit_ratios(self) -> Dict[str, Optional[float]]:
+        """
+        :return: fractions of keys that were found in memory and in memcached, or None if no keys were requested
+        """
+        lookups = self.local_hits + self.memcached_hits + self.misses
+        if lookups == 0:
+            return {'local': None, 'memcached': None}
+        return {'local': self.local_hits / lookups, 'memcached': self.memcached_hits / lookups}
+
+    def clear(self):
+        """
+        Clears metrics from memory. Metrics in memcached aren't affected.
+        """
+        self._local.clear()
@@ -1,7 +1,34 @@
-from typing import Dict
+from enum import Enum
+from typing import Tuple
 
 from pydantic import BaseModel
 
+# Reserved id under which the prior for a slate or lineup is stored, alongside the metrics of its items or slates.
+# The prior's alpha parameter is stored as opens, and alpha + beta as impressions.
+PRIOR_METRICS_ID = 'default'
+
+
+class MetricsWindow(Enum):
+    """
+    Period over which opens and impressions are counted. DECAYED blends all windows, weighing recent engagement more.
+    """
+    TRAILING_1_DAY = 1
+    TRAILING_7_DAYS = 7
+    TRAILING_14_DAYS = 14
+    TRAILING_28_DAYS = 28
+    DECAYED = 'decayed'
+
+
+# The decayed window weighs the engagement in each period between two consecutive windows, e.g. between 1 and 7 days
+# ago, half as much as the engagement in the more recent period before it.
+DECAYED_WINDOW_WEIGHTS = {
+    MetricsWindow.TRAILING_1_DAY: 1.0,
+    MetricsWindow.TRAILING_7_DAYS: 0.5,
+    MetricsWindow.TRAILING_14_DAYS: 0.25,
+    MetricsWindow.TRAILING_28_DAYS: 0.125,
+}
+
+
 # opens and impressions could be int, but we are leaving as float as we may store slate level prior
 # parameters in dynamodb using a predefined key, and these will be floats
 class MetricsModel(BaseModel):
@@ -16,3 +43,29 @@ class MetricsModel(BaseModel):
     trailing_28_day_impressions: float
     created_at: int = None
     expires_at: int = None
+    # Parameters of the beta distribution for the CTR, which combines the prior with the opens and impressions in a
+    # window. These are set by the metrics factory when metrics are parsed, such that rankers only need to sample.
+    posterior_alpha: float = None
+    posterior_beta: float = None
+
+    class Config:
+        # Parsed metrics are shared by all requests through the metrics cache.
+        allow_mutation = False
+
+    def get_counts(self, window: MetricsWindow) -> Tuple[float, float]:
+        """
+        :param window: period to count opens and impressions over
+        :return: tuple of opens and impressions
+        """
+        if window == MetricsWindow.DECAYED:
+            opens = impressions = 0.0
+            previous_opens = previous_impressions = 0.0
+            for period_window, weight in DECAYED_WINDOW_WEIGHTS.items():
+                period_opens, period_impressions = self.get_counts(period_window)
+                opens += weight * (period_opens - previous_opens)
+                impressions += weight * (period_impressions - previous_impressions)
+                previous_opens, previous_impressions = period_opens, period_impressions
+            return opens, impressions
+
+        return (getattr(self, f'trailing_{window.value}_day_opens'),
+                getattr(self, f'trailing_{window.value}_day_impressions'))
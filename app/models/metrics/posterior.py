@@ -0,0 +1,84 @@
+import logging
+
+from typing import Dict, Optional, Tuple
+
+from app.models.metrics.metrics_model import MetricsModel, MetricsWindow, PRIOR_METRICS_ID
+
+# Prior used for slates and lineups without a valid prior in their metrics
+DEFAULT_ALPHA_PRIOR = 0.02
+DEFAULT_BETA_PRIOR = 1.0
+# Lower bound on posterior parameters, which must be strictly positive.
+MIN_POSTERIOR_PARAMETER = 1e-18
+# Window that metrics are counted over, unless an experiment configures a different one.
+DEFAULT_METRICS_WINDOW = MetricsWindow.TRAILING_28_DAYS
+# Ways that thompson sampling can sample from posteriors. 'exact' samples all items from their beta posterior.
+# 'approximate' samples items with many opens and non-opens from a normal distribution with the same mean and variance,
+# which is cheaper and practically identical.
+THOMPSON_SAMPLING_SAMPLERS = ('exact', 'approximate')
+# Sampler that thompson sampling uses, unless an experiment configures a different one.
+DEFAULT_THOMPSON_SAMPLING_SAMPLER = 'exact'
+
+
+def get_prior(metrics: Dict[str, MetricsModel]) -> Tuple[float, float]:
+    """
+    Gets the parameters of the beta distribution that's used as the prior for the CTR of the items being ranked.
+    Slate and lineup specific priors are stored under PRIOR_METRICS_ID, and fetched together with the item metrics.
+
+    :param metrics: a dict with item_id as key and dynamodb row modeled as ClickDataModel
+    :return: tuple of alpha and beta parameters, falling back to the defaults if no valid prior is available
+    """
+    return get_prior_parameters(metrics.get(PRIOR_METRICS_ID))
+
+
+def get_prior_parameters(prior: Optional[MetricsModel]) -> Tuple[float, float]:
+    """
+    :param prior: metrics stored under PRIOR_METRICS_ID, or None if the slate or lineup has no prior
+    :return: tuple of alpha and beta parameters of the prior, falling back to the defaults if prior isn't valid
+    """
+    if prior is not None and is_valid_prior(prior):
+        return _prior_parameters(prior)
+
+    return DEFAULT_ALPHA_PRIOR, DEFAULT_BETA_PRIOR
+
+
+def is_valid_prior(prior: MetricsModel) -> bool:
+    """
+    :param prior: metrics stored under PRIOR_METRICS_ID
+    :return: True if both parameters of the prior are strictly positive
+    """
+    alpha_prior, beta_prior = _prior_parameters(prior)
+    return alpha_prior > 0 and beta_prior > 0
+
+
+def _prior_parameters(prior: MetricsModel) -> Tuple[float, float]:
+    """
+    :return: tuple of alpha and beta parameters, which are stored as opens and impressions in the 28 day window
+    """
+    return prior.trailing_28_day_opens, prior.trailing_28_day_impressions - prior.trailing_28_day_opens
+
+
+def with_posteriors(
+        metrics: Dict[str, MetricsModel],
+        window: MetricsWindow = DEFAULT_METRICS_WINDOW,
+        prior: Optional[Tuple[float, float]] = None) -> Dict[str, MetricsModel]:
+    """
+    :param metrics: a dict with item_id as key and dynamodb row modeled as ClickDataModel
+    :param window: period to count opens and impressions over
+    :param prior: tuple of alpha and beta parameters of the prior, which defaults to the prior in metrics
+    :return: a dict with the same keys as metrics, and copies of the metrics with the posterior parameters set
+    """
+    alpha_prior, beta_prior = get_prior(metrics) if prior is None else prior
+    return {
+        key: item_metrics.copy(update=dict(zip(
+            ('posterior_alpha', 'posterior_beta'),
+            _combine(*item_metrics.get_counts(window), alpha_prior, beta_prior))))
+        for key, item_metrics in metrics.items()
+    }
+
+
+def _combine(opens: float, impressions: float, alpha_prior: float, beta_prior: float) -> Tuple[float, float]:
+    """
+    :return: tuple of alpha and beta parameters of the posterior, which combines the prior with opens and impressions
+    """
+    return (max(opens + alpha_prior, MIN_POSTERIOR_PARAMETER),
+            max(impressions - opens + beta_prior, MIN_POSTERIOR_PARAMETER))
@@ -3,20 +3,29 @@ from typing import List, Dict
 from aws_xray_sdk.core import xray_recorder
 
 import app.config
-from app.models.metrics.metrics_model import MetricsModel
+from app.models.metrics.metrics_cache import MetricsCache
+from app.models.metrics.metrics_model import MetricsModel, MetricsWindow
+from app.models.metrics.posterior import DEFAULT_METRICS_WINDOW
 from app.models.metrics.abstract_metrics_factory import AbstractMetricsFactory
 
 
 class RecommendationMetricsFactory(AbstractMetricsFactory):
     _dynamodb_table: str = app.config.dynamodb['recommendation_metrics']['table']
     _primary_key_name: str = app.config.dynamodb['recommendation_metrics']['pk']
+    metrics_cache: MetricsCache = MetricsCache(maxsize=app.config.elasticache['metrics_local_cache_size'],
+                                               ttl=app.config.elasticache['metrics_local_ttl'])
 
     @xray_recorder.capture_async('models.metrics.RecommendationMetricsModel.get')
-    async def get(self, slate_id: str, item_ids: List[str]) -> Dict[str, 'MetricsModel']:
+    async def get(
+            self,
+            slate_id: str,
+            item_ids: List[str],
+            window: MetricsWindow = DEFAULT_METRICS_WINDOW) -> Dict[str, 'MetricsModel']:
         """
         Get metrics for item recommendations in the given slate.
 
         :param item_ids:
+        :param window: period to count opens and impressions over for the posterior
         :type slate_id:
         """
-        return await super().get(slate_id, item_ids)
+        return await super().get(slate_id, item_ids, window)
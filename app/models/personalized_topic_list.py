@@ -1,10 +1,15 @@
-import aiohttp
 import logging
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
 from aws_xray_sdk.core import xray_recorder
 from typing import List, Dict
 
 import app.config
+from app.cache import LocalTTLCache
+from app.recit import recit_client
+
+# Topic profiles by user id, such that repeated requests for the same user don't call RecIt.
+user_profile_cache = LocalTTLCache(maxsize=app.config.recit['user_profile_cache_size'],
+                                   ttl=app.config.recit['user_profile_ttl'])
 
 
 class PersonalizedTopicElement(BaseModel):
@@ -15,6 +20,13 @@ class PersonalizedTopicElement(BaseModel):
 class PersonalizedTopicList(BaseModel):
     curator_topics: List[PersonalizedTopicElement]
     user_id: str = None
+    # Score for each curator topic label in curator_topics. This is derived from curator_topics when the model is
+    # created, such that it's computed once per cached topic profile instead of on every ranking.
+    topic_scores: Dict[str, float] = None
+
+    @validator('topic_scores', always=True)
+    def set_topic_scores(cls, v, values):
+        return {t.curator_topic_label: t.score for t in values.get('curator_topics', [])}
 
     @staticmethod
     @xray_recorder.capture_async('models.personalized_topic_list.get')
@@ -22,27 +34,35 @@ class PersonalizedTopicList(BaseModel):
         """
         A request including the user_id is issued to RecIt which returns a list of ranked curator topic labels
         personalized to the user_id.  The output will be a list of reordered topic labels based on affinity to items
-        in the user's saved list.
+        in the user's saved list. Topic profiles are cached in memory for app.config.recit['user_profile_ttl'] seconds.
         :param user_id: str identifying user
         :return: List with elements [<curatorTopicLabel>, score]
         """
         if not user_id:
             raise ValueError("user_id must be provided for personalized slate lineups")
 
-        # TODO: There should really just be one session shared, not sure how to do this in gunicorn thou
-        async with aiohttp.ClientSession() as session:
-            url = f'{app.config.recit["endpoint_url"]}/v1/user_profile/{user_id}?predict_topics=true'
-            async with session.get(url) as resp:
-                if resp.status == 200:
-                    j1 = await resp.json()
-                    return PersonalizedTopicList.parse_recit_response(user_id, j1)
-                elif resp.status == 404:
-                    logging.info(f"RecIt /v1/user_profile does not have a user profile for user id {user_id}")
-                    # Return empty list when user does not exist in RecIt.
-                    return PersonalizedTopicList(curator_topics=[], user_id=user_id)
-                else:
-                    # Unexpected response code
-                    raise Exception(f"RecIt responded with {resp.status} for {url}")
+        personalized_topics = user_profile_cache.get(user_id)
+        if personalized_topics is None:
+            personalized_topics = await PersonalizedTopicList._get_from_recit(user_id)
+            user_profile_cache.set(user_id, personalized_topics)
+
+        return personalized_topics
+
+    @staticmethod
+    async def _get_from_recit(user_id: str) -> 'PersonalizedTopicList':
+        """Gets the topic profile for `user_id` from RecIt. This makes a network call to RecIt."""
+        url = f'{app.config.recit["endpoint_url"]}/v1/user_profile/{user_id}?predict_topics=true'
+        async with recit_client.get(url) as resp:
+            if resp.status == 200:
+                j1 = await resp.json()
+                return PersonalizedTopicList.parse_recit_response(user_id, j1)
+            elif resp.status == 404:
+                logging.info(f"RecIt /v1/user_profile does not have a user profile for user id {user_id}")
+                # Return empty list when user does not exist in RecIt.
+                return PersonalizedTopicList(curator_topics=[], user_id=user_id)
+            else:
+                # Unexpected response code
+                raise Exception(f"RecIt responded with {resp.status} for {url}")
 
     @staticmethod
     def parse_recit_response(user_id: str, response: Dict) -> "PersonalizedTopicList":
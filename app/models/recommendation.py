@@ -1,5 +1,3 @@
-import aioboto3
-
 from asyncio import gather
 
 import logging
@@ -7,15 +5,20 @@ from aws_xray_sdk.core import xray_recorder
 from boto3.dynamodb.conditions import Key
 from enum import Enum
 from pydantic import BaseModel
+from functools import partial
+from typing import Dict, Optional
 
 from app.config import dynamodb as dynamodb_config
+from app.dynamodb import dynamodb_pool
 # Needs to exist for pydantic to resolve the model field "item: ItemModel" in the RecommendationModel
 from app.graphql.item import Item
+from app.models.candidate_columns import CandidateColumns
 from app.models.candidate_set import candidate_set_factory
+from app.models.metrics.metrics_model import MetricsModel, MetricsWindow
 from app.models.metrics.recommendation_metrics_factory import RecommendationMetricsFactory
 from app.models.item import ItemModel
 from app.models.slate_experiment import SlateExperimentModel
-from app.rankers import get_ranker
+from app.rankers import RankerInput
 
 
 class RecommendationType(Enum):
@@ -66,7 +69,7 @@ class RecommendationModel(BaseModel):
         :param recommendation_type: the type of recommendations we want, e.g. algorithmic, curated
         :return: list of RecommendationModel objects
         """
-        async with aioboto3.resource('dynamodb', endpoint_url=dynamodb_config['endpoint_url']) as dynamodb:
+        async with dynamodb_pool.resource() as dynamodb:
             table = await dynamodb.Table(dynamodb_config['candidates']['table'])
             key_condition = Key('topic_id-type').eq(topic_id + '|' + recommendation_type.value)
             response = await table.query(IndexName='topic_id-type', Limit=1, KeyConditionExpression=key_condition,
@@ -78,39 +81,54 @@ class RecommendationModel(BaseModel):
 
     @staticmethod
     async def get_recommendations_from_experiment(
-            slate_id: str, experiment: SlateExperimentModel, user_id: str) -> ['RecommendationModel']:
+            slate_id: str,
+            experiment: SlateExperimentModel,
+            user_id: str,
+            recommendation_count: Optional[int] = None) -> ['RecommendationModel']:
         """
         Retrieves a list of RecommendationModel objects for on the given slate experiment.
         :param slate_id: The id of the slate to which this experiment belongs
         :param experiment: a SlateExperimentModel instance
         :param user_id: ID of the user to generate recommendations for
+        :param recommendation_count: optional number of recommendations that the caller will consume. If set, at most
+                                     this many recommendations are returned.
         :return: a list of RecommendationModel instances
         """
         # for each candidate set id, get the candidate set record from the db
         candidate_sets = await gather(
             *(candidate_set_factory(cs_id).get(cs_id, user_id) for cs_id in experiment.candidate_sets))
 
-        recommendations = []
-        # get the recommendations
-        for candidate_set in candidate_sets:
-            for candidate in candidate_set.candidates:
-                recommendations.append(RecommendationModel.candidate_dict_to_recommendation(candidate.dict()))
+        # rank the candidates as columns, and only create recommendations for the candidates that are returned
+        candidates = CandidateColumns.from_candidates(
+            [candidate for candidate_set in candidate_sets for candidate in candidate_set.candidates])
 
         # apply rankers from the slate experiment on the candidate set's candidates
-        for ranker in experiment.rankers:
-            if ranker == 'thompson-sampling':
-                # thompson sampling takes two specific arguments so it needs to be handled differently
-                recommendations = await RecommendationModel.__thompson_sample(slate_id, recommendations)
-                continue
-            recommendations = get_ranker(ranker)(recommendations)
-
-        return recommendations
+        fetchers = {
+            RankerInput.METRICS: partial(RecommendationModel.__get_click_data, slate_id, experiment.metrics_window)
+        }
+        # the blocklist ranker also filters the items that are only blocked on this slate
+        ranker_kwargs = {
+            'blocklist': {'slate_id': slate_id},
+            'thompson-sampling': {'sampler': experiment.thompson_sampling_sampler},
+        }
+        if not experiment.is_personalized:
+            # rankings only depend on the candidates and their metrics, so they can be presampled
+            ranker_kwargs['thompson-sampling']['pool_key'] = (slate_id, experiment.id)
+        candidates = await experiment.pipeline.run(candidates, fetchers, count=recommendation_count,
+                                                   ranker_kwargs=ranker_kwargs)
+        if recommendation_count is not None:
+            candidates = candidates[:recommendation_count]
+
+        return list(map(RecommendationModel.candidate_dict_to_recommendation, candidates.rows()))
 
     @staticmethod
-    async def __thompson_sample(slate_id: str, recommendations: ['RecommendationModel']) -> ['RecommendationModel']:
+    async def __get_click_data(
+            slate_id: str,
+            window: MetricsWindow,
+            candidates: CandidateColumns) -> Dict[str, MetricsModel]:
         """
-        Special processing for handling the thompson sampling ranker. Retrieves click data for the items being ranked
-        and uses that for thompson sampling algorithm with beta distributions.
+        Retrieves click data for the items being ranked, which the thompson sampling ranker uses to rank items by
+        sampling from beta distributions.
 
         Thompson sampling is a probabilistic approach to estimating the CTR of an item.  It combines historical data
         about item CTR on a specific recommendation surface with per-item click and impression data to form
@@ -123,13 +141,15 @@ class RecommendationModel(BaseModel):
         that have already demonstrated high performance (in terms of CTR).
 
         :param slate_id:
-        :param recommendations: a list of RecommendationModel instances
-        :return: a list of RecommendationModel instances
+        :param window: period to count opens and impressions over
+        :param candidates: the candidates being ranked
+        :return: click data keyed by item id
         """
-        item_ids = [recommendation.item.item_id for recommendation in recommendations]
+        item_ids = candidates.item_ids.tolist()
         try:
-            click_data = await RecommendationMetricsFactory(dynamodb_config["endpoint_url"]).get(slate_id, item_ids)
+            click_data = await RecommendationMetricsFactory(dynamodb_config["endpoint_url"]).get(
+                slate_id, item_ids, window)
         except ValueError:
             logging.warning(f'No click data found for {slate_id = } {item_ids = }')
             click_data = {}
-        return get_ranker('thompson-sampling')(recommendations, click_data)
+        return click_data
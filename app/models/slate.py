@@ -8,6 +8,7 @@ from typing import List, Optional
 from app.models.recommendation import RecommendationModel
 from app.models.slate_config import SlateConfigModel
 from app.models.slate_experiment import SlateExperimentModel
+from app.rng import derive_rng
 import app.config
 
 
@@ -94,6 +95,9 @@ class SlateModel(BaseModel):
         :return: a SlateModel object
         """
 
+        # Slates are gathered concurrently, so each slate draws from its own generator to replay a seeded request.
+        derive_rng(slate_config.id)
+
         experiment = None
         recommendations = []
 
@@ -109,9 +113,11 @@ class SlateModel(BaseModel):
         # If we have a > 0 recommendation count lets get some recommendations
         if recommendation_count > 0:
             experiment = SlateExperimentModel.choose_experiment(slate_config.experiments)
-            recommendations = await RecommendationModel.get_recommendations_from_experiment(slate_config.id,
-                                                                                            experiment,
-                                                                                            user_id)
+            recommendations = await RecommendationModel.get_recommendations_from_experiment(
+                slate_config.id,
+                experiment,
+                user_id,
+                recommendation_count=recommendation_count)
             recommendations = recommendations[:recommendation_count]
 
         return SlateModel(
@@ -1,6 +1,9 @@
 from typing import List
 
+from app.models.candidate_set import RECIT_PREFIX
 from app.models.experiment import ExperimentModel
+from app.models.metrics.metrics_model import MetricsWindow
+from app.models.metrics.posterior import DEFAULT_METRICS_WINDOW, DEFAULT_THOMPSON_SAMPLING_SAMPLER
 
 
 class SlateExperimentModel(ExperimentModel):
@@ -8,14 +11,19 @@ class SlateExperimentModel(ExperimentModel):
     Models a slate experiment
     """
     def __init__(self, experiment_id: str, description: str, rankers: List[str], candidate_sets: List[str],
-                 weight: float = ExperimentModel.DEFAULT_WEIGHT):
-        ExperimentModel.__init__(self, experiment_id, description, rankers, weight)
+                 weight: float = ExperimentModel.DEFAULT_WEIGHT,
+                 metrics_window: MetricsWindow = DEFAULT_METRICS_WINDOW,
+                 thompson_sampling_sampler: str = DEFAULT_THOMPSON_SAMPLING_SAMPLER):
+        ExperimentModel.__init__(self, experiment_id, description, rankers, weight, metrics_window,
+                                 thompson_sampling_sampler)
 
         # validate candidate sets
         if len(candidate_sets) < 1:
             raise ValueError('no candidate sets provided for experiment')
 
         self.candidate_sets = candidate_sets
+        # RecIt candidate sets are personalized, so their candidates can differ per user
+        self.is_personalized = any(cs_id.startswith(RECIT_PREFIX) for cs_id in candidate_sets)
 
     @staticmethod
     def load_from_dict(experiment_dict: dict) -> 'SlateExperimentModel':
@@ -32,4 +40,6 @@ class SlateExperimentModel(ExperimentModel):
         weight = experiment_dict.get('weight', ExperimentModel.DEFAULT_WEIGHT)
 
         return SlateExperimentModel(experiment_id, experiment_dict["description"], experiment_dict["rankers"],
-                                    experiment_dict["candidateSets"], weight)
+                                    experiment_dict["candidateSets"], weight,
+                                    ExperimentModel.parse_metrics_window(experiment_dict),
+                                    ExperimentModel.parse_thompson_sampling_sampler(experiment_dict))
@@ -66,7 +66,8 @@ class SlateLineupModel(BaseModel):
 
         # get the requested slate_lineup from the config using the slate_lineup_id
         slate_configs = await SlateLineupConfigModel.get_slate_configs_from_experiment(slate_lineup_id, experiment,
-                                                                                       user_id=user_id)
+                                                                                       user_id=user_id,
+                                                                                       slate_count=slate_count)
 
         # Client requested only a certain number of slates, so after it was ranked, split the list to the count
         slate_configs = slate_configs[:slate_count]
@@ -3,13 +3,13 @@ import os
 
 from typing import Optional, List
 
-from app.config import JSON_DIR
+from app.config import JSON_DIR, dynamodb as dynamodb_config
 from app.json.utils import parse_to_dict
 from app.models.metrics.slate_metrics_factory import SlateMetricsFactory
 from app.models.slate_lineup_experiment import SlateLineupExperimentModel
 from app.models.slate_config import SlateConfigModel
-from app.rankers import get_ranker
 from app.models.personalized_topic_list import PersonalizedTopicList
+from app.rankers import RankerInput
 
 
 class SlateLineupConfigModel:
@@ -99,13 +99,14 @@ class SlateLineupConfigModel:
     @staticmethod
     async def get_slate_configs_from_experiment(
             slate_lineup_id: str, experiment: SlateLineupExperimentModel,
-            user_id: Optional[str] = None) -> List[SlateConfigModel]:
+            user_id: Optional[str] = None, slate_count: Optional[int] = None) -> List[SlateConfigModel]:
         """
         Gets a slate config from the list of slate configs
 
         :param slate_lineup_id:
         :param experiment: SlateLineupExperimentModel object
         :param user_id: user_id for personalized rankers
+        :param slate_count: optional number of slate configs that will be used, such that rankers can skip the rest
         :return: a list of SlateConfigModel objects
         """
         # get slate_ids from the experiment
@@ -118,23 +119,19 @@ class SlateLineupConfigModel:
         # apply rankers from the slate_lineup experiment on the slate_configs
         # each experiment in the slate_lineup has 0 - x number of rankers which will
         # change the order of the slate_configs within the slate_lineup's experiment
-        for ranker in experiment.rankers:
-            ranker_kwargs = {}
-            if ranker == 'thompson-sampling':
-                # thompson sampling requires slate metrics
-                ranker_kwargs = {
-                    'metrics': await SlateMetricsFactory().get(slate_lineup_id, [s.id for s in slate_configs])
-                }
-            elif ranker == "personalized-topics":
-                ranker_kwargs = {
-                    "personalized_topics": await PersonalizedTopicList.get(user_id)
-                }
-            # slate configs get ranked and re-assigned for every ranker within the experiment
-            # for example we might first take the top 15 slate configs(that is one ranker)
-            # and then randomize those 15 (which would be the second ranker)
-            slate_configs = get_ranker(ranker)(slate_configs, **ranker_kwargs)
-
-        return slate_configs
+        # for example we might first take the top 15 slate configs(that is one ranker)
+        # and then randomize those 15 (which would be the second ranker)
+        fetchers = {
+            # thompson sampling requires slate metrics
+            RankerInput.METRICS: lambda configs: SlateMetricsFactory(dynamodb_config['endpoint_url']).get(
+                slate_lineup_id, [s.id for s in configs], experiment.metrics_window),
+            RankerInput.PERSONALIZED_TOPICS: lambda configs: PersonalizedTopicList.get(user_id),
+        }
+        ranker_kwargs = {'thompson-sampling': {'sampler': experiment.thompson_sampling_sampler}}
+        if not experiment.is_personalized:
+            # thompson sampling ranks the same slate configs for all users, so its rankings can be presampled
+            ranker_kwargs['thompson-sampling']['pool_key'] = (slate_lineup_id, experiment.id)
+        return await experiment.pipeline.run(slate_configs, fetchers, count=slate_count, ranker_kwargs=ranker_kwargs)
 
 
 def validate_lineup_config(lineup_configs: List[SlateLineupConfigModel]) -> None:
@@ -1,6 +1,8 @@
 from typing import List
 
 from app.models.experiment import ExperimentModel
+from app.models.metrics.metrics_model import MetricsWindow
+from app.models.metrics.posterior import DEFAULT_METRICS_WINDOW, DEFAULT_THOMPSON_SAMPLING_SAMPLER
 from app.models.slate_config import SlateConfigModel
 
 
@@ -9,14 +11,20 @@ class SlateLineupExperimentModel(ExperimentModel):
     Models a slate_lineup experiment
     """
     def __init__(self, experiment_id: str, description: str, rankers: List[str],slates: List[str],
-                 weight: float = ExperimentModel.DEFAULT_WEIGHT):
-        ExperimentModel.__init__(self, experiment_id, description, rankers, weight)
+                 weight: float = ExperimentModel.DEFAULT_WEIGHT,
+                 metrics_window: MetricsWindow = DEFAULT_METRICS_WINDOW,
+                 thompson_sampling_sampler: str = DEFAULT_THOMPSON_SAMPLING_SAMPLER):
+        ExperimentModel.__init__(self, experiment_id, description, rankers, weight, metrics_window,
+                                 thompson_sampling_sampler)
 
         # validate slates
         if len(slates) < 1:
             raise ValueError('no slates provided for experiment')
 
         self.slates = slates
+        # Slate configs are the same for all users, unless a personalized ranker reorders them before they're ranked
+        # by thompson sampling.
+        self.is_personalized = self.pipeline.is_personalized_before('thompson-sampling')
 
     @staticmethod
     def load_from_dict(experiment_dict: dict) -> 'SlateLineupExperimentModel':
@@ -33,7 +41,9 @@ class SlateLineupExperimentModel(ExperimentModel):
         weight = experiment_dict.get('weight', ExperimentModel.DEFAULT_WEIGHT)
 
         return SlateLineupExperimentModel(experiment_id, experiment_dict["description"], experiment_dict["rankers"],
-                                     experiment_dict["slates"], weight)
+                                     experiment_dict["slates"], weight,
+                                     ExperimentModel.parse_metrics_window(experiment_dict),
+                                     ExperimentModel.parse_thompson_sampling_sampler(experiment_dict))
 
     @staticmethod
     def slate_id_exists(slate_id: str) -> bool:
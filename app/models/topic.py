@@ -1,5 +1,3 @@
-import aioboto3
-
 from aws_xray_sdk.core import xray_recorder
 from boto3.dynamodb.conditions import Key
 from enum import Enum
@@ -7,6 +5,7 @@ from pydantic import BaseModel
 from typing import Optional
 
 from app.config import dynamodb as dynamodb_config
+from app.dynamodb import dynamodb_pool
 
 
 class PageType(str, Enum):
@@ -43,7 +42,7 @@ class TopicModel(BaseModel):
 
         :return: a list of TopicModel objects
         """
-        async with aioboto3.resource('dynamodb', endpoint_url=dynamodb_config['endpoint_url']) as dynamodb:
+        async with dynamodb_pool.resource() as dynamodb:
             table = await dynamodb.Table(dynamodb_config['metadata']['table'])
             response = await table.scan()
         return sorted(list(map(TopicModel.parse_obj, response['Items'])), key=lambda topic: topic.slug)
@@ -57,7 +56,7 @@ class TopicModel(BaseModel):
         :param slug: string slug of the topic to be retrieved
         :return: a TopicModel object
         """
-        async with aioboto3.resource('dynamodb', endpoint_url=dynamodb_config['endpoint_url']) as dynamodb:
+        async with dynamodb_pool.resource() as dynamodb:
             table = await dynamodb.Table(dynamodb_config['metadata']['table'])
             response = await table.query(IndexName='slug', Limit=1, KeyConditionExpression=Key('slug').eq(slug))
         if response['Items']:
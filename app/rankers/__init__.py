@@ -1,8 +1,39 @@
+from enum import Enum
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, NamedTuple
+
+
+class RankerInput(Enum):
+    """
+    Data that a ranker needs in addition to the items it ranks. The value is the keyword argument that the ranker
+    takes the data in.
+    """
+    # Metrics for the items being ranked: slate metrics when ranking slate configs, and item metrics when ranking
+    # recommendations.
+    METRICS = 'metrics'
+    # The topic profile of the user that items are ranked for.
+    PERSONALIZED_TOPICS = 'personalized_topics'
+
+
+# Inputs that differ per user, such that rankings that depend on them can't be shared between users.
+PER_USER_INPUTS = frozenset({RankerInput.PERSONALIZED_TOPICS})
+
+
+class Ranker(NamedTuple):
+    func: Callable
+    inputs: FrozenSet[RankerInput] = frozenset()
+
+
 def get_ranker(name):
-    return get_all_rankers()[name]
+    return get_all_rankers()[name].func
+
+
+def get_ranker_inputs(name) -> FrozenSet[RankerInput]:
+    return get_all_rankers()[name].inputs
 
 
-def get_all_rankers():
+@lru_cache(maxsize=None)
+def get_all_rankers() -> Dict[str, Ranker]:
     # Importing algorithms within the function here ensures that when rankers are imported
     # they do not cause unwanted circular imports.
     #
@@ -21,17 +52,19 @@ def get_all_rankers():
         top15,
         top30,
         top45,
+        blocklist,
         thompson_sampling,
         spread_publishers,
         personalize_topic_slates
     )
 
     return {
-        'top5': top5,
-        'top15': top15,
-        'top30': top30,
-        'top45': top45,
-        'thompson-sampling': thompson_sampling,
-        'personalized-topics': personalize_topic_slates,
-        'pubspread': spread_publishers
+        'top5': Ranker(top5),
+        'top15': Ranker(top15),
+        'top30': Ranker(top30),
+        'top45': Ranker(top45),
+        'blocklist': Ranker(blocklist),
+        'thompson-sampling': Ranker(thompson_sampling, frozenset({RankerInput.METRICS})),
+        'personalized-topics': Ranker(personalize_topic_slates, frozenset({RankerInput.PERSONALIZED_TOPICS})),
+        'pubspread': Ranker(spread_publishers)
     }
@@ -1,22 +1,25 @@
+import heapq
 import logging
-import json
 
+import numpy as np
 from aws_xray_sdk.core import xray_recorder
 from app.models.metrics.metrics_model import MetricsModel
+from app.models.metrics.posterior import DEFAULT_THOMPSON_SAMPLING_SAMPLER, get_prior
 
-from app.config import ROOT_DIR
-from typing import List, Dict, Optional, Union
-from operator import itemgetter
-from scipy.stats import beta
+from collections import deque
+from functools import partial
+from typing import List, Dict, Hashable, Optional, Tuple, Union
 
+from app.config import thompson_sampling as thompson_sampling_config
+from app.models.candidate_columns import CandidateColumns
 from app.models.slate_config import SlateConfigModel
 from app.models.personalized_topic_list import PersonalizedTopicList
+from app.rankers.blocklists import blocklist_index
+from app.rankers.thompson_sampling_pool import thompson_sampling_pool
+from app.rng import get_rng
 
-DEFAULT_ALPHA_PRIOR = 0.02
-DEFAULT_BETA_PRIOR = 1.0
-
-RankableListType = Union[List['SlateModel'], List['RecommendationModel']]
-RecommendationListType = List['RecommendationModel']
+RankableListType = Union[List['SlateModel'], List['RecommendationModel'], CandidateColumns]
+RecommendationListType = Union[List['RecommendationModel'], CandidateColumns]
 
 
 def top5(items: RankableListType) -> RankableListType:
@@ -60,25 +63,36 @@ def top45(items: RankableListType) -> RankableListType:
     return items[:45]
 
 
-def blocklist(recs: RecommendationListType, blocklist: Optional[List[str]] = None) -> RecommendationListType:
+def blocklist(recs: RecommendationListType,
+              blocklist: Optional[List[str]] = None,
+              slate_id: Optional[str] = None) -> RecommendationListType:
     """
     this filters recommendations by item_id using the blocklist available
-    in ./app/resources/blocklists.json
-    :param recs: a list of recommendations in the desired order (pre-publisher spread)
+    in ./app/resources/blocklists.json, which is kept in memory by blocklist_index
+    :param recs: a list of recommendations or candidate columns in the desired order (pre-publisher spread)
     :param blocklist: a list of item_ids to be blocked
+    :param slate_id: optional slate id, to also filter item_ids that are only blocked on this slate
     :return: filtered recommendations from the input list of recommendations
     """
     if not blocklist:
-        with open(ROOT_DIR + "/app/resources/blocklists.json", "r") as fp:
-            blocklists = json.load(fp)
-        return [rec for rec in recs if str(rec.item.item_id) not in blocklists["items"]]
+        blocked_item_ids = blocklist_index.get_blocked_item_ids(slate_id)
     else:
-        return [rec for rec in recs if rec.item.item_id not in blocklist]
+        blocked_item_ids = set(blocklist)
+
+    if isinstance(recs, CandidateColumns):
+        keep = np.fromiter((item_id not in blocked_item_ids for item_id in recs.item_ids), dtype=bool, count=len(recs))
+        return recs if keep.all() else recs.take(np.flatnonzero(keep))
+
+    return [rec for rec in recs if str(rec.item.item_id) not in blocked_item_ids]
 
 
 def thompson_sampling(
         recs: RankableListType,
-        metrics: Dict[(int or str), 'MetricsModel']) -> RankableListType:
+        metrics: Dict[(int or str), 'MetricsModel'],
+        limit: Optional[int] = None,
+        pool_key: Optional[Hashable] = None,
+        sampler: str = DEFAULT_THOMPSON_SAMPLING_SAMPLER,
+        rng: Optional[np.random.Generator] = None) -> RankableListType:
     """
     Re-rank items using Thompson sampling which combines exploitation of known item CTR
     with exploration of new items with unknown CTR modeled by a prior
@@ -87,8 +101,14 @@ def thompson_sampling(
     lot of interest, mixed in with some newer ones that we want to try out so we can keep adding more interesting
     items to our repertoire.
 
-    :param recs: a list of recommendations in the desired order (pre-publisher spread)
-    :param metrics: a dict with item_id as key and dynamodb row modeled as ClickDataModel
+    :param recs: a list of recommendations or slate configs, or candidate columns, in the desired order
+    :param metrics: a dict with item_id as key and dynamodb row modeled as ClickDataModel, with the posterior parameters
+                    that the metrics factory sets
+    :param limit: optional number of results that will be consumed. If set, only the top `limit` items are returned.
+    :param pool_key: optional key of the slate experiment, for items that are the same for all users. If set, and
+                     thompson_sampling_pool is enabled, a presampled ranking is returned.
+    :param sampler: one of THOMPSON_SAMPLING_SAMPLERS, which experiments configure with thompsonSamplingSampler
+    :param rng: random generator, defaults to the generator of the current request
     :return: a re-ordered version of recs satisfying the spread as best as possible
     """
 
@@ -96,39 +116,146 @@ def thompson_sampling(
     if not recs:
         return recs
 
-    # Currently we are using the hardcoded priors below.
-    # TODO: We should return to having slate/lineup-specific priors. We could load slate-priors from
-    #  MODELD-Prod-SlateMetrics, although that might require an additional database lookup. We might choose to use a
-    #  'default' key that aggregates engagement data in the same table, such that no additional lookups are required.
-    alpha_prior, beta_prior = DEFAULT_ALPHA_PRIOR, DEFAULT_BETA_PRIOR
-
-    scores = []
-    # create prior distribution for CTR from parameters in click data table
-    prior = beta(alpha_prior, beta_prior)
-    for rec in recs:
-        try:
-            # Recommendations are keyed on item_id.  Note that the metrics model grabs the item_id
-            # when it parses the clickdata by splitting the primary key in dynamo
-            clickdata_id = rec.item.item_id
-        except AttributeError:
-            # Slates are keyed on their slate id, in this case the id field of the slate config model
-            # Similarly these are parsed as the prefix of the primary key in the slate metrics table
-            clickdata_id = rec.id
-
-        d = metrics.get(clickdata_id)
-        if d:
-            # TODO: Decide how many days we want to look back.
-            clicks = max(d.trailing_28_day_opens + alpha_prior, 1e-18)
-            # posterior combines click data with prior (also a beta distribution)
-            no_clicks = max(d.trailing_28_day_impressions - d.trailing_28_day_opens + beta_prior, 1e-18)
-            # sample from posterior for CTR given click data
-            score = beta.rvs(clicks, no_clicks)
-            scores.append((rec, score))
-        else:  # no click data, sample from module prior
-            scores.append((rec, prior.rvs()))
-
-    scores.sort(key=itemgetter(1), reverse=True)
-    return [x[0] for x in scores]
+    if limit is not None and limit <= 0:
+        return recs[:0]
+
+    alphas, betas = _get_posteriors(_get_clickdata_ids(recs), metrics)
+    rng = rng or get_rng()
+    sample_orders = partial(_sample_thompson_sampling_orders, alphas, betas, limit, sampler=sampler)
+
+    if pool_key is not None and thompson_sampling_pool.enabled:
+        # The posteriors are part of the key, such that rankings are resampled when candidates or metrics change.
+        posteriors_key = hash((alphas.tobytes(), betas.tobytes()))
+        order = thompson_sampling_pool.get_order((pool_key, posteriors_key, limit, sampler), sample_orders, rng)
+    else:
+        order = sample_orders(1, rng)[0]
+
+    return _take(recs, order)
+
+
+def _get_posteriors(clickdata_ids, metrics: Dict[(int or str), 'MetricsModel']) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :param clickdata_ids: the keys under which engagement metrics for the ranked items are stored
+    :param metrics: a dict with item_id as key and dynamodb row modeled as ClickDataModel, with posterior parameters
+    :return: tuple of arrays with the alpha and beta parameters of the posterior of each item
+    """
+    # posterior combines click data with prior (also a beta distribution). The metrics factory sets the posterior
+    # for the experiment's metrics window when metrics are parsed.
+    # items without click data sample from the prior
+    alpha_prior, beta_prior = get_prior(metrics)
+    clickdata = [metrics.get(clickdata_id) for clickdata_id in clickdata_ids]
+    alphas = np.array([d.posterior_alpha if d else alpha_prior for d in clickdata], dtype=float)
+    betas = np.array([d.posterior_beta if d else beta_prior for d in clickdata], dtype=float)
+    return alphas, betas
+
+
+def _sample_thompson_sampling_orders(
+        alphas: np.ndarray,
+        betas: np.ndarray,
+        limit: Optional[int],
+        size: int,
+        rng: np.random.Generator,
+        sampler: str = DEFAULT_THOMPSON_SAMPLING_SAMPLER) -> np.ndarray:
+    """
+    Samples Thompson sampling rankings.
+
+    :param alphas: alpha parameter of the posterior of each ranked item
+    :param betas: beta parameter of the posterior of each ranked item
+    :param limit: optional number of items to rank
+    :param size: number of rankings to sample
+    :param rng: random generator
+    :param sampler: one of THOMPSON_SAMPLING_SAMPLERS
+    :return: 2D array with one ranking per row, as indices into the ranked items
+    """
+    # sample from the posterior for CTR given click data, for all items and rankings at once
+    scores = _sample_posteriors(alphas, betas, size, sampler=sampler, rng=rng)
+
+    if limit is not None and limit < len(alphas):
+        # Only the top `limit` items will be consumed. Select them in linear time, and only sort those.
+        top = np.argpartition(-scores, limit - 1, axis=1)[:, :limit]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        return np.take_along_axis(top, np.argsort(-top_scores, axis=1, kind='stable'), axis=1)
+    else:
+        # A stable sort on the negated scores keeps tied items in their input order, like list.sort(reverse=True).
+        return np.argsort(-scores, axis=1, kind='stable')
+
+
+def _sample_posteriors(
+        alphas: np.ndarray,
+        betas: np.ndarray,
+        size: int,
+        sampler: str = DEFAULT_THOMPSON_SAMPLING_SAMPLER,
+        approximation_min_count: float = None,
+        rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """
+    Samples from beta distributions. In the 'approximate' sampler mode, a beta distribution is approximated by a normal
+    distribution with the same mean and variance if both its parameters are at least `approximation_min_count`.
+    The beta distribution's skewness is below 2 / sqrt(approximation_min_count), so the approximation is very close.
+
+    :param alphas: alpha parameter for each distribution
+    :param betas: beta parameter for each distribution
+    :param size: number of samples to draw from each distribution
+    :param sampler: 'exact' or 'approximate'
+    :param approximation_min_count: defaults to the configured value
+    :param rng: random generator, defaults to the generator of the current request
+    :return: 2D array with `size` rows, and one column per distribution
+    """
+    rng = rng or get_rng()
+    if sampler == 'exact':
+        return rng.beta(alphas, betas, size=(size, len(alphas)))
+    elif sampler != 'approximate':
+        raise ValueError(f'Unknown thompson sampling sampler {sampler}')
+
+    if approximation_min_count is None:
+        approximation_min_count = thompson_sampling_config['approximation_min_count']
+    approximate = np.minimum(alphas, betas) >= approximation_min_count
+    exact = ~approximate
+
+    scores = np.empty((size, len(alphas)))
+    scores[:, exact] = rng.beta(alphas[exact], betas[exact], size=(size, np.count_nonzero(exact)))
+
+    totals = alphas[approximate] + betas[approximate]
+    means = alphas[approximate] / totals
+    stds = np.sqrt(means * (1 - means) / (totals + 1))
+    scores[:, approximate] = means + stds * rng.standard_normal((size, len(totals)))
+
+    return scores
+
+
+def _take(items: RankableListType, order) -> RankableListType:
+    """
+    :param items: a list of items, or candidate columns
+    :param order: positions of the items to return, in the order to return them in
+    :return: the items at the positions in `order`
+    """
+    if isinstance(items, CandidateColumns):
+        return items.take(order)
+    return [items[i] for i in order]
+
+
+def _get_clickdata_ids(items: RankableListType):
+    """
+    :param items: a list of recommendations or slate configs, or candidate columns
+    :return: the keys under which engagement metrics for the items are stored
+    """
+    if isinstance(items, CandidateColumns):
+        return items.item_ids
+    return [_get_clickdata_id(item) for item in items]
+
+
+def _get_clickdata_id(rec: Union['SlateConfigModel', 'RecommendationModel']) -> str:
+    """
+    :param rec: a recommendation or a slate config
+    :return: the key under which engagement metrics for rec are stored
+    """
+    try:
+        # Recommendations are keyed on item_id.  Note that the metrics model grabs the item_id
+        # when it parses the clickdata by splitting the primary key in dynamo
+        return rec.item.item_id
+    except AttributeError:
+        # Slates are keyed on their slate id, in this case the id field of the slate config model
+        # Similarly these are parsed as the prefix of the primary key in the slate metrics table
+        return rec.id
 
 
 def personalize_topic_slates(input_slate_configs: List['SlateConfigModel'],
@@ -148,9 +275,9 @@ def personalize_topic_slates(input_slate_configs: List['SlateConfigModel'],
                         otherwise all personalized topics among the input slate configs are returned
     :return: SlateLineupExperimentModel with reordered slates
     """
-    topic_to_score_map = {t.curator_topic_label: t.score for t in personalized_topics.curator_topics}
+    topic_to_score_map = personalized_topics.topic_scores
     # filter non-topic slates
-    personalizable_configs = list(filter(lambda s: s.curator_topic_label in topic_to_score_map, input_slate_configs))
+    personalizable_configs = [s for s in input_slate_configs if s.curator_topic_label in topic_to_score_map]
     logging.debug(personalizable_configs)
 
     if not personalizable_configs:
@@ -159,18 +286,16 @@ def personalize_topic_slates(input_slate_configs: List['SlateConfigModel'],
         raise ValueError(f"Input lineup to personalize_topic_slates includes fewer topic slates than requested")
 
     # re-rank topic slates
-    personalizable_configs.sort(key=lambda s: topic_to_score_map.get(s.curator_topic_label), reverse=True)
+    personalizable_configs.sort(key=lambda s: topic_to_score_map[s.curator_topic_label], reverse=True)
 
     output_configs = list()
     added_topic_slates = 0
-    personalized_index = 0
     for config in input_slate_configs:
-        if config in personalizable_configs:
+        if config.curator_topic_label in topic_to_score_map:
             # if slate is personalizable add highest ranked slate remaining
             if added_topic_slates < topic_limit:
-                output_configs.append(personalizable_configs[personalized_index])
+                output_configs.append(personalizable_configs[added_topic_slates])
                 added_topic_slates += 1
-                personalized_index += 1
         else:
             logging.debug(f"adding topic slate {added_topic_slates}")
             output_configs.append(config)
@@ -179,13 +304,17 @@ def personalize_topic_slates(input_slate_configs: List['SlateConfigModel'],
 
 
 @xray_recorder.capture('rankers_algorithms_spread_publishers')
-def spread_publishers(recs: RecommendationListType, spread: int = 3) -> RecommendationListType:
+def spread_publishers(
+        recs: RecommendationListType,
+        spread: int = 3,
+        limit: Optional[int] = None) -> RecommendationListType:
     """
     Makes sure stories from the same publisher/domain are not listed sequentially, and have a configurable number
     of stories in-between them.
 
-    :param recs: a list of recommendations in the desired order (pre-publisher spread)
+    :param recs: a list of recommendations, or candidate columns, in the desired order (pre-publisher spread)
     :param spread: the minimum number of items before we can repeat a publisher/domain
+    :param limit: optional number of results that will be consumed. If set, only the first `limit` items are returned.
     :return: a re-ordered version of recs satisfying the spread as best as possible
     """
 
@@ -193,40 +322,86 @@ def spread_publishers(recs: RecommendationListType, spread: int = 3) -> Recommen
     if not len(recs):
         return recs
 
-    # move first item in list to first item in re-ordered list
-    reordered = [recs.pop(0)]
+    if isinstance(recs, CandidateColumns):
+        publishers = recs.publisher_codes.tolist()
+    else:
+        publishers = [rec.publisher for rec in recs]
+
+    return _take(recs, _get_spread_publishers_order(publishers, spread, limit))
+
 
-    # iterator to keep track of spread between domains
-    iterator = 0
+def _get_spread_publishers_order(
+        publishers: List[Hashable],
+        spread: int,
+        limit: Optional[int] = None) -> List[int]:
+    """
+    Gets the order in which spread_publishers returns items, given the publisher of each item.
+
+    Items are placed one at a time: the next item is the first remaining item whose publisher is not one of the
+    `spread` most recently placed publishers. If no such item exists, or if there aren't more than `spread` items left,
+    we cannot spread any further, and the remaining items are added in their original order.
+
+    Remaining items are kept in a queue per publisher, and the first item of each queue in a heap ordered by position.
+    The next item is found by skipping at most `spread` recently placed publishers at the top of the heap, which makes
+    this O(n * spread * log(number of publishers)).
 
-    # iterate over remaining items in recs
-    while len(recs):
-        # if there aren't enough items left in recs to satisfy the desired domain spread,
-        # or if the iterator reaches the end of recs, then we cannot spread any further.
-        # just add the rest of the recs as-is to the end of the re-ordered list.
+    Items are placed in order, so stopping after `limit` items gives the same first `limit` items as the full order.
 
-        # note that this is a simplistic take - we could write more logic here to decrease the spread value by
-        # one each time if iterator reaches or exceeds the length of recs
-        if (len(recs) <= spread) or (iterator >= len(recs)):
-            reordered.extend(recs)
+    :param publishers: the publisher (or publisher code) of each item, in the desired order
+    :param spread: the minimum number of items before we can repeat a publisher/domain
+    :param limit: optional maximum number of indices to return
+    :return: a list of indices into publishers
+    """
+    # Publishers are replaced by integer codes, which are cheaper to hash and compare.
+    codes = {}
+    queues = []
+    for i, publisher in enumerate(publishers):
+        code = codes.setdefault(publisher, len(codes))
+        if code == len(queues):
+            queues.append(deque())
+        queues[code].append(i)
+
+    # Heap of the first remaining position of each publisher, which is unique, so codes are never compared.
+    heads = [(queue[0], code) for code, queue in enumerate(queues)]
+    heapq.heapify(heads)
+
+    recent_codes = deque(maxlen=spread)
+    order = []
+    remaining = len(publishers)
+    if limit is None:
+        limit = remaining
+
+    while remaining and len(order) < limit:
+        # if there aren't enough items left to satisfy the desired domain spread, we cannot spread any further.
+        if order and remaining <= spread:
             break
 
-        # get a list of domains that are currently invalid in the sequence
-        if len(reordered) > spread:
-            # if we have enough items in the reordered list, the invalid domains are the last spread number
-            domains_to_check = [x.publisher for x in reordered[-spread:]]
-        else:
-            # if we don't have more than spread items reordered, just get all the domains in reordered
-            domains_to_check = [x.publisher for x in reordered]
-
-        # we can add the rec at iterator position to the re-ordered list if.the rec at iterator has a different
-        # domain than the invalid list retrieved above
-        if recs[iterator].publisher not in domains_to_check:
-            reordered.append(recs.pop(iterator))
-            iterator = 0
+        skipped = []
+        while heads and heads[0][1] in recent_codes:
+            skipped.append(heapq.heappop(heads))
+
+        if not heads:
+            # every remaining item has a recently placed publisher, so we cannot spread any further.
+            heads = skipped
+            break
+
+        i, code = heads[0]
+        queue = queues[code]
+        queue.popleft()
+        if queue:
+            heapq.heapreplace(heads, (queue[0], code))
         else:
-            # if we cannot add the rec at position iterator to the re-ordered list, increment the iterator and try
-            # the next item in recs
-            iterator += 1
+            heapq.heappop(heads)
+
+        for head in skipped:
+            heapq.heappush(heads, head)
+
+        recent_codes.append(code)
+        order.append(i)
+        remaining -= 1
+
+    # add the rest of the items as-is to the end of the order
+    if remaining and len(order) < limit:
+        order.extend(sorted(i for _, code in heads for i in queues[code])[:limit - len(order)])
 
-    return reordered
+    return order
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+
+from typing import Dict, FrozenSet, NamedTuple, Optional
+
+from app.config import ROOT_DIR
+
+BLOCKLISTS_FILE = os.path.join(ROOT_DIR, 'app/resources/blocklists.json')
+
+
+class _Blocklists(NamedTuple):
+    """
+    Immutable snapshot of the parsed blocklists file. Snapshots are swapped as a whole, such that readers never see a
+    partially reloaded blocklist.
+    """
+    mtime_ns: int
+    # Item ids blocked on all slates
+    items: FrozenSet[str]
+    # Item ids blocked per slate id, including the item ids that are blocked on all slates
+    items_by_slate: Dict[str, FrozenSet[str]]
+
+
+class BlocklistIndex:
+    """
+    Keeps the blocklists in ./app/resources/blocklists.json in memory as sets of interned item ids, such that
+    filtering a recommendation is a set lookup, and requests don't do any file I/O.
+
+    The blocklists file has the following format, where "slates" is optional:
+    {
+        "items": {"<item id>": 1, ...},
+        "slates": {"<slate id>": {"items": {"<item id>": 1, ...}}, ...}
+    }
+
+    The file is loaded at startup, and reloaded in the background when it changes.
+    """
+
+    def __init__(self, path: str = BLOCKLISTS_FILE):
+        self.path = path
+        self._blocklists: Optional[_Blocklists] = None
+        self._watch_task: Optional[asyncio.Task] = None
+
+    def get_blocked_item_ids(self, slate_id: Optional[str] = None) -> FrozenSet[str]:
+        """
+        :param slate_id: optional slate id, to include item ids that are only blocked on this slate
+        :return: set of blocked item ids
+        """
+        blocklists = self._blocklists
+        if blocklists is None:
+            # Blocklists are loaded at startup. This only happens when rankers are used outside the application.
+            self.load()
+            blocklists = self._blocklists
+
+        if slate_id is not None:
+            return blocklists.items_by_slate.get(slate_id, blocklists.items)
+        return blocklists.items
+
+    def load(self):
+        """
+        Parses the blocklists file, and atomically replaces the blocklists in memory.
+        """
+        mtime_ns = os.stat(self.path).st_mtime_ns
+        with open(self.path, 'r') as fp:
+            blocklists_dict = json.load(fp)
+
+        items = self._parse_item_ids(blocklists_dict.get('items', {}))
+        items_by_slate = {
+            slate_id: items | self._parse_item_ids(slate_blocklists.get('items', {}))
+            for slate_id, slate_blocklists in blocklists_dict.get('slates', {}).items()
+        }
+
+        self._blocklists = _Blocklists(mtime_ns=mtime_ns, items=items, items_by_slate=items_by_slate)
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reloads the blocklists if the file was modified since it was last loaded. If the modified file can't be
+        loaded, the previous blocklists are kept.
+
+        :return: True if the blocklists were reloaded
+        """
+        if self._blocklists is not None and os.stat(self.path).st_mtime_ns == self._blocklists.mtime_ns:
+            return False
+
+        try:
+            self.load()
+        except (OSError, ValueError):
+            logging.exception(f'Failed to reload blocklists from {self.path}, keeping the previous blocklists')
+            return False
+
+        logging.info(f'Reloaded blocklists from {self.path}')
+        return True
+
+    def start_watching(self, interval: float):
+        """
+        Starts a background task on the running event loop, which checks the blocklists file for changes.
+
+        :param interval: time in seconds between checks
+        """
+        self._watch_task = asyncio.get_event_loop().create_task(self._watch(interval))
+
+    async def stop_watching(self):
+        """
+        Stops the background task started by start_watching.
+        """
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    async def _watch(self, interval: float):
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Run the file I/O in a thread, such that it doesn't block the event loop.
+                await loop.run_in_executor(None, self.reload_if_changed)
+            except OSError:
+                logging.exception(f'Failed to check blocklists file {self.path} for changes')
+
+    @staticmethod
+    def _parse_item_ids(item_ids) -> FrozenSet[str]:
+        return frozenset(sys.intern(str(item_id)) for item_id in item_ids)
+
+
+# Blocklist index shared by all requests in this worker.
+blocklist_index = BlocklistIndex()
@@ -0,0 +1,193 @@
+import asyncio
+
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from app.rankers import PER_USER_INPUTS, RankerInput, get_ranker, get_ranker_inputs
+
+# Rankers that keep the first N items of their input, mapped to N.
+TRUNCATING_RANKERS = {'top5': 5, 'top15': 15, 'top30': 30, 'top45': 45}
+# Rankers that accept a `limit` argument, and then return the first `limit` items of their output.
+LIMIT_AWARE_RANKERS = {'thompson-sampling', 'pubspread'}
+
+# Fetches a ranker input, given the items whose input is needed.
+InputFetcher = Callable[[list], Awaitable[Any]]
+
+
+def _min_limit(a: Optional[int], b: Optional[int]) -> Optional[int]:
+    """
+    :return: the smallest of two limits, where None means unlimited
+    """
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a, b)
+
+
+class RankerStage:
+    """
+    A single step in a RankerPipeline, which applies a ranker and keeps at most `limit` items of its output.
+    """
+
+    def __init__(self, name: str, limit: Optional[int] = None):
+        self.name = name
+        self.limit = limit
+
+    def with_limit(self, limit: Optional[int]) -> 'RankerStage':
+        """
+        :return: a copy of this stage that keeps at most `limit` items
+        """
+        return RankerStage(self.name, _min_limit(self.limit, limit))
+
+    @property
+    def inputs(self) -> FrozenSet[RankerInput]:
+        """
+        :return: the inputs that this stage's ranker needs, in addition to the items
+        """
+        return get_ranker_inputs(self.name)
+
+    def __call__(self, items: list, **ranker_kwargs) -> list:
+        """
+        Applies this stage's ranker to items.
+
+        :param items: a list of recommendations or slate configs
+        :param ranker_kwargs: additional keyword arguments for the ranker, e.g. metrics for thompson-sampling
+        :return: the ranked items
+        """
+        if self.name in TRUNCATING_RANKERS:
+            # Skip copying the list if it's already short enough.
+            return items if len(items) <= self.limit else items[:self.limit]
+        elif self.limit is not None and self.name in LIMIT_AWARE_RANKERS:
+            return get_ranker(self.name)(items, limit=self.limit, **ranker_kwargs)
+        else:
+            ranked = get_ranker(self.name)(items, **ranker_kwargs)
+            return ranked if self.limit is None else ranked[:self.limit]
+
+    def __eq__(self, other):
+        return isinstance(other, RankerStage) and (self.name, self.limit) == (other.name, other.limit)
+
+    def __repr__(self):
+        return f'RankerStage({self.name!r}, limit={self.limit})'
+
+
+class RankerPipeline:
+    """
+    Compiles an experiment's list of rankers once, when configs are loaded, into stages that avoid ranking or copying
+    items that won't be returned:
+    - Truncating rankers (e.g. top15) are merged into the preceding ranker, such that e.g.
+      ['thompson-sampling', 'top15'] selects the top 15 sampled items instead of sorting all of them.
+    - For a requested number of items, plan() pushes that limit down through the stages, as far as is allowed by
+      what each stage needs from its input.
+
+    run() fetches the inputs that the rankers declare concurrently, before ranking any items.
+    """
+
+    def __init__(self, rankers: List[str]):
+        self.stages = self._compile(rankers)
+        self.inputs = frozenset(ranker_input for stage in self.stages for ranker_input in stage.inputs)
+        self.plan = lru_cache(maxsize=32)(self._plan)
+
+    def is_personalized_before(self, name: str) -> bool:
+        """
+        :return: True if a stage before the first `name` stage needs an input that differs per user, such that the
+                 items that reach that stage can differ per user
+        """
+        for stage in self.stages:
+            if stage.name == name:
+                return False
+            if stage.inputs & PER_USER_INPUTS:
+                return True
+        return False
+
+    async def run(
+            self,
+            items: list,
+            fetchers: Dict[RankerInput, InputFetcher],
+            count: Optional[int] = None,
+            ranker_kwargs: Optional[Dict[str, dict]] = None) -> list:
+        """
+        Ranks items by applying all stages.
+
+        :param items: a list of recommendations or slate configs, or candidate columns
+        :param fetchers: functions that fetch each of the inputs that the rankers need
+        :param count: the number of items that will be returned, or None if all items are returned
+        :param ranker_kwargs: optional additional keyword arguments for rankers, keyed by ranker name
+        :return: the ranked items, at most `count`
+        """
+        ranker_kwargs = ranker_kwargs or {}
+        stages = self.plan(count)
+        inputs = await self._fetch_inputs(stages, items, fetchers)
+        for stage in stages:
+            items = stage(items, **{ranker_input.value: inputs[ranker_input] for ranker_input in stage.inputs},
+                          **ranker_kwargs.get(stage.name, {}))
+
+        return items
+
+    async def _fetch_inputs(
+            self,
+            stages: Tuple[RankerStage, ...],
+            items: list,
+            fetchers: Dict[RankerInput, InputFetcher]) -> Dict[RankerInput, Any]:
+        """
+        Concurrently fetches all inputs that the stages need, for the items that can reach the stage that needs them.
+        """
+        missing = self.inputs - fetchers.keys()
+        if missing:
+            raise ValueError(f'No way to fetch {", ".join(i.value for i in missing)} for rankers {self.stages}')
+
+        ranker_inputs = list(self.inputs)
+        values = await asyncio.gather(*(
+            fetchers[ranker_input](self._get_input_items(stages, items, ranker_input)) for ranker_input in ranker_inputs
+        ))
+
+        return dict(zip(ranker_inputs, values))
+
+    @staticmethod
+    def _get_input_items(stages: Tuple[RankerStage, ...], items: list, ranker_input: RankerInput) -> list:
+        """
+        :return: the items that can reach the first stage that needs `ranker_input`
+        """
+        for stage in stages:
+            if ranker_input in stage.inputs or stage.name not in TRUNCATING_RANKERS:
+                # Stages other than truncations may reorder items, so any item can reach later stages.
+                break
+            items = stage(items)
+
+        return items
+
+    @staticmethod
+    def _compile(rankers: List[str]) -> List[RankerStage]:
+        stages = []
+        for name in rankers:
+            truncate = TRUNCATING_RANKERS.get(name)
+            if truncate is not None and stages:
+                stages[-1] = stages[-1].with_limit(truncate)
+            else:
+                stages.append(RankerStage(name, truncate))
+
+        return stages
+
+    def _plan(self, count: Optional[int] = None) -> Tuple[RankerStage, ...]:
+        """
+        Gets the stages to produce `count` items, with each stage limited to the number of items that later stages
+        consume from it.
+
+        :param count: the number of items that will be returned, or None if all items are returned
+        :return: tuple of stages
+        """
+        planned = []
+        consumed = count
+        for stage in reversed(self.stages):
+            stage = stage.with_limit(consumed)
+            planned.append(stage)
+
+            if stage.name in TRUNCATING_RANKERS:
+                # Only the first `limit` items of the input are consumed.
+                consumed = stage.limit
+            else:
+                # Other rankers need all their input. E.g. pubspread can push items from a dominating publisher back
+                # arbitrarily far, so its first `limit` items can come from anywhere in its input.
+                consumed = None
+
+        return tuple(reversed(planned))
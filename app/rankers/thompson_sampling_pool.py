@@ -0,0 +1,86 @@
+import asyncio
+
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Set
+
+import numpy as np
+
+from app.config import thompson_sampling as thompson_sampling_config
+
+
+class ThompsonSamplingPool:
+    """
+    Keeps `size` independently sampled Thompson sampling rankings per key in memory, such that a request can pick one
+    at random instead of drawing new samples. Each ranking is sampled from the same posterior as a live ranking, so
+    picking one at random is equivalent to sampling live, as long as the posterior doesn't change. Callers therefore
+    include the posterior in the key, such that rankings are never picked after the metrics they were sampled from are
+    refreshed.
+
+    A request that doesn't find rankings for its key samples its own ranking live, and the rankings for the key are
+    sampled after it, on the event loop, such that requests don't wait for the pool to be filled.
+
+    This only works for items that are the same for all users. Personalized candidates must be ranked live.
+    """
+
+    def __init__(self, size: int, max_entries: int = 1024, rng: Optional[np.random.Generator] = None):
+        """
+        :param size: number of rankings per key, 0 disables the pool
+        :param max_entries: maximum number of keys to keep rankings for, the least recently used key is evicted first
+        :param rng: random generator used to sample the rankings in the pool
+        """
+        self.size = size
+        self.max_entries = max_entries
+        self._rng = rng or np.random.default_rng()
+        self._entries: 'OrderedDict[Hashable, np.ndarray]' = OrderedDict()
+        self._pending: Set[Hashable] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def get_order(
+            self,
+            key: Hashable,
+            sample_orders: Callable[[int, np.random.Generator], np.ndarray],
+            rng: np.random.Generator) -> np.ndarray:
+        """
+        :param key: identifies the posteriors of the ranked items, and the number of ranked items
+        :param sample_orders: function that samples the given number of rankings with the given random generator, as
+                              a 2D array with one row each
+        :param rng: random generator used to pick a ranking, or to sample one if there are no rankings for key yet
+        :return: one of the rankings for key, as indices into the ranked items
+        """
+        orders = self._entries.get(key)
+        if orders is None:
+            self._schedule_fill(key, sample_orders)
+            return sample_orders(1, rng)[0]
+
+        self._entries.move_to_end(key)
+        return orders[rng.integers(len(orders))]
+
+    def clear(self):
+        self._entries.clear()
+
+    def _schedule_fill(self, key: Hashable, sample_orders: Callable[[int, np.random.Generator], np.ndarray]):
+        if key in self._pending:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Outside of a request, e.g. in a script, there's no event loop to fill the pool on.
+            self._fill(key, sample_orders)
+            return
+
+        self._pending.add(key)
+        loop.call_soon(self._fill, key, sample_orders)
+
+    def _fill(self, key: Hashable, sample_orders: Callable[[int, np.random.Generator], np.ndarray]):
+        self._pending.discard(key)
+        self._entries[key] = sample_orders(self.size, self._rng)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# Pool shared by all requests in this worker.
+thompson_sampling_pool = ThompsonSamplingPool(size=thompson_sampling_config['pool_size'])
@@ -0,0 +1,85 @@
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import aiohttp
+
+from app.config import recit as recit_config
+
+
+class RecItClient:
+    """
+    Keeps a single aiohttp session to RecIt open for the lifetime of a worker, such that requests reuse keep-alive
+    connections and cached DNS lookups, instead of connecting for every request. The connection pool also bounds the
+    number of concurrent requests to RecIt.
+
+    The session is bound to the event loop that opens it, so it's opened in a FastAPI startup event. Until then, or
+    after it's closed, get() creates a session per call, e.g. in tests that run on their own event loop.
+    """
+
+    def __init__(
+            self,
+            max_connections: int = 100,
+            keepalive_timeout: float = 15,
+            dns_cache_ttl: int = 10,
+            timeout: float = 5):
+        """
+        :param max_connections: maximum number of concurrent connections
+        :param keepalive_timeout: time in seconds that idle connections are kept open
+        :param dns_cache_ttl: time in seconds to cache resolved addresses
+        :param timeout: default time in seconds that a request may take, including waiting for a connection
+        """
+        self.max_connections = max_connections
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._session is not None
+
+    async def open(self):
+        """
+        Creates the shared session on the running event loop.
+        """
+        if self.is_open:
+            return
+
+        connector = aiohttp.TCPConnector(
+            limit=self.max_connections,
+            keepalive_timeout=self.keepalive_timeout,
+            use_dns_cache=True,
+            ttl_dns_cache=self.dns_cache_ttl)
+        self._session = aiohttp.ClientSession(connector=connector)
+
+    async def close(self):
+        """
+        Closes the shared session and its connections.
+        """
+        if self._session is not None:
+            session, self._session = self._session, None
+            await session.close()
+
+    @asynccontextmanager
+    async def get(self, url: str, params: Optional[dict] = None, timeout: Optional[float] = None):
+        """
+        :param url: RecIt url
+        :param params: optional query parameters
+        :param timeout: time in seconds that the request may take, defaults to the client's timeout
+        :return: async context manager for the response
+        """
+        client_timeout = aiohttp.ClientTimeout(total=self.timeout if timeout is None else timeout)
+        if self._session is not None:
+            async with self._session.get(url, params=params, timeout=client_timeout) as resp:
+                yield resp
+        else:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(url, params=params, timeout=client_timeout) as resp:
+                    yield resp
+
+
+# RecIt client shared by all requests in this worker.
+recit_client = RecItClient(max_connections=recit_config['max_connections'],
+                           keepalive_timeout=recit_config['keepalive_timeout'],
+                           dns_cache_ttl=recit_config['dns_cache_ttl'],
+                           timeout=recit_config['timeout'])
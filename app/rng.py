@@ -0,0 +1,105 @@
+import hashlib
+import logging
+import secrets
+
+from contextvars import ContextVar
+from typing import Mapping, Optional
+
+import numpy as np
+from starlette.requests import Request
+
+# Debug header that sets the seed of a request, to replay a request with the same experiments and rankings.
+SEED_HEADER = 'X-Recommendation-Seed'
+# Header with an id that is unique per request. If set, the seed is derived from it.
+REQUEST_ID_HEADER = 'X-Request-Id'
+
+# Random generator used outside of requests, e.g. in tests and benchmarks that don't seed a generator.
+_default_rng = np.random.default_rng()
+_request_rng: ContextVar[Optional[np.random.Generator]] = ContextVar('request_rng', default=None)
+_request_seed: ContextVar[Optional[int]] = ContextVar('request_seed', default=None)
+
+
+def get_rng() -> np.random.Generator:
+    """
+    :return: the random generator of the current request, or a process-wide generator outside of a request. All
+             randomness in experiment choice and rankers must come from this generator, such that a request can be
+             replayed by seeding it.
+    """
+    rng = _request_rng.get()
+    return rng if rng is not None else _default_rng
+
+
+def seed_rng(seed: int) -> np.random.Generator:
+    """
+    Sets the random generator for the current context, which is copied into tasks that are created from it.
+
+    :param seed: non-negative integer seed
+    :return: the new random generator
+    """
+    rng = np.random.default_rng(seed)
+    _request_seed.set(seed)
+    _request_rng.set(rng)
+    return rng
+
+
+def derive_rng(key: str) -> np.random.Generator:
+    """
+    Sets a random generator for the current context that's derived from the request seed and key. Tasks that run
+    concurrently, like the slates in a lineup, would otherwise draw from the request's generator in whichever order
+    they happen to run. Each of them must call this before its first await, such that a seeded request is replayed
+    with the same random choices.
+
+    :param key: id of the task that's the same in every request, e.g. the slate id
+    :return: the new random generator, or the current generator if no seed is set
+    """
+    seed = _request_seed.get()
+    if seed is None:
+        return get_rng()
+
+    rng = np.random.default_rng([seed, _hash(key)])
+    _request_rng.set(rng)
+    return rng
+
+
+def get_request_seed(headers: Mapping[str, str]) -> int:
+    """
+    :param headers: HTTP request headers
+    :return: the seed from SEED_HEADER if it's a non-negative integer, or a seed derived from REQUEST_ID_HEADER, or
+             otherwise a random seed
+    """
+    seed = headers.get(SEED_HEADER)
+    if seed is not None:
+        try:
+            value = int(seed)
+        except ValueError:
+            value = None
+        # numpy only accepts non-negative seeds.
+        if value is not None and value >= 0:
+            return value
+        logging.warning(f'Ignoring invalid {SEED_HEADER} header {seed!r}')
+
+    request_id = headers.get(REQUEST_ID_HEADER)
+    if request_id:
+        return _hash(request_id)
+
+    return secrets.randbits(64)
+
+
+def _hash(value: str) -> int:
+    """
+    :return: 64 bit hash of value that's the same in every process, unlike hash()
+    """
+    return int.from_bytes(hashlib.sha256(value.encode('utf-8')).digest()[:8], 'big')
+
+
+async def rng_middleware(request: Request, call_next):
+    """
+    Seeds a random generator for each request, and returns the seed in SEED_HEADER of the response. Sending that
+    seed in the request header replays the request with the same random choices, given the same metrics and
+    candidates, and with the Thompson sampling pool disabled.
+    """
+    seed = get_request_seed(request.headers)
+    seed_rng(seed)
+    response = await call_next(request)
+    response.headers[SEED_HEADER] = str(seed)
+    return response
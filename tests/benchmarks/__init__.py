@@ -0,0 +1,2 @@
+# Benchmarks are run as scripts, e.g. `python -m tests.benchmarks.bench_thompson_sampling`, and aren't collected by
+# pytest because their file names don't start with `test_`.
@@ -0,0 +1,68 @@
+"""
+Compares the size and speed of the binary cache serializer against the json serializers it replaces, for cached
+candidate sets and metrics rows.
+
+Usage: python -m tests.benchmarks.bench_cache_serializers
+"""
+import time
+
+from aiocache.serializers import JsonSerializer
+
+from app.cache import BinarySerializer, JsonSerializerWithNoneToken
+from tests.benchmarks.utils import DEFAULT_SIZES, generate_candidates, time_call, print_results
+
+METRICS_PRIMARY_KEY = 'recommendations_pk'
+
+
+def make_candidate_set_entry(recs) -> dict:
+    """
+    :return: cache entry of a candidate set with recs, as stored by DynamoDBCandidateSet._query_cache_entry
+    """
+    candidates = [{'item_id': int(rec.item_id), 'publisher': rec.publisher, 'feed_id': 1} for rec in recs]
+    return {
+        'value': {'Items': [{'id': 'benchmark', 'version': 1, 'created_at': 1612907252, 'candidates': candidates}]},
+        'refresh_at': time.time(),
+    }
+
+
+def make_metrics_rows(metrics) -> list:
+    """
+    :return: metrics as rows in the metrics table
+    """
+    return [
+        {METRICS_PRIMARY_KEY: m.id, **m.dict(exclude={'id', 'posterior_alpha', 'posterior_beta', 'expires_at'}),
+         'created_at': 1612907252}
+        for m in metrics.values()
+    ]
+
+
+def compare(name: str, n: int, json_serializer, values: list) -> list:
+    binary_serializer = BinarySerializer()
+    json_data = [json_serializer.dumps(v) for v in values]
+    binary_data = [binary_serializer.dumps(v) for v in values]
+
+    json_size = sum(len(d.encode()) for d in json_data)
+    binary_size = sum(len(d) for d in binary_data)
+    json_dumps = time_call(lambda: [json_serializer.dumps(v) for v in values])
+    binary_dumps = time_call(lambda: [binary_serializer.dumps(v) for v in values])
+    json_loads = time_call(lambda: [json_serializer.loads(d) for d in json_data])
+    binary_loads = time_call(lambda: [binary_serializer.loads(d) for d in binary_data])
+
+    return [name, n, json_size, binary_size, json_dumps * 1000, binary_dumps * 1000, json_loads * 1000,
+            binary_loads * 1000, json_loads / binary_loads]
+
+
+def main():
+    rows = []
+    for n in DEFAULT_SIZES:
+        recs, metrics = generate_candidates(n)
+        rows.append(compare('candidate set', n, JsonSerializer(), [make_candidate_set_entry(recs)]))
+        rows.append(compare('metrics', len(metrics), JsonSerializerWithNoneToken(), make_metrics_rows(metrics)))
+
+    print_results('cache serializers', [
+        'value', 'rows', 'json (bytes)', 'binary (bytes)', 'json dumps (ms)', 'bin dumps (ms)', 'json loads (ms)',
+        'bin loads (ms)', 'loads speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
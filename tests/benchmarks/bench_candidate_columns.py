@@ -0,0 +1,50 @@
+"""
+Compares ranking a slate's candidates as CandidateColumns against ranking a list of RecommendationModel objects,
+including the time to create the recommendations that are returned.
+
+Usage: python -m tests.benchmarks.bench_candidate_columns
+"""
+from aws_xray_sdk import global_sdk_config
+
+from app.models.candidate import Candidate
+from app.models.candidate_columns import CandidateColumns
+from app.models.recommendation import RecommendationModel
+from app.rankers.pipeline import RankerPipeline
+from tests.benchmarks.utils import DEFAULT_SIZES, generate_candidates, time_call, print_results
+
+RANKERS = ['thompson-sampling', 'pubspread']
+RECOMMENDATION_COUNT = 10
+
+
+def rank_recommendations(pipeline, candidates, metrics):
+    recs = [RecommendationModel.candidate_dict_to_recommendation(candidate.dict()) for candidate in candidates]
+    for stage in pipeline.plan(RECOMMENDATION_COUNT):
+        recs = stage(recs, **({'metrics': metrics} if stage.inputs else {}))
+    return recs[:RECOMMENDATION_COUNT]
+
+
+def rank_columns(pipeline, candidates, metrics):
+    columns = CandidateColumns.from_candidates(candidates)
+    for stage in pipeline.plan(RECOMMENDATION_COUNT):
+        columns = stage(columns, **({'metrics': metrics} if stage.inputs else {}))
+    return list(map(RecommendationModel.candidate_dict_to_recommendation, columns[:RECOMMENDATION_COUNT].rows()))
+
+
+def main():
+    global_sdk_config.set_sdk_enabled(False)
+    pipeline = RankerPipeline(RANKERS)
+
+    rows = []
+    for n in DEFAULT_SIZES:
+        recs, metrics = generate_candidates(n)
+        candidates = [Candidate(item_id=int(rec.item_id), publisher=rec.publisher) for rec in recs]
+        objects = time_call(lambda: rank_recommendations(pipeline, candidates, metrics))
+        columnar = time_call(lambda: rank_columns(pipeline, candidates, metrics))
+        rows.append([n, objects * 1000, columnar * 1000, objects / columnar])
+
+    print_results(f'{RANKERS} top {RECOMMENDATION_COUNT}',
+                  ['candidates', 'objects (ms)', 'columns (ms)', 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+"""
+Benchmarks every ranker in get_all_rankers() on synthetic candidate sets with skewed publishers and partial metrics
+coverage. Results can be stored as a JSON baseline, and later runs can be compared against it to catch latency or
+throughput regressions.
+
+Usage:
+    # Print results, and optionally store them, e.g. to update the baseline
+    python -m tests.benchmarks.bench_rankers run [--output tests/benchmarks/baselines/rankers.json]
+    # Compare a new run, or stored results, against the baseline. Exits with status 1 if any ranker regressed.
+    python -m tests.benchmarks.bench_rankers compare [--results results.json] [--threshold 0.2] [--min-delta-ms 0.05]
+
+Timings depend on the machine and on the Python and numpy versions, so only compare results against a baseline that was
+stored on the same machine, in the environment from Pipfile.lock. Re-record the baseline after changing a ranker.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from aws_xray_sdk import global_sdk_config
+
+from app.models.candidate import Candidate
+from app.models.candidate_columns import CandidateColumns
+from app.models.personalized_topic_list import PersonalizedTopicElement, PersonalizedTopicList
+from app.models.slate_config import CuratorTopic, SlateConfigModel
+from app.rankers import get_all_rankers
+from app.rng import seed_rng
+from tests.benchmarks.utils import generate_candidates, measure_call, print_results
+
+SIZES = [10, 100, 1000, 10000, 100000]
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'baselines', 'rankers.json')
+# Relative change in latency or throughput that is reported as a regression.
+DEFAULT_THRESHOLD = 0.2
+# Minimum absolute change in milliseconds per call that is reported as a regression, such that noise on rankers that
+# take microseconds isn't reported, however large it is relative to their latency.
+DEFAULT_MIN_DELTA_MS = 0.05
+# Number of times that each benchmark is repeated. Latency is the median over repeats.
+DEFAULT_REPEAT = 15
+# Fraction of slate configs that have a curator topic label, when benchmarking personalized-topics.
+TOPIC_COVERAGE = 0.8
+
+# Returns a function without arguments that applies a ranker to n synthetic items.
+BenchmarkFactory = Callable[[int], Callable[[], object]]
+
+
+def generate_candidate_columns(n: int) -> tuple:
+    """
+    :return: tuple of candidate columns and metrics keyed on item id, the way recommendations are ranked
+    """
+    recs, metrics = generate_candidates(n)
+    columns = CandidateColumns.from_candidates([
+        Candidate(item_id=rec.item_id, publisher=rec.publisher, feed_id=None) for rec in recs
+    ])
+    return columns, metrics
+
+
+def generate_topic_slate_configs(n: int, rng: random.Random = None) -> tuple:
+    """
+    Generates n slate configs, of which a fraction have a curator topic label, and a topic profile that scores all
+    curator topics.
+
+    :return: tuple of slate configs and topic profile
+    """
+    rng = rng or random.Random(0)
+    topics = [t.value for t in CuratorTopic]
+    configs = []
+    for i in range(n):
+        # The first slate always has a topic, such that there's a slate to personalize.
+        label = rng.choice(topics) if i == 0 or rng.random() < TOPIC_COVERAGE else None
+        configs.append(SlateConfigModel(f'slate-{i}', f'Slate {i}', 'benchmark', curator_topic_label=label))
+
+    personalized_topics = PersonalizedTopicList(curator_topics=[
+        PersonalizedTopicElement(curator_topic_label=topic, score=rng.random()) for topic in topics
+    ])
+    return configs, personalized_topics
+
+
+def _columns_benchmark(ranker: Callable) -> BenchmarkFactory:
+    def factory(n):
+        columns, _ = generate_candidate_columns(n)
+        return lambda: ranker(columns)
+    return factory
+
+
+def _thompson_sampling_benchmark(ranker: Callable) -> BenchmarkFactory:
+    def factory(n):
+        columns, metrics = generate_candidate_columns(n)
+        return lambda: ranker(columns, metrics)
+    return factory
+
+
+def _personalized_topics_benchmark(ranker: Callable) -> BenchmarkFactory:
+    def factory(n):
+        configs, personalized_topics = generate_topic_slate_configs(n)
+        return lambda: ranker(configs, personalized_topics)
+    return factory
+
+
+def get_benchmarks() -> Dict[str, BenchmarkFactory]:
+    """
+    :return: benchmark for each ranker name, which fails if a ranker is added without a benchmark
+    """
+    benchmarks = {}
+    for name, ranker in get_all_rankers().items():
+        if name == 'thompson-sampling':
+            benchmarks[name] = _thompson_sampling_benchmark(ranker.func)
+        elif name == 'personalized-topics':
+            benchmarks[name] = _personalized_topics_benchmark(ranker.func)
+        elif name in {'top5', 'top15', 'top30', 'top45', 'pubspread', 'blocklist'}:
+            benchmarks[name] = _columns_benchmark(ranker.func)
+        else:
+            raise ValueError(f'No benchmark for ranker {name}')
+    return benchmarks
+
+
+def run(names: Optional[List[str]], sizes: List[int], min_duration: float, repeat: int = DEFAULT_REPEAT) -> dict:
+    """
+    :param names: names of the rankers to benchmark, or None to benchmark all
+    :param sizes: candidate set sizes
+    :param min_duration: minimum time in seconds to spend per repeat
+    :param repeat: number of repeats
+    :return: results, in the format that is stored as a baseline
+    """
+    global_sdk_config.set_sdk_enabled(False)
+
+    results = {}
+    for name, factory in get_benchmarks().items():
+        if names and name not in names:
+            continue
+
+        results[name] = {}
+        for n in sizes:
+            # Seed rankers the same way in every run, such that runs rank the same items in the same order.
+            seed_rng(0)
+            times = measure_call(factory(n), min_duration=min_duration, repeat=repeat)
+            results[name][str(n)] = {
+                # Median over repeats is robust against a repeat that was interrupted by other processes.
+                'latency_ms': statistics.median(times) * 1000,
+                'throughput': n / min(times),
+            }
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float, min_delta_ms: float = DEFAULT_MIN_DELTA_MS) -> List[list]:
+    """
+    :param baseline: stored results
+    :param current: new results
+    :param threshold: relative change in latency or throughput that is a regression, e.g. 0.2 for 20%
+    :param min_delta_ms: minimum increase in milliseconds per call that is a regression
+    :return: a row per ranker and size in both results, with the status 'REGRESSION' if latency increased or
+             throughput decreased by more than `threshold`, and the time per call increased by more than `min_delta_ms`
+    """
+    rows = []
+    for name, current_sizes in current['results'].items():
+        for size, result in current_sizes.items():
+            expected = baseline['results'].get(name, {}).get(size)
+            if expected is None:
+                continue
+
+            latency_change = result['latency_ms'] / expected['latency_ms'] - 1
+            throughput_change = result['throughput'] / expected['throughput'] - 1
+            # Throughput is measured on the fastest repeat, so convert it to the time per call of that repeat.
+            latency_delta_ms = result['latency_ms'] - expected['latency_ms']
+            fastest_delta_ms = int(size) * 1000 * (1 / result['throughput'] - 1 / expected['throughput'])
+            regressed = (latency_change > threshold and latency_delta_ms > min_delta_ms) or \
+                        (throughput_change < -threshold and fastest_delta_ms > min_delta_ms)
+            rows.append([name, int(size), expected['latency_ms'], result['latency_ms'], f'{latency_change:+.1%}',
+                         f'{throughput_change:+.1%}', 'REGRESSION' if regressed else 'ok'])
+
+    return rows
+
+
+def _print_run(results: dict):
+    rows = [[name, int(size), r['latency_ms'], round(r['throughput'])]
+            for name, sizes in results['results'].items() for size, r in sizes.items()]
+    print_results('rankers', ['ranker', 'candidates', 'latency (ms)', 'items/s'], rows)
+
+
+def _load(path: str) -> dict:
+    with open(path, 'r') as fp:
+        return json.load(fp)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks rankers against stored baselines.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='run benchmarks, and optionally store the results')
+    run_parser.add_argument('--output', help='file to store the results in, e.g. the baseline file')
+
+    compare_parser = subparsers.add_parser('compare', help='compare results against a baseline')
+    compare_parser.add_argument('--baseline', default=BASELINE_FILE)
+    compare_parser.add_argument('--results', help='stored results to compare, instead of running the benchmarks')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    compare_parser.add_argument('--min-delta-ms', type=float, default=DEFAULT_MIN_DELTA_MS,
+                                help='minimum increase in milliseconds per call that is reported as a regression')
+
+    for subparser in (run_parser, compare_parser):
+        subparser.add_argument('--rankers', nargs='+', help='rankers to benchmark, defaults to all')
+        subparser.add_argument('--sizes', nargs='+', type=int, default=SIZES)
+        subparser.add_argument('--min-duration', type=float, default=0.2,
+                               help='minimum time in seconds to spend per repeat')
+        subparser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='number of repeats')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        results = run(args.rankers, args.sizes, args.min_duration, args.repeat)
+        _print_run(results)
+        if args.output:
+            os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+            with open(args.output, 'w') as fp:
+                json.dump(results, fp, indent=2, sort_keys=True)
+                fp.write('\n')
+        return 0
+
+    baseline = _load(args.baseline)
+    current = _load(args.results) if args.results else run(args.rankers, args.sizes, args.min_duration, args.repeat)
+    for key in ('python', 'numpy'):
+        if baseline['environment'].get(key) != current['environment'].get(key):
+            print(f"Warning: the baseline was stored with {key} {baseline['environment'].get(key)}, "
+                  f"but the results were measured with {current['environment'].get(key)}")
+
+    rows = compare(baseline, current, args.threshold, args.min_delta_ms)
+    print_results(f'rankers compared to {args.baseline}, threshold {args.threshold:.0%} and {args.min_delta_ms}ms',
+                  ['ranker', 'candidates', 'baseline (ms)', 'current (ms)', 'latency', 'throughput', 'status'], rows)
+
+    regressions = [row for row in rows if row[-1] == 'REGRESSION']
+    if regressions:
+        print(f'{len(regressions)} regression(s) beyond {args.threshold:.0%}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
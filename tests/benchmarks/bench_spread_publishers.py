@@ -0,0 +1,39 @@
+"""
+Compares publisher spreading against the previous implementation, which scans the input list from the start after
+every placed item. The previous implementation is quadratic for skewed publishers, and takes minutes for the most
+skewed 50k candidates case.
+
+Usage: python -m tests.benchmarks.bench_spread_publishers
+"""
+import random
+
+from aws_xray_sdk import global_sdk_config
+
+from app.rankers.algorithms import spread_publishers
+from tests.benchmarks import reference_rankers
+from tests.benchmarks.utils import generate_candidates, generate_publishers, time_call, print_results
+
+SIZES = [1000, 50000]
+# Number of distinct publishers. Publishers are Zipf-distributed, so fewer publishers means a more skewed distribution.
+PUBLISHER_COUNTS = [50, 5]
+
+
+def main():
+    global_sdk_config.set_sdk_enabled(False)
+
+    rows = []
+    for n in SIZES:
+        recs, _ = generate_candidates(n, metrics_coverage=0)
+        for publisher_count in PUBLISHER_COUNTS:
+            for rec, publisher in zip(recs, generate_publishers(n, publisher_count, rng=random.Random(0))):
+                rec.publisher = publisher
+
+            reference = time_call(lambda: reference_rankers.spread_publishers(recs))
+            optimized = time_call(lambda: spread_publishers(recs))
+            rows.append([n, publisher_count, reference * 1000, optimized * 1000, reference / optimized])
+
+    print_results('pubspread', ['candidates', 'publishers', 'reference (ms)', 'optimized (ms)', 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+"""
+Compares the vectorized Thompson sampling ranker against the previous per-item scipy implementation.
+
+Usage: python -m tests.benchmarks.bench_thompson_sampling
+"""
+from aws_xray_sdk import global_sdk_config
+
+from app.rankers.algorithms import thompson_sampling
+from tests.benchmarks import reference_rankers
+from tests.benchmarks.utils import DEFAULT_SIZES, generate_candidates, time_call, print_results
+
+
+def main():
+    global_sdk_config.set_sdk_enabled(False)
+
+    rows = []
+    for n in DEFAULT_SIZES:
+        recs, metrics = generate_candidates(n)
+        reference = time_call(lambda: reference_rankers.thompson_sampling(recs, metrics))
+        vectorized = time_call(lambda: thompson_sampling(recs, metrics))
+        rows.append([n, reference * 1000, vectorized * 1000, reference / vectorized])
+
+    print_results('thompson-sampling', ['candidates', 'reference (ms)', 'vectorized (ms)', 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Compares the exact and approximate samplers of the Thompson sampling ranker, for items with many impressions. Reports
+the speed of each sampler, and the Kolmogorov-Smirnov distance between approximate samples and scipy's beta.rvs.
+
+Usage: python -m tests.benchmarks.bench_thompson_sampling_sampler
+"""
+import numpy as np
+from scipy.stats import beta, ks_2samp
+
+from app.rankers.algorithms import _sample_posteriors
+from tests.benchmarks.utils import DEFAULT_SIZES, time_call, print_results
+
+# Number of rankings sampled at once, e.g. to fill a thompson sampling pool
+POOL_SIZE = 100
+# Posterior parameters for items at the approximation threshold, and with 100k and 500k impressions
+HIGH_VOLUME_PARAMETERS = [(1000, 19000), (5000, 95000), (50000, 450000)]
+
+
+def main():
+    rng = np.random.default_rng(0)
+
+    rows = []
+    for n in DEFAULT_SIZES:
+        # CTRs between 1% and 10%, and between 20k and 500k impressions
+        impressions = rng.integers(20000, 500000, size=n).astype(float)
+        opens = np.floor(impressions * rng.uniform(0.01, 0.1, size=n))
+        alphas, betas = opens + 0.02, impressions - opens + 1.0
+
+        exact = time_call(lambda: _sample_posteriors(alphas, betas, POOL_SIZE, sampler='exact'))
+        approximate = time_call(lambda: _sample_posteriors(alphas, betas, POOL_SIZE, sampler='approximate'))
+        rows.append([n, exact * 1000, approximate * 1000, exact / approximate])
+
+    print_results(f'posterior samplers, {POOL_SIZE} samples per item',
+                  ['items', 'exact (ms)', 'approx (ms)', 'speedup'], rows)
+
+    rows = []
+    for a, b in HIGH_VOLUME_PARAMETERS:
+        samples = _sample_posteriors(np.array([a], dtype=float), np.array([b], dtype=float), 20000,
+                                     sampler='approximate', approximation_min_count=0)[:, 0]
+        statistic, p_value = ks_2samp(samples, beta.rvs(a, b, size=20000, random_state=1))
+        rows.append([f'{a}/{b}', statistic, p_value])
+
+    print_results('approximate vs scipy beta.rvs, 20000 samples', ['alpha/beta', 'KS statistic', 'p-value'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Previous implementations of rankers in app/rankers/algorithms.py. These are kept as a reference to benchmark
+optimized implementations against, and to verify that their output didn't change.
+"""
+from operator import itemgetter
+from typing import Dict
+
+from scipy.stats import beta
+
+from app.models.metrics.posterior import DEFAULT_ALPHA_PRIOR, DEFAULT_BETA_PRIOR
+from app.rankers.algorithms import RankableListType, RecommendationListType
+
+
+def thompson_sampling(recs: RankableListType, metrics: Dict[(int or str), 'MetricsModel']) -> RankableListType:
+    """
+    Thompson sampling using one scipy beta.rvs call per item.
+    """
+    if not recs:
+        return recs
+
+    alpha_prior, beta_prior = DEFAULT_ALPHA_PRIOR, DEFAULT_BETA_PRIOR
+
+    scores = []
+    prior = beta(alpha_prior, beta_prior)
+    for rec in recs:
+        try:
+            clickdata_id = rec.item.item_id
+        except AttributeError:
+            clickdata_id = rec.id
+
+        d = metrics.get(clickdata_id)
+        if d:
+            clicks = max(d.trailing_28_day_opens + alpha_prior, 1e-18)
+            no_clicks = max(d.trailing_28_day_impressions - d.trailing_28_day_opens + beta_prior, 1e-18)
+            score = beta.rvs(clicks, no_clicks)
+            scores.append((rec, score))
+        else:
+            scores.append((rec, prior.rvs()))
+
+    scores.sort(key=itemgetter(1), reverse=True)
+    return [x[0] for x in scores]
+
+
+def spread_publishers(recs: RecommendationListType, spread: int = 3) -> RecommendationListType:
+    """
+    Publisher spread that pops items from the input list, and restarts its scan after every placed item.
+    Unlike the original, this copies recs first, such that it can be called repeatedly on the same list.
+    """
+    recs = list(recs)
+
+    if not len(recs):
+        return recs
+
+    reordered = [recs.pop(0)]
+    iterator = 0
+
+    while len(recs):
+        if (len(recs) <= spread) or (iterator >= len(recs)):
+            reordered.extend(recs)
+            break
+
+        if len(reordered) > spread:
+            domains_to_check = [x.publisher for x in reordered[-spread:]]
+        else:
+            domains_to_check = [x.publisher for x in reordered]
+
+        if recs[iterator].publisher not in domains_to_check:
+            reordered.append(recs.pop(iterator))
+            iterator = 0
+        else:
+            iterator += 1
+
+    return reordered
@@ -0,0 +1,120 @@
+import random
+import time
+import timeit
+from typing import List, Dict, Tuple, Callable
+
+from app.models.item import ItemModel
+from app.models.metrics.metrics_model import MetricsModel
+from app.models.metrics.posterior import with_posteriors
+from app.models.recommendation import RecommendationModel
+
+# Candidate set sizes that benchmarks are run against by default.
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+
+
+def generate_publishers(n: int, publisher_count: int = 50, rng: random.Random = None) -> List[str]:
+    """
+    Generates a skewed publisher distribution, where a few publishers account for most of the candidates. This is
+    similar to our candidate sets, where a handful of large publishers dominate.
+
+    :param n: number of publishers to generate
+    :param publisher_count: number of distinct publishers
+    :param rng: random generator, defaults to a fixed seed such that runs are comparable
+    :return: list of n publisher domains
+    """
+    rng = rng or random.Random(0)
+    domains = [f'publisher-{i}.com' for i in range(publisher_count)]
+    # Zipf-like weights: the i-th publisher is i times less likely than the first.
+    weights = [1 / (i + 1) for i in range(publisher_count)]
+    return rng.choices(domains, weights=weights, k=n)
+
+
+def generate_candidates(
+        n: int,
+        metrics_coverage: float = 0.8,
+        rng: random.Random = None) -> Tuple[List[RecommendationModel], Dict[str, MetricsModel]]:
+    """
+    Generates n recommendations with skewed publishers, and engagement metrics for a fraction of them.
+
+    :param n: number of recommendations
+    :param metrics_coverage: fraction of recommendations that have engagement metrics
+    :param rng: random generator, defaults to a fixed seed such that runs are comparable
+    :return: tuple of recommendations and metrics keyed on item id, with posterior parameters for the default window
+    """
+    rng = rng or random.Random(0)
+    publishers = generate_publishers(n, rng=rng)
+
+    recs = []
+    metrics = {}
+    for i in range(n):
+        item_id = str(1000000 + i)
+        recs.append(RecommendationModel(
+            item_id=item_id,
+            item=ItemModel(item_id=item_id),
+            publisher=publishers[i],
+        ))
+
+        if rng.random() < metrics_coverage:
+            impressions = rng.randint(0, 500000)
+            opens = rng.randint(0, impressions // 10)
+            metrics[item_id] = MetricsModel(
+                id=f'{item_id}/benchmark',
+                trailing_1_day_opens=opens // 28,
+                trailing_1_day_impressions=impressions // 28,
+                trailing_7_day_opens=opens // 4,
+                trailing_7_day_impressions=impressions // 4,
+                trailing_14_day_opens=opens // 2,
+                trailing_14_day_impressions=impressions // 2,
+                trailing_28_day_opens=opens,
+                trailing_28_day_impressions=impressions,
+            )
+
+    metrics = with_posteriors(metrics)
+
+    return recs, metrics
+
+
+def time_call(func: Callable[[], object], min_duration: float = 0.2) -> float:
+    """
+    :param func: function without arguments to benchmark
+    :param min_duration: minimum total time in seconds to spend calling func. Functions that take longer than this
+                         for a single call are only called once.
+    :return: best mean time in seconds per call, over 3 repeats
+    """
+    start = time.perf_counter()
+    func()
+    duration = time.perf_counter() - start
+    if duration >= min_duration:
+        return duration
+
+    timer = timeit.Timer(func)
+    number = max(1, int(min_duration / max(duration, 1e-9)))
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+
+def measure_call(func: Callable[[], object], min_duration: float = 0.2, repeat: int = 5) -> List[float]:
+    """
+    :param func: function without arguments to benchmark
+    :param min_duration: minimum time in seconds to spend on each repeat. Functions that take longer than this for a
+                         single call are called once per repeat.
+    :param repeat: number of repeats
+    :return: mean time in seconds per call, for each repeat
+    """
+    start = time.perf_counter()
+    func()
+    duration = time.perf_counter() - start
+
+    timer = timeit.Timer(func)
+    number = max(1, int(min_duration / max(duration, 1e-9)))
+    return [t / number for t in timer.repeat(repeat=repeat, number=number)]
+
+
+def print_results(title: str, columns: List[str], rows: List[List]):
+    """
+    Prints benchmark results as a table.
+    """
+    print(title)
+    print(''.join(f'{c:>16}' for c in columns))
+    for row in rows:
+        print(''.join(f'{v:>16.6f}' if isinstance(v, float) else f'{v:>16}' for v in row))
+    print()
@@ -3,6 +3,11 @@ from fastapi.testclient import TestClient
 from app.main import app
 from app.health_status import set_health_status, HealthStatus
 
+NO_METRICS_CACHE_LOOKUPS = {
+    "recommendations": {"local": None, "memcached": None},
+    "slates": {"local": None, "memcached": None},
+}
+
 
 class TestHealthCheck:
     client: TestClient = TestClient(app)
@@ -11,16 +16,19 @@ class TestHealthCheck:
         set_health_status(HealthStatus.UNKNOWN)
         response = self.client.get("/health-check")
         assert response.status_code == 503
-        assert response.json() == {"status": "UNKNOWN"}
+        assert response.json() == {"status": "UNKNOWN", "candidateSets": {"warm": 0, "total": 0},
+                                   "startupSeconds": None, "metricsCache": NO_METRICS_CACHE_LOOKUPS}
 
     def test_unhealthy_status(self):
         set_health_status(HealthStatus.UNHEALTHY)
         response = self.client.get("/health-check")
         assert response.status_code == 503
-        assert response.json() == {"status": "UNHEALTHY"}
+        assert response.json() == {"status": "UNHEALTHY", "candidateSets": {"warm": 0, "total": 0},
+                                   "startupSeconds": None, "metricsCache": NO_METRICS_CACHE_LOOKUPS}
 
     def test_healthy_status(self):
         set_health_status(HealthStatus.HEALTHY)
         response = self.client.get("/health-check")
         assert response.status_code == 200
-        assert response.json() == {"status": "HEALTHY"}
+        assert response.json() == {"status": "HEALTHY", "candidateSets": {"warm": 0, "total": 0},
+                                   "startupSeconds": None, "metricsCache": NO_METRICS_CACHE_LOOKUPS}
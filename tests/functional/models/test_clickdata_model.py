@@ -11,8 +11,8 @@ class TestRecommendationMetricsModel(TestDynamoDBBase):
 
         metrics = await RecommendationMetricsFactory(dynamodb_config["endpoint_url"]).get("1234-ABCD",
                                                                                           ["666666", "333333"])
-        assert len(metrics) == 2
-        # assert "default" in metrics  # this has been removed until priors are added back in
+        assert len(metrics) == 3
+        assert "default" in metrics
         assert "666666" in metrics
         assert "333333" in metrics
         assert "999999" not in metrics
@@ -26,8 +26,8 @@ class TestRecommendationMetricsModel(TestDynamoDBBase):
         # - foobar doesn't exist, and will not be created
         metrics = await RecommendationMetricsFactory(dynamodb_config["endpoint_url"]).get("1234-ABCD",
                                                                           ["111111", "666666", "333333", "foobar"])
-        assert len(metrics) == 2
-        # assert metrics["default"].trailing_28_day_opens == 200  # no priors as above
+        assert len(metrics) == 3
+        assert metrics["default"].trailing_28_day_opens == 200
         assert metrics["333333"].trailing_28_day_opens == 33
         assert metrics["666666"].trailing_28_day_opens == 66
         assert "foobar" not in metrics
@@ -58,8 +58,8 @@ class TestRecommendationMetricsModel(TestDynamoDBBase):
         # The click value in the database has changed. Assert that we're getting the same click value from cache.
         metrics = await RecommendationMetricsFactory(dynamodb_config["endpoint_url"]).get("1234-ABCD",
                                                                                           ["111111", "666666", "333333"])
-        assert len(metrics) == 2
-        # assert metrics["default"].clicks == 200  # no priors as above
+        assert len(metrics) == 3
+        assert metrics["default"].trailing_28_day_opens == 200
         assert metrics["333333"].trailing_28_day_opens == 33
         assert metrics["666666"].trailing_28_day_opens == 66
         assert "foobar" not in metrics
@@ -71,8 +71,8 @@ class TestRecommendationMetricsModel(TestDynamoDBBase):
         # The cache has been cleared. Assert that we're getting the new click values from the database.
         metrics = await RecommendationMetricsFactory(dynamodb_config["endpoint_url"]).get("1234-ABCD",
                                                                                           ["111111", "666666", "333333"])
-        assert len(metrics) == 3
-        # assert metrics["default"].clicks == 200  # no default prior key
+        assert len(metrics) == 4
+        assert metrics["default"].trailing_28_day_opens == 200
         assert metrics["333333"].trailing_28_day_opens == 33
         assert metrics["666666"].trailing_28_day_opens == 67
         assert "foobar" not in metrics
@@ -5,11 +5,14 @@ import unittest
 from aioresponses import aioresponses
 
 import app.config
-from app.models.personalized_topic_list import PersonalizedTopicList
+from app.models.personalized_topic_list import PersonalizedTopicList, user_profile_cache
 
 
 class TestPersonalizedTopics(unittest.IsolatedAsyncioTestCase):
 
+    def setUp(self):
+        user_profile_cache.clear()
+
     async def _read_json_asset(self, filename: str):
         with open(os.path.join(app.config.ROOT_DIR, 'tests/assets/json/', filename)) as f:
             return json.load(f)
@@ -20,6 +23,7 @@ class TestPersonalizedTopics(unittest.IsolatedAsyncioTestCase):
 
         assert len(personalized_topics.curator_topics) == 16
         assert personalized_topics.curator_topics[0].curator_topic_label == 'Technology'
+        assert personalized_topics.topic_scores['Technology'] == personalized_topics.curator_topics[0].score
 
     @aioresponses()
     async def test_get(self, mocked):
@@ -32,6 +36,18 @@ class TestPersonalizedTopics(unittest.IsolatedAsyncioTestCase):
         personalized_topics = await PersonalizedTopicList.get(user_id)
         assert len(personalized_topics.curator_topics) == 16
 
+    @aioresponses()
+    async def test_get_cached(self, mocked):
+        user_id = '123'
+        url = f'{app.config.recit["endpoint_url"]}/v1/user_profile/{user_id}?predict_topics=true'
+        fixture = await self._read_json_asset("recit_full_user_profile.json")
+
+        # RecIt is only called once
+        mocked.get(url, status=200, payload=fixture)
+
+        personalized_topics = await PersonalizedTopicList.get(user_id)
+        assert await PersonalizedTopicList.get(user_id) is personalized_topics
+
     @aioresponses()
     async def test_get_404(self, mocked):
         user_id = '123'
@@ -7,6 +7,9 @@ import json
 from aiocache import caches
 from app.cache import initialize_caches, candidate_set_alias, metrics_alias
 from app.config import dynamodb as dynamodb_config, ROOT_DIR
+from app.models.candidate_set import local_candidate_set_cache
+from app.models.metrics.recommendation_metrics_factory import RecommendationMetricsFactory
+from app.models.metrics.slate_metrics_factory import SlateMetricsFactory
 from mypy_boto3_dynamodb.service_resource import DynamoDBServiceResource
 from aws_xray_sdk import global_sdk_config
 
@@ -39,6 +42,10 @@ class TestDynamoDBBase(unittest.IsolatedAsyncioTestCase):
         await self.clear_caches()
 
     async def clear_caches(self):
+        local_candidate_set_cache.clear()
+        RecommendationMetricsFactory.metrics_cache.clear()
+        SlateMetricsFactory.metrics_cache.clear()
+
         # Clear memcached
         for alias in (candidate_set_alias, metrics_alias):
             cache = caches.get(alias)
@@ -0,0 +1,102 @@
+from decimal import Decimal
+
+import pytest
+
+from app.cache import BinarySerializer, JsonSerializerWithNoneToken, NoneValue
+
+CANDIDATE_SET_ENTRY = {
+    'value': {
+        'Items': [{
+            'id': 'cs-1',
+            'version': Decimal(3),
+            'created_at': Decimal(1612907252),
+            'candidates': [
+                {'item_id': Decimal(3208490410), 'publisher': 'example.com', 'feed_id': Decimal(1)},
+                {'item_id': Decimal(3208490411), 'publisher': 'example.org'},
+                {'item_id': Decimal(3208490412), 'publisher': 'example.com', 'feed_id': None},
+            ],
+        }],
+    },
+    'refresh_at': 1612908152.5,
+}
+
+METRICS_ROW = {
+    'recommendations_pk': '3208490410/cs-1',
+    'trailing_1_day_opens': Decimal(10),
+    'trailing_1_day_impressions': Decimal(100),
+    'trailing_7_day_opens': Decimal(70),
+    'trailing_7_day_impressions': Decimal(700),
+    'trailing_14_day_opens': Decimal('140.5'),
+    'trailing_14_day_impressions': Decimal(1400),
+    'trailing_28_day_opens': Decimal(280),
+    'trailing_28_day_impressions': Decimal(2800),
+    'created_at': Decimal(1612907252),
+}
+
+
+class TestBinarySerializer:
+
+    def test_candidate_set_entry(self):
+        serializer = BinarySerializer()
+        data = serializer.dumps(CANDIDATE_SET_ENTRY)
+
+        assert data[:2] == bytes([BinarySerializer.FORMAT_VERSION, BinarySerializer._CANDIDATE_SET_ENTRY])
+        assert serializer.loads(data) == {
+            'value': {
+                'Items': [{
+                    'id': 'cs-1',
+                    'version': 3,
+                    'created_at': 1612907252,
+                    'candidates': [
+                        {'item_id': 3208490410, 'publisher': 'example.com', 'feed_id': 1},
+                        {'item_id': 3208490411, 'publisher': 'example.org'},
+                        {'item_id': 3208490412, 'publisher': 'example.com'},
+                    ],
+                }],
+            },
+            'refresh_at': 1612908152.5,
+        }
+
+    def test_metrics_row(self):
+        serializer = BinarySerializer()
+        data = serializer.dumps(METRICS_ROW)
+
+        assert data[:2] == bytes([BinarySerializer.FORMAT_VERSION, BinarySerializer._METRICS_ROW])
+        assert serializer.loads(data) == {k: v if isinstance(v, str) else float(v) for k, v in METRICS_ROW.items()}
+
+    @pytest.mark.parametrize("value", [None, NoneValue])
+    def test_none(self, value):
+        serializer = BinarySerializer()
+        assert serializer.loads(serializer.dumps(value)) is NoneValue
+
+    @pytest.mark.parametrize(
+        "value",
+        [
+            {'foo': 'bar'},
+            [1, 2, 3],
+            {**METRICS_ROW, 'unknown_field': 1},
+            {'value': {'Items': [{'id': 'cs-1', 'version': 1, 'candidates': [{'item_id': 'abc', 'publisher': 'a'}]}]},
+             'refresh_at': 0},
+            # A version beyond int64, which ujson can still dump, unlike integers beyond uint64.
+            {'value': {'Items': [{'id': 'cs-1', 'version': 2 ** 63, 'candidates': []}]}, 'refresh_at': 0},
+        ])
+    def test_other_values_are_stored_as_json(self, value):
+        serializer = BinarySerializer()
+        data = serializer.dumps(value)
+
+        assert data[:2] == bytes([BinarySerializer.FORMAT_VERSION, BinarySerializer._JSON])
+        assert serializer.loads(data) == value
+
+    @pytest.mark.parametrize("value", [None, b'', b'{"foo":"bar"}', b'<NONE>', bytes([2, 0])])
+    def test_loads_other_versions_as_miss(self, value):
+        assert BinarySerializer().loads(value) is None
+
+    def test_smaller_than_json(self):
+        entry = {
+            'value': {'Items': [{'id': 'cs-1', 'version': 1, 'candidates': [
+                {'item_id': 3208490410 + i, 'publisher': f'publisher-{i % 10}.com'} for i in range(100)
+            ]}]},
+            'refresh_at': 1612908152.5,
+        }
+
+        assert len(BinarySerializer().dumps(entry)) < len(JsonSerializerWithNoneToken().dumps(entry)) / 2
@@ -0,0 +1,50 @@
+import asyncio
+import unittest
+
+from aiocache import SimpleMemoryCache
+
+from app.cache import fetch_with_lock
+
+
+class TestFetchWithLock(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.cache = SimpleMemoryCache()
+        self.calls = 0
+
+    async def asyncTearDown(self):
+        await self.cache.clear()
+
+    async def fetch(self):
+        self.calls += 1
+        await asyncio.sleep(0.02)
+        return {'Items': [self.calls]}
+
+    async def test_caches_value(self):
+        assert await fetch_with_lock(self.cache, 'k', self.fetch, ttl=60, lock_ttl=0) == {'Items': [1]}
+        assert await self.cache.get('k') == {'Items': [1]}
+
+    async def test_lock_lets_one_caller_fetch(self):
+        # Each call acts like a different worker, because they don't share an in-process single flight.
+        results = await asyncio.gather(*(
+            fetch_with_lock(self.cache, 'k', self.fetch, ttl=60, lock_ttl=5, poll_interval=0.001) for _ in range(5)
+        ))
+
+        assert results == [{'Items': [1]}] * 5
+        assert self.calls == 1
+        assert not await self.cache.exists('k:lock')
+
+    async def test_fetches_when_lock_expires(self):
+        await self.cache.add('k:lock', 1, ttl=60)
+        result = await fetch_with_lock(self.cache, 'k', self.fetch, ttl=60, lock_ttl=1, poll_interval=0.2)
+
+        assert result == {'Items': [1]}
+        assert self.calls == 1
+
+    async def test_releases_lock_when_fetch_fails(self):
+        async def fail():
+            raise KeyError('k')
+
+        with self.assertRaises(KeyError):
+            await fetch_with_lock(self.cache, 'k', fail, ttl=60, lock_ttl=5)
+
+        assert not await self.cache.exists('k:lock')
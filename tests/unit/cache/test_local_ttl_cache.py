@@ -0,0 +1,76 @@
+from app.cache import LocalTTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLocalTTLCache:
+
+    def test_get_and_set(self):
+        cache = LocalTTLCache(maxsize=10, ttl=60)
+        assert cache.get('a') is None
+        assert cache.get('a', 'default') == 'default'
+
+        cache.set('a', 1)
+        assert cache.get('a') == 1
+
+    def test_expires_values(self):
+        clock = FakeClock()
+        cache = LocalTTLCache(maxsize=10, ttl=60, clock=clock)
+        cache.set('a', 1)
+
+        clock.now = 59
+        assert cache.get('a') == 1
+        clock.now = 60
+        assert cache.get('a') is None
+        assert len(cache) == 0
+
+    def test_evicts_least_recently_used_value(self):
+        cache = LocalTTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.get('c') == 3
+
+    def test_disabled(self):
+        cache = LocalTTLCache(maxsize=0, ttl=60)
+        cache.set('a', 1)
+        assert cache.get('a') is None
+
+    def test_clear(self):
+        cache = LocalTTLCache(maxsize=10, ttl=60)
+        cache.set('a', 1)
+        cache.clear()
+        assert cache.get('a') is None
+
+    def test_counts_hits_and_misses(self):
+        clock = FakeClock()
+        cache = LocalTTLCache(maxsize=10, ttl=60, clock=clock)
+        cache.get('a')
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('a')
+        clock.now = 60
+        cache.get('a')
+
+        assert (cache.hits, cache.misses) == (2, 2)
+
+    def test_contains(self):
+        clock = FakeClock()
+        cache = LocalTTLCache(maxsize=10, ttl=60, clock=clock)
+        cache.set('a', 1)
+
+        assert 'a' in cache
+        assert 'b' not in cache
+        clock.now = 60
+        assert 'a' not in cache
+        assert (cache.hits, cache.misses) == (0, 0)
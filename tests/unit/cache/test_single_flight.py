@@ -0,0 +1,68 @@
+import asyncio
+import unittest
+
+from app.cache import SingleFlight
+
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+    async def test_coalesces_concurrent_calls(self):
+        single_flight = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return len(calls)
+
+        results = await asyncio.gather(*(single_flight.do('a', fetch) for _ in range(10)))
+
+        assert results == [1] * 10
+        assert len(calls) == 1
+        assert len(single_flight) == 0
+
+    async def test_calls_again_after_completion(self):
+        single_flight = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            return len(calls)
+
+        assert await single_flight.do('a', fetch) == 1
+        assert await single_flight.do('a', fetch) == 2
+
+    async def test_does_not_coalesce_different_keys(self):
+        single_flight = SingleFlight()
+
+        async def fetch(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(single_flight.do('a', lambda: fetch('a')),
+                                       single_flight.do('b', lambda: fetch('b')))
+        assert results == ['a', 'b']
+
+    async def test_raises_for_all_callers(self):
+        single_flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise KeyError('a')
+
+        results = await asyncio.gather(*(single_flight.do('a', fetch) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, KeyError) for r in results)
+        assert len(single_flight) == 0
+
+    async def test_cancelled_caller_does_not_cancel_others(self):
+        single_flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            return 'a'
+
+        first = asyncio.ensure_future(single_flight.do('a', fetch))
+        second = asyncio.ensure_future(single_flight.do('a', fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == 'a'
@@ -0,0 +1,206 @@
+import asyncio
+import unittest
+from contextlib import asynccontextmanager
+from unittest.mock import patch
+
+from aiocache import SimpleMemoryCache
+
+import app.config
+from app.models.metrics.metrics_cache import MetricsCache
+from app.models.metrics.metrics_model import MetricsWindow
+from app.models.metrics.recommendation_metrics_factory import RecommendationMetricsFactory
+from app.rankers.algorithms import thompson_sampling
+from tests.unit.utils import generate_recommendations
+
+TABLE = app.config.dynamodb['recommendation_metrics']['table']
+PK = app.config.dynamodb['recommendation_metrics']['pk']
+
+
+def make_row(key: str, opens: int, impressions: int) -> dict:
+    counts = {f'trailing_{days}_opens': opens for days in ['1_day', '7_day', '14_day']}
+    counts.update({f'trailing_{days}_impressions': impressions for days in ['1_day', '7_day', '14_day']})
+    # The prior is always stored in the 28 day window.
+    return {PK: key, **counts, 'trailing_28_day_opens': 2, 'trailing_28_day_impressions': 50}
+
+
+class FakeDynamoDB:
+    """
+    Stands in for a DynamoDB resource with a metrics table. Like DynamoDB under load, it processes at most
+    `processed_per_request` keys per BatchGetItem request, and returns the other keys as UnprocessedKeys. Keys in
+    `throttled_keys` are never processed.
+    """
+
+    def __init__(self, rows: dict, processed_per_request: int = 100, throttled_keys: frozenset = frozenset()):
+        self.rows = rows
+        self.processed_per_request = processed_per_request
+        self.throttled_keys = throttled_keys
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def batch_get_item(self, RequestItems, ReturnConsumedCapacity='NONE'):
+        keys = RequestItems[TABLE]['Keys']
+        assert len(keys) <= 100
+
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.001)
+        self.in_flight -= 1
+
+        throttled = [key for key in keys if key[PK] in self.throttled_keys]
+        keys = [key for key in keys if key[PK] not in self.throttled_keys]
+        processed, unprocessed = keys[:self.processed_per_request], keys[self.processed_per_request:] + throttled
+        response = {
+            'Responses': {TABLE: [self.rows[key[PK]] for key in processed if key[PK] in self.rows]},
+            'UnprocessedKeys': {TABLE: {'Keys': unprocessed}} if unprocessed else {},
+        }
+        if ReturnConsumedCapacity == 'TOTAL':
+            response['ConsumedCapacity'] = [{'TableName': TABLE, 'CapacityUnits': len(processed) / 2}]
+        return response
+
+
+class TestAbstractMetricsFactoryQueryMetrics(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        patcher = patch.dict(app.config.dynamodb, {
+            'batch_get_concurrency': 4,
+            'batch_get_max_retries': 5,
+            'batch_get_retry_delay': 0,
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.keys = [f'{i}/slate' for i in range(1050)]
+        # Every third key doesn't exist.
+        self.rows = {key: make_row(key, opens=i % 10, impressions=100) for i, key in enumerate(self.keys) if i % 3}
+
+    @asynccontextmanager
+    async def _factory(self, dynamodb: FakeDynamoDB):
+        @asynccontextmanager
+        async def dynamodb_resource():
+            yield dynamodb
+
+        factory = RecommendationMetricsFactory(app.config.dynamodb['endpoint_url'])
+        with patch.object(factory, '_dynamodb_resource', dynamodb_resource):
+            yield factory
+
+    async def _query_metrics(self, dynamodb: FakeDynamoDB) -> dict:
+        async with self._factory(dynamodb) as factory:
+            return await factory._query_metrics(self.keys)
+
+    async def test_queries_chunks_concurrently(self):
+        dynamodb = FakeDynamoDB(self.rows)
+
+        metrics = await self._query_metrics(dynamodb)
+
+        assert metrics == {key: self.rows.get(key) for key in self.keys}
+        assert dynamodb.requests == 11
+        assert dynamodb.max_in_flight == 4
+
+    async def test_retries_unprocessed_keys(self):
+        dynamodb = FakeDynamoDB(self.rows, processed_per_request=30)
+        consumed_capacity_units = RecommendationMetricsFactory.consumed_capacity_units
+
+        metrics = await self._query_metrics(dynamodb)
+
+        assert metrics == {key: self.rows.get(key) for key in self.keys}
+        # 10 chunks of 100 keys take 4 requests each, and the last chunk of 50 keys takes 2 requests.
+        assert dynamodb.requests == 42
+        assert RecommendationMetricsFactory.consumed_capacity_units == consumed_capacity_units + len(self.keys) / 2
+
+    async def test_leaves_out_keys_that_remain_unprocessed(self):
+        dynamodb = FakeDynamoDB(self.rows, processed_per_request=10)
+
+        with self.assertLogs(level='WARNING'):
+            metrics = await self._query_metrics(dynamodb)
+
+        # Chunks of 100 keys process 10 keys in each of 6 requests, and the last chunk of 50 keys is processed fully.
+        assert len(metrics) == 10 * 60 + 50
+        assert all(metrics[key] == self.rows.get(key) for key in metrics)
+
+    async def test_ranks_items_when_throttled(self):
+        dynamodb = FakeDynamoDB(self.rows, processed_per_request=10)
+        metrics_cache = MetricsCache(maxsize=10000, ttl=60)
+        memcached = SimpleMemoryCache()
+        # Some aiocache versions share the memory of all SimpleMemoryCache instances.
+        await memcached.clear()
+
+        async with self._factory(dynamodb) as factory:
+            with patch.object(factory, 'metrics_cache', metrics_cache), \
+                    patch('app.models.metrics.metrics_cache.caches.get', return_value=memcached), \
+                    self.assertLogs(level='WARNING'):
+                metrics = await factory.get('slate', [key.split('/')[0] for key in self.keys])
+
+        # Items that couldn't be fetched are ranked using the prior.
+        assert len(metrics) < len(self.rows)
+        recs = generate_recommendations([key.split('/')[0] for key in self.keys])
+        assert len(thompson_sampling(recs, metrics)) == len(self.keys)
+        # Only keys that were processed are cached. Chunks of 100 keys process 60 of them, and the last chunk of 51
+        # keys is processed fully. Metrics are only kept in memory if the prior was processed.
+        cached = await memcached.multi_get([f'metrics:v2:{key}' for key in [*self.keys, 'default/slate']])
+        assert sum(row is not None for row in cached) == 10 * 60 + 51
+        assert len(metrics_cache._local) == (10 * 60 + 51 if cached[-1] is not None else 0)
+
+    async def test_does_not_keep_metrics_without_prior_in_memory(self):
+        self.rows['default/slate'] = make_row('default/slate', opens=0, impressions=0)
+        item_ids = [key.split('/')[0] for key in self.keys[:10]]
+        metrics_cache = MetricsCache(maxsize=10000, ttl=60)
+        await SimpleMemoryCache().clear()
+
+        async def get(dynamodb: FakeDynamoDB):
+            async with self._factory(dynamodb) as factory:
+                with patch.object(factory, 'metrics_cache', metrics_cache), \
+                        patch('app.models.metrics.metrics_cache.caches.get', return_value=SimpleMemoryCache()):
+                    return await factory.get('slate', item_ids, MetricsWindow.TRAILING_1_DAY)
+
+        with self.assertLogs(level='WARNING'):
+            metrics = await get(FakeDynamoDB(self.rows, throttled_keys=frozenset(['default/slate'])))
+
+        # Without the prior, items are ranked with the default prior in this request, but not kept in memory.
+        assert (metrics['1'].posterior_alpha, metrics['1'].posterior_beta) == (1.02, 100)
+        assert len(metrics_cache._local) == 0
+
+        metrics = await get(FakeDynamoDB(self.rows))
+
+        assert (metrics['1'].posterior_alpha, metrics['1'].posterior_beta) == (3, 147)
+
+
+class TestAbstractMetricsFactoryParseRecords(unittest.TestCase):
+    def setUp(self):
+        self.factory = RecommendationMetricsFactory(app.config.dynamodb['endpoint_url'])
+        self.prior_row = make_row('default/slate', opens=0, impressions=0)
+        self.item_row = make_row('1/slate', opens=10, impressions=100)
+
+    def test_sets_posteriors_for_window(self):
+        metrics = self.factory._parse_records(
+            'default/slate', MetricsWindow.TRAILING_1_DAY,
+            {'default/slate': self.prior_row, '1/slate': self.item_row, '2/slate': None}, {})
+
+        assert (metrics['1/slate'].posterior_alpha, metrics['1/slate'].posterior_beta) == (12, 138)
+        assert metrics['2/slate'] is None
+
+    def test_uses_cached_prior(self):
+        cached = self.factory._parse_records(
+            'default/slate', MetricsWindow.TRAILING_1_DAY, {'default/slate': self.prior_row}, {})
+
+        metrics = self.factory._parse_records(
+            'default/slate', MetricsWindow.TRAILING_1_DAY, {'1/slate': self.item_row}, cached)
+
+        assert (metrics['1/slate'].posterior_alpha, metrics['1/slate'].posterior_beta) == (12, 138)
+
+    def test_leaves_out_invalid_prior(self):
+        invalid_prior_row = {**self.prior_row, 'trailing_28_day_impressions': 1}
+
+        with self.assertLogs(level='WARNING'):
+            metrics = self.factory._parse_records(
+                'default/slate', MetricsWindow.TRAILING_1_DAY, {'default/slate': invalid_prior_row}, {})
+
+        assert metrics == {'default/slate': None}
+        # The invalid prior isn't cached, so it isn't logged again when other items are parsed.
+        with patch('logging.warning') as warning:
+            metrics = self.factory._parse_records(
+                'default/slate', MetricsWindow.TRAILING_1_DAY, {'1/slate': self.item_row}, metrics)
+
+        warning.assert_not_called()
+
+        assert (metrics['1/slate'].posterior_alpha, metrics['1/slate'].posterior_beta) == (10.02, 91)
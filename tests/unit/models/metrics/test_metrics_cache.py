@@ -0,0 +1,115 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from aiocache import SimpleMemoryCache
+
+from app.cache import NoneValue
+from app.models.metrics.metrics_cache import MEMCACHED_KEY_PREFIX, MetricsCache
+from app.models.metrics.metrics_model import MetricsModel, MetricsWindow
+
+WINDOW = MetricsWindow.TRAILING_28_DAYS
+
+
+def make_row(key: str, opens: int = 1) -> dict:
+    return {
+        'pk': key,
+        'trailing_1_day_opens': opens, 'trailing_1_day_impressions': 10,
+        'trailing_7_day_opens': opens, 'trailing_7_day_impressions': 10,
+        'trailing_14_day_opens': opens, 'trailing_14_day_impressions': 10,
+        'trailing_28_day_opens': opens, 'trailing_28_day_impressions': 10,
+    }
+
+
+def parse(rows: dict, cached: dict) -> dict:
+    return {key: None if row is None else MetricsModel.parse_obj({**row, 'id': row['pk']}) for key, row in rows.items()}
+
+
+class TestMetricsCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.memcached = SimpleMemoryCache()
+        # Some aiocache versions share the memory of all SimpleMemoryCache instances.
+        await self.memcached.clear()
+        patcher = patch('app.models.metrics.metrics_cache.caches.get', return_value=self.memcached)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.rows = {'a/m': make_row('a/m'), 'b/m': make_row('b/m')}
+        self.fetch = AsyncMock(side_effect=lambda keys: {key: self.rows.get(key) for key in keys})
+
+    async def test_fetches_misses_and_writes_them_back(self):
+        cache = MetricsCache(maxsize=100, ttl=60)
+        await self.memcached.set(MEMCACHED_KEY_PREFIX + 'a/m', make_row('a/m', opens=5))
+
+        metrics = await cache.get(['a/m', 'b/m', 'c/m'], window=WINDOW, ttl=900, fetch=self.fetch, parse=parse)
+
+        assert metrics['a/m'].trailing_28_day_opens == 5
+        assert metrics['b/m'].trailing_28_day_opens == 1
+        assert metrics['c/m'] is None
+        self.fetch.assert_awaited_once_with(['b/m', 'c/m'])
+        assert await self.memcached.get('metrics:v2:b/m') == self.rows['b/m']
+        assert await self.memcached.get('metrics:v2:c/m') is NoneValue
+        # Unversioned keys of the previous release are left alone.
+        assert await self.memcached.get('b/m') is None
+        assert (cache.local_hits, cache.memcached_hits, cache.misses) == (0, 1, 2)
+
+    async def test_keeps_parsed_metrics_in_memory(self):
+        cache = MetricsCache(maxsize=100, ttl=60)
+        first = await cache.get(['a/m', 'c/m'], window=WINDOW, ttl=900, fetch=self.fetch, parse=parse)
+        await self.memcached.clear()
+
+        second = await cache.get(['a/m', 'c/m'], window=WINDOW, ttl=900, fetch=self.fetch, parse=parse)
+
+        assert second == first
+        assert second['c/m'] is None
+        # Metrics are immutable, so requests share them without copying.
+        assert second['a/m'] is first['a/m']
+        with self.assertRaises(TypeError):
+            second['a/m'].posterior_alpha = 1.0
+        assert self.fetch.await_count == 1
+        assert cache.get_hit_ratios() == {'local': 0.5, 'memcached': 0.0}
+
+    async def test_falls_back_to_database_when_memcached_fails(self):
+        cache = MetricsCache(maxsize=100, ttl=60)
+        with patch.object(self.memcached, 'multi_get', AsyncMock(side_effect=OSError())), \
+                patch.object(self.memcached, 'multi_set', AsyncMock(side_effect=OSError())), \
+                self.assertLogs(level='ERROR'):
+            metrics = await cache.get(['a/m'], window=WINDOW, ttl=900, fetch=self.fetch, parse=parse)
+
+        assert metrics['a/m'].trailing_28_day_opens == 1
+
+    async def test_clear(self):
+        cache = MetricsCache(maxsize=100, ttl=60)
+        await cache.get(['a/m'], window=WINDOW, ttl=900, fetch=self.fetch, parse=parse)
+        await self.memcached.clear()
+        cache.clear()
+
+        await cache.get(['a/m'], window=WINDOW, ttl=900, fetch=self.fetch, parse=parse)
+
+        assert self.fetch.await_count == 2
+
+    async def test_parses_rows_per_window(self):
+        cache = MetricsCache(maxsize=100, ttl=60)
+        parse_windows = []
+
+        def parse_window(window):
+            def parse_rows(rows, cached):
+                parse_windows.append((window, sorted(rows), sorted(cached)))
+                return parse(rows, cached)
+            return parse_rows
+
+        await cache.get(['a/m'], MetricsWindow.TRAILING_1_DAY, ttl=900, fetch=self.fetch,
+                        parse=parse_window(MetricsWindow.TRAILING_1_DAY))
+        await cache.get(['a/m', 'b/m'], MetricsWindow.TRAILING_7_DAYS, ttl=900, fetch=self.fetch,
+                        parse=parse_window(MetricsWindow.TRAILING_7_DAYS))
+        await cache.get(['a/m', 'b/m'], MetricsWindow.TRAILING_1_DAY, ttl=900, fetch=self.fetch,
+                        parse=parse_window(MetricsWindow.TRAILING_1_DAY))
+
+        # Rows are parsed once per window, and parse gets the metrics that were already in memory for that window.
+        assert parse_windows == [
+            (MetricsWindow.TRAILING_1_DAY, ['a/m'], []),
+            (MetricsWindow.TRAILING_7_DAYS, ['a/m', 'b/m'], []),
+            (MetricsWindow.TRAILING_1_DAY, ['b/m'], ['a/m']),
+        ]
+
+    def test_hit_ratios_without_lookups(self):
+        assert MetricsCache(maxsize=100, ttl=60).get_hit_ratios() == {'local': None, 'memcached': None}
@@ -0,0 +1,66 @@
+import pytest
+
+from app.models.metrics.metrics_model import MetricsModel, MetricsWindow
+from app.models.metrics.posterior import DEFAULT_ALPHA_PRIOR, DEFAULT_BETA_PRIOR, with_posteriors
+
+
+def _metrics(id: str, opens: float, impressions: float) -> MetricsModel:
+    return MetricsModel(
+        id=id,
+        trailing_1_day_opens=opens,
+        trailing_1_day_impressions=impressions,
+        trailing_7_day_opens=2 * opens,
+        trailing_7_day_impressions=2 * impressions,
+        trailing_14_day_opens=3 * opens,
+        trailing_14_day_impressions=3 * impressions,
+        trailing_28_day_opens=4 * opens,
+        trailing_28_day_impressions=4 * impressions,
+    )
+
+
+class TestPosterior:
+
+    def test_get_counts(self):
+        metrics = _metrics('1/slate', opens=10, impressions=100)
+        assert metrics.get_counts(MetricsWindow.TRAILING_1_DAY) == (10, 100)
+        assert metrics.get_counts(MetricsWindow.TRAILING_7_DAYS) == (20, 200)
+        assert metrics.get_counts(MetricsWindow.TRAILING_14_DAYS) == (30, 300)
+        assert metrics.get_counts(MetricsWindow.TRAILING_28_DAYS) == (40, 400)
+
+    def test_get_decayed_counts(self):
+        metrics = _metrics('1/slate', opens=10, impressions=100)
+        # Each 10 opens in a period are weighted half as much as the previous period
+        assert metrics.get_counts(MetricsWindow.DECAYED) == pytest.approx((10 + 5 + 2.5 + 1.25, 100 + 50 + 25 + 12.5))
+
+    def test_with_posteriors_with_default_prior(self):
+        metrics = {'1': _metrics('1/slate', opens=10, impressions=100)}
+        metrics = with_posteriors(metrics, MetricsWindow.TRAILING_7_DAYS)
+
+        assert metrics['1'].posterior_alpha == 20 + DEFAULT_ALPHA_PRIOR
+        assert metrics['1'].posterior_beta == 180 + DEFAULT_BETA_PRIOR
+
+    def test_with_posteriors_with_prior(self):
+        metrics = {
+            'default': MetricsModel(
+                id='default/slate',
+                trailing_1_day_opens=0,
+                trailing_1_day_impressions=0,
+                trailing_7_day_opens=0,
+                trailing_7_day_impressions=0,
+                trailing_14_day_opens=0,
+                trailing_14_day_impressions=0,
+                trailing_28_day_opens=2,
+                trailing_28_day_impressions=50,
+            ),
+            '1': _metrics('1/slate', opens=10, impressions=100),
+        }
+        metrics = with_posteriors(metrics, MetricsWindow.TRAILING_1_DAY)
+
+        assert (metrics['1'].posterior_alpha, metrics['1'].posterior_beta) == (12, 138)
+
+    def test_with_posteriors_clamps_invalid_parameters(self):
+        metrics = {'1': _metrics('1/slate', opens=10, impressions=0)}
+        metrics = with_posteriors(metrics)
+
+        assert metrics['1'].posterior_alpha == 40 + DEFAULT_ALPHA_PRIOR
+        assert 0 < metrics['1'].posterior_beta < 1e-10
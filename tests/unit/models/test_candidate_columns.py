@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+
+from app.models.candidate import Candidate
+from app.models.candidate_columns import CandidateColumns
+
+
+class TestCandidateColumns(unittest.TestCase):
+    def setUp(self):
+        self.candidates = [
+            Candidate(item_id=1, publisher='thedude.com', feed_id=1),
+            Candidate(item_id=2, publisher='walter.com'),
+            Candidate(item_id=3, publisher='thedude.com', feed_id=3),
+        ]
+
+    def test_from_candidates(self):
+        columns = CandidateColumns.from_candidates(self.candidates)
+        assert len(columns) == 3
+        assert columns.item_ids.tolist() == ['1', '2', '3']
+        assert columns.publisher_codes.tolist() == [0, 1, 0]
+        assert columns.publishers == ['thedude.com', 'walter.com']
+        assert columns.feed_ids.tolist() == [1, None, 3]
+
+    def test_from_no_candidates(self):
+        columns = CandidateColumns.from_candidates([])
+        assert len(columns) == 0
+        assert list(columns.rows()) == []
+
+    def test_take(self):
+        columns = CandidateColumns.from_candidates(self.candidates)
+        taken = columns.take(np.array([2, 0]))
+        assert taken.item_ids.tolist() == ['3', '1']
+        assert [row['publisher'] for row in taken.rows()] == ['thedude.com', 'thedude.com']
+        # The original columns are not modified
+        assert columns.item_ids.tolist() == ['1', '2', '3']
+
+    def test_slice(self):
+        columns = CandidateColumns.from_candidates(self.candidates)
+        assert columns[:2].item_ids.tolist() == ['1', '2']
+        assert columns[:10].item_ids.tolist() == ['1', '2', '3']
+        with self.assertRaises(TypeError):
+            columns[0]
+
+    def test_rows(self):
+        columns = CandidateColumns.from_candidates(self.candidates)
+        assert list(columns.rows()) == [
+            {'item_id': '1', 'publisher': 'thedude.com', 'feed_id': 1},
+            {'item_id': '2', 'publisher': 'walter.com', 'feed_id': None},
+            {'item_id': '3', 'publisher': 'thedude.com', 'feed_id': 3},
+        ]
@@ -0,0 +1,92 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from app.models.candidate_set import DynamoDBCandidateSet, local_candidate_set_cache
+from app.models.candidate_set_preloader import CandidateSetPreloader
+from app.models.slate_config import SlateConfigModel
+from app.models.slate_experiment import SlateExperimentModel
+
+
+def generate_slate_configs():
+    slate_config = SlateConfigModel('slate-1', 'Slate', 'description')
+    slate_config.experiments = [
+        SlateExperimentModel('1', 'first', ['top15'], ['cs-1', 'cs-2']),
+        SlateExperimentModel('2', 'second', ['top15'], ['cs-2', 'recit-personalized/bestof']),
+    ]
+    return [slate_config]
+
+
+async def query_by_id(cs_id):
+    if cs_id == 'cs-missing':
+        return {'Items': []}
+    return {'Items': [{'id': cs_id, 'version': 1, 'candidates': []}]}
+
+
+class TestCandidateSetPreloader(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        local_candidate_set_cache.clear()
+        self.addCleanup(local_candidate_set_cache.clear)
+
+        patcher = patch.object(DynamoDBCandidateSet, '_cached_query_by_id', AsyncMock(side_effect=query_by_id))
+        self.query = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_candidate_set_ids(self):
+        assert CandidateSetPreloader.get_candidate_set_ids(generate_slate_configs()) == {'cs-1', 'cs-2'}
+
+    async def test_start_loads_candidate_sets(self):
+        preloader = CandidateSetPreloader()
+        assert preloader.get_warm_count() == 0
+
+        await preloader.start(generate_slate_configs(), interval=0)
+
+        assert preloader.get_warm_count() == 2
+        assert 'cs-1' in local_candidate_set_cache and 'cs-2' in local_candidate_set_cache
+        assert preloader._task is None
+
+    async def test_load_all_skips_failures(self):
+        preloader = CandidateSetPreloader()
+        preloader.candidate_set_ids = frozenset({'cs-1', 'cs-missing'})
+
+        result = await preloader.load_all()
+        assert result.loaded == 1
+        assert result.missing == {'cs-missing'}
+        assert preloader.get_warm_count() == 1
+
+    async def test_load_all_logs_errors(self):
+        preloader = CandidateSetPreloader()
+        preloader.candidate_set_ids = frozenset({'cs-1'})
+        self.query.side_effect = ConnectionError('DynamoDB is unavailable')
+
+        with self.assertLogs(level='ERROR'):
+            result = await preloader.load_all()
+        assert result == (0, frozenset())
+
+    async def test_load_all_is_concurrent(self):
+        running = []
+        max_running = []
+
+        async def slow_query_by_id(cs_id):
+            running.append(cs_id)
+            max_running.append(len(running))
+            await asyncio.sleep(0.01)
+            running.remove(cs_id)
+            return await query_by_id(cs_id)
+
+        self.query.side_effect = slow_query_by_id
+        preloader = CandidateSetPreloader(concurrency=3)
+        preloader.candidate_set_ids = frozenset(f'cs-{i}' for i in range(10))
+
+        assert (await preloader.load_all()).loaded == 10
+        assert max(max_running) == 3
+
+    async def test_reloads_in_background(self):
+        preloader = CandidateSetPreloader()
+        await preloader.start(generate_slate_configs(), interval=0.01)
+        await asyncio.sleep(0.05)
+        await preloader.stop()
+
+        # The initial load queried each candidate set once, and reloads queried them again.
+        assert self.query.await_count > 2
+        assert preloader._task is None
@@ -1,7 +1,14 @@
+import asyncio
+import time
 import unittest
 import json
 import os
-from app.models.candidate_set import RecItCandidateSet
+from unittest.mock import AsyncMock, patch
+
+from aiocache import SimpleMemoryCache
+
+from app.models.candidate_set import DynamoDBCandidateSet, RecItCandidateSet, find_missing_candidate_sets, \
+    local_candidate_set_cache
 from app.config import ROOT_DIR
 
 class TestCandidateSetModel(unittest.TestCase):
@@ -16,3 +23,111 @@ class TestCandidateSetModel(unittest.TestCase):
         self.assertTrue(RecItCandidateSet._verify_candidate_set("recit-personalized/bestof"))
         self.assertFalse(RecItCandidateSet._verify_candidate_set("recit-personalized/not-a-real-module"))
         self.assertFalse(RecItCandidateSet._verify_candidate_set("wrackit-personalized/bestof"))
+
+
+class TestDynamoDBCandidateSetLocalCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        local_candidate_set_cache.clear()
+        self.addCleanup(local_candidate_set_cache.clear)
+
+    async def test_get_keeps_parsed_candidate_set_in_memory(self):
+        response = {'Items': [{'id': 'cs-1', 'version': 1, 'candidates': [{'item_id': 1, 'publisher': 'a.com'}]}]}
+        hits = local_candidate_set_cache.hits
+
+        with patch.object(DynamoDBCandidateSet, '_cached_query_by_id', AsyncMock(return_value=response)) as query:
+            first = await DynamoDBCandidateSet.get('cs-1')
+            second = await DynamoDBCandidateSet.get('cs-1')
+
+        assert query.await_count == 1
+        assert second is first
+        assert local_candidate_set_cache.hits == hits + 1
+
+    async def test_get_does_not_keep_missing_candidate_set(self):
+        with patch.object(DynamoDBCandidateSet, '_cached_query_by_id', AsyncMock(return_value={'Items': []})):
+            with self.assertRaises(KeyError):
+                await DynamoDBCandidateSet.get('cs-1')
+
+        assert local_candidate_set_cache.get('cs-1') is None
+
+
+class TestDynamoDBCandidateSetCoalescing(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_misses_query_once(self):
+        cache = SimpleMemoryCache()
+        response = {'Items': [{'id': 'cs-1', 'version': 1, 'candidates': []}]}
+
+        async def query_by_id(cs_id):
+            await asyncio.sleep(0.01)
+            return response
+
+        query = AsyncMock(side_effect=query_by_id)
+        with patch('app.models.candidate_set.caches.get', return_value=cache), \
+                patch.object(DynamoDBCandidateSet, '_query_by_id', query):
+            results = await asyncio.gather(*(DynamoDBCandidateSet._cached_query_by_id('cs-1') for _ in range(10)))
+
+        assert results == [response] * 10
+        assert query.await_count == 1
+        assert (await cache.get('candidate_set:v3:cs-1'))['value'] == response
+
+
+class TestDynamoDBCandidateSetRefresh(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.cache = SimpleMemoryCache()
+        self.stale = {'Items': [{'id': 'cs-1', 'version': 1, 'candidates': []}]}
+        self.fresh = {'Items': [{'id': 'cs-1', 'version': 2, 'candidates': []}]}
+
+    async def _cached_query_by_id(self, query: AsyncMock) -> dict:
+        with patch('app.models.candidate_set.caches.get', return_value=self.cache), \
+                patch.object(DynamoDBCandidateSet, '_query_by_id', query):
+            result = await DynamoDBCandidateSet._cached_query_by_id('cs-1')
+            # Let a background refresh complete.
+            await asyncio.sleep(0.01)
+        return result
+
+    async def test_returns_cached_value_before_refresh_time(self):
+        await self.cache.set('candidate_set:v3:cs-1', {'value': self.stale, 'refresh_at': time.time() + 60})
+        query = AsyncMock(return_value=self.fresh)
+
+        assert await self._cached_query_by_id(query) == self.stale
+        assert query.await_count == 0
+
+    async def test_refreshes_in_background_after_refresh_time(self):
+        await self.cache.set('candidate_set:v3:cs-1', {'value': self.stale, 'refresh_at': time.time() - 1})
+        query = AsyncMock(return_value=self.fresh)
+
+        # The stale value is returned without waiting for the refresh.
+        assert await self._cached_query_by_id(query) == self.stale
+        assert query.await_count == 1
+
+        entry = await self.cache.get('candidate_set:v3:cs-1')
+        assert entry['value'] == self.fresh
+        assert entry['refresh_at'] > time.time()
+
+    async def test_keeps_cached_value_when_refresh_fails(self):
+        await self.cache.set('candidate_set:v3:cs-1', {'value': self.stale, 'refresh_at': time.time() - 1})
+        query = AsyncMock(side_effect=Exception('DynamoDB is unavailable'))
+
+        with self.assertLogs(level='ERROR'):
+            assert await self._cached_query_by_id(query) == self.stale
+        assert (await self.cache.get('candidate_set:v3:cs-1'))['value'] == self.stale
+
+
+class TestFindMissingCandidateSets(unittest.IsolatedAsyncioTestCase):
+    async def _query_by_id(self, cs_id: str) -> dict:
+        return {'Items': [{'id': cs_id}] if cs_id.startswith('cs-') else []}
+
+    async def test_finds_missing_candidate_sets_in_database(self):
+        cached_query = AsyncMock(return_value={'Items': [{'id': 'missing'}]})
+        with patch.object(DynamoDBCandidateSet, '_query_by_id', self._query_by_id), \
+                patch.object(DynamoDBCandidateSet, '_cached_query_by_id', cached_query):
+            missing = await find_missing_candidate_sets(
+                ['cs-1', 'missing', 'cs-2', 'recit-personalized/bestof', 'recit-personalized/unknown'])
+
+        assert missing == {'missing', 'recit-personalized/unknown'}
+        # The cache is bypassed, such that it can't hide a candidate set that was deleted from the database.
+        assert cached_query.await_count == 0
+
+    async def test_raises_database_errors(self):
+        query = AsyncMock(side_effect=Exception('DynamoDB is unavailable'))
+        with patch.object(DynamoDBCandidateSet, '_query_by_id', query):
+            with self.assertRaises(Exception):
+                await find_missing_candidate_sets(['cs-1'])
@@ -1,6 +1,7 @@
 import json
 import unittest
 
+from app.models.metrics.metrics_model import MetricsWindow
 from app.models.slate_experiment import SlateExperimentModel
 
 
@@ -88,3 +89,44 @@ class TestSlateExperimentModel(unittest.TestCase):
         self.assertEqual(ex.weight, 0.3)
         self.assertEqual(len(ex.candidate_sets), 3)
         self.assertEqual(len(ex.rankers), 0)
+
+    def test_load_from_json_with_metrics_window(self):
+        json_str = """
+            {
+               "description": "TS decayed",
+               "candidateSets": [
+                 "39d0dc54-f6f8-4f13-bea4-4320b3bd8217"
+               ],
+               "rankers": ["thompson-sampling"],
+               "metricsWindow": "decayed"
+             }
+            """
+        ex = SlateExperimentModel.load_from_dict(json.loads(json_str))
+        self.assertEqual(ex.metrics_window, MetricsWindow.DECAYED)
+
+        ex = SlateExperimentModel.load_from_dict({**json.loads(json_str), 'metricsWindow': 7})
+        self.assertEqual(ex.metrics_window, MetricsWindow.TRAILING_7_DAYS)
+
+    def test_load_from_json_without_metrics_window(self):
+        ex = SlateExperimentModel.load_from_dict({'description': 'd', 'candidateSets': ['a'], 'rankers': []})
+        self.assertEqual(ex.metrics_window, MetricsWindow.TRAILING_28_DAYS)
+
+    def test_load_from_json_with_invalid_metrics_window(self):
+        with self.assertRaises(ValueError):
+            SlateExperimentModel.load_from_dict(
+                {'description': 'd', 'candidateSets': ['a'], 'rankers': [], 'metricsWindow': 3})
+
+    def test_load_from_json_with_thompson_sampling_sampler(self):
+        experiment_dict = {'description': 'd', 'candidateSets': ['a'], 'rankers': ['thompson-sampling']}
+        ex = SlateExperimentModel.load_from_dict(experiment_dict)
+        self.assertEqual(ex.thompson_sampling_sampler, 'exact')
+
+        approximate = SlateExperimentModel.load_from_dict({**experiment_dict, 'thompsonSamplingSampler': 'approximate'})
+        self.assertEqual(approximate.thompson_sampling_sampler, 'approximate')
+        # The sampler is recorded in the experiment id, which is returned with the ranked slate.
+        self.assertNotEqual(approximate.id, ex.id)
+
+    def test_load_from_json_with_invalid_thompson_sampling_sampler(self):
+        with self.assertRaises(ValueError):
+            SlateExperimentModel.load_from_dict(
+                {'description': 'd', 'candidateSets': ['a'], 'rankers': [], 'thompsonSamplingSampler': 'fast'})
@@ -23,6 +23,15 @@ class TestSlateLineupExperimentModel(unittest.TestCase):
 
         self.assertEqual(len(lem.rankers), 0)
 
+    def test_is_personalized(self):
+        personalized = SlateLineupExperimentModel(experiment_id='c3h5n3o9', description='d', slates=['a'],
+                                                  rankers=['personalized-topics', 'thompson-sampling'])
+        shared = SlateLineupExperimentModel(experiment_id='c3h5n3o9', description='d', slates=['a'],
+                                            rankers=['thompson-sampling', 'personalized-topics'])
+
+        assert personalized.is_personalized
+        assert not shared.is_personalized
+
     def test_invalid_ranker(self):
         with self.assertRaises(KeyError) as context:
             SlateLineupExperimentModel(experiment_id='c3h5n3o9', description='desc', slates=['a', 'b'],
@@ -1,12 +1,25 @@
+import asyncio
 import unittest
 import os
 import json
+import random
+from unittest.mock import patch
 
+import numpy as np
+from scipy.stats import beta, ks_2samp
+
+from app.models.candidate import Candidate
+from app.models.candidate_columns import CandidateColumns
 from app.models.metrics.metrics_model import MetricsModel
+from app.models.metrics.posterior import with_posteriors
 from tests.unit.utils import generate_recommendations, generate_curated_configs, generate_uncurated_configs, generate_hybrid_configs
 from app.config import ROOT_DIR
+import app.rankers.algorithms
+from app.rankers.pipeline import RankerPipeline
 from app.rankers.algorithms import spread_publishers, top5, top15, top30, thompson_sampling, blocklist, personalize_topic_slates
 from app.models.personalized_topic_list import PersonalizedTopicList, PersonalizedTopicElement
+from tests.benchmarks import reference_rankers
+from tests.benchmarks.utils import generate_publishers
 from operator import itemgetter
 
 
@@ -89,6 +102,40 @@ class TestAlgorithmsSpreadPublishers(unittest.TestCase):
         # ensure the elements aren't reordered at all (as we don't have enough publisher variance)
         assert [x.item.item_id for x in reordered] == ['1', '2', '3', '4', '5', '6', '7', '8']
 
+    def test_spread_publishers_does_not_modify_input(self):
+        recs = generate_recommendations([1, 2, 3, 4, 5])
+        for rec, publisher in zip(recs, ['a.com', 'a.com', 'b.com', 'c.com', 'd.com']):
+            rec.publisher = publisher
+
+        reordered = spread_publishers(recs, 3)
+
+        assert [x.item.item_id for x in reordered] == ['1', '3', '2', '4', '5']
+        assert [x.item.item_id for x in recs] == ['1', '2', '3', '4', '5']
+
+    def test_spread_publishers_matches_reference(self):
+        rng = random.Random(1)
+        for _ in range(200):
+            n = rng.randint(1, 40)
+            recs = generate_recommendations(list(range(n)))
+            for rec, publisher in zip(recs, generate_publishers(n, publisher_count=rng.randint(1, 8), rng=rng)):
+                rec.publisher = publisher
+
+            for spread in [1, 2, 3, 5]:
+                expected = reference_rankers.spread_publishers(recs, spread)
+                assert [x.item_id for x in spread_publishers(recs, spread)] == [x.item_id for x in expected]
+
+    def test_spread_publishers_candidate_columns_match_recommendations(self):
+        recs = generate_recommendations(list(range(100)))
+        publishers = generate_publishers(100, publisher_count=5)
+        for rec, publisher in zip(recs, publishers):
+            rec.publisher = publisher
+        columns = CandidateColumns.from_candidates(
+            [Candidate(item_id=i, publisher=publisher) for i, publisher in enumerate(publishers)])
+
+        expected = [x.item_id for x in spread_publishers(recs)]
+        assert spread_publishers(columns).item_ids.tolist() == expected
+        assert spread_publishers(columns, limit=10).item_ids.tolist() == expected[:10]
+
 
 class TestAlgorithmsTop5(unittest.TestCase):
     def test_get_top_5_items(self):
@@ -142,6 +189,23 @@ class TestAlgorithmsBlocklist(unittest.TestCase):
         filtered = blocklist(recs, blocklist=['2', '99'])
         assert [x.item.item_id for x in filtered] == ['1', '33', '66', '999']
 
+    def test_block_item_using_slate_blocklist(self):
+        recs = generate_recommendations([1, 2, 3203292423, 99, 999])
+        with patch.object(app.rankers.algorithms.blocklist_index, 'get_blocked_item_ids',
+                          side_effect=lambda slate_id: {'3203292423', '99'} if slate_id == 'slate-a' else set()):
+            assert [x.item.item_id for x in blocklist(recs, slate_id='slate-a')] == ['1', '2', '999']
+            assert len(blocklist(recs, slate_id='slate-b')) == 5
+
+    def test_block_candidate_columns_in_pipeline(self):
+        columns = CandidateColumns.from_candidates(
+            [Candidate(item_id=i, publisher='example.com') for i in [1, 2, 3203292423, 99, 999]])
+        pipeline = RankerPipeline(['blocklist', 'top5'])
+        with patch.object(app.rankers.algorithms.blocklist_index, 'get_blocked_item_ids',
+                          side_effect=lambda slate_id: {'3203292423', '99'} if slate_id == 'slate-a' else set()):
+            ranked = asyncio.run(pipeline.run(columns, {}, ranker_kwargs={'blocklist': {'slate_id': 'slate-a'}}))
+
+        assert list(ranked.item_ids) == ['1', '2', '999']
+
 
 class TestAlgorithmsThompsonSampling(unittest.TestCase):
     def test_it_can_rank_items_with_missing_metrics(self):
@@ -162,6 +226,7 @@ class TestAlgorithmsThompsonSampling(unittest.TestCase):
                 expires_at=0
             ),
         }
+        metrics = with_posteriors(metrics)
 
         sampled_recs = thompson_sampling(recs, metrics)
         # this needs to be a set since order isn't guaranteed in single trial
@@ -189,6 +254,106 @@ class TestAlgorithmsThompsonSampling(unittest.TestCase):
         # this needs to be a set since order isn't guaranteed in single trial
         assert {item.item_id for item in sampled_recs} == {"999"}
 
+    def test_uses_prior_from_metrics(self):
+        recs = generate_recommendations(['333', '666'])
+        metrics = {
+            'default': MetricsModel(
+                id='home/default',
+                trailing_1_day_opens=0,
+                trailing_1_day_impressions=0,
+                trailing_7_day_opens=0,
+                trailing_7_day_impressions=0,
+                trailing_14_day_opens=0,
+                trailing_14_day_impressions=0,
+                trailing_28_day_opens=2,
+                trailing_28_day_impressions=50,
+            ),
+            '666': MetricsModel(
+                id='home/666',
+                trailing_1_day_opens=0,
+                trailing_1_day_impressions=0,
+                trailing_7_day_opens=0,
+                trailing_7_day_impressions=0,
+                trailing_14_day_opens=0,
+                trailing_14_day_impressions=0,
+                trailing_28_day_opens=66,
+                trailing_28_day_impressions=999,
+            ),
+        }
+        metrics = with_posteriors(metrics)
+
+        sampled_recs = thompson_sampling(recs, metrics, rng=np.random.default_rng(42))
+
+        # '333' samples from the prior alpha=2, beta=48, and '666' from its posterior.
+        scores = np.random.default_rng(42).beta([2, 68], [48, 981])
+        expected = [recs[i].item_id for i in np.argsort(-scores)]
+        assert [rec.item_id for rec in sampled_recs] == expected
+
+    def test_ranks_by_sampled_posterior(self):
+        recs = generate_recommendations(['333', '666', '999'])
+        metrics = {
+            '666': MetricsModel(
+                id='home/666',
+                trailing_1_day_opens=0,
+                trailing_1_day_impressions=0,
+                trailing_7_day_opens=0,
+                trailing_7_day_impressions=0,
+                trailing_14_day_opens=0,
+                trailing_14_day_impressions=0,
+                trailing_28_day_opens=66,
+                trailing_28_day_impressions=999,
+            ),
+        }
+        metrics = with_posteriors(metrics)
+
+        sampled_recs = thompson_sampling(recs, metrics, rng=np.random.default_rng(42))
+
+        # Draw the same samples: '333' and '999' sample from the prior, '666' from its posterior.
+        scores = np.random.default_rng(42).beta([0.02, 66.02, 0.02], [1.0, 934.0, 1.0])
+        expected = [recs[i].item_id for i in np.argsort(-scores)]
+        assert [rec.item_id for rec in sampled_recs] == expected
+
+    def test_does_not_modify_input(self):
+        recs = generate_recommendations(['333', '666', '999'])
+        sampled_recs = thompson_sampling(recs, {})
+        assert sampled_recs is not recs
+        assert [rec.item_id for rec in recs] == ['333', '666', '999']
+
+    def test_limit_returns_top_of_full_ranking(self):
+        recs = generate_recommendations([str(i) for i in range(100)])
+
+        full = thompson_sampling(recs, {}, rng=np.random.default_rng(7))
+        limited = thompson_sampling(recs, {}, limit=10, rng=np.random.default_rng(7))
+
+        assert [rec.item_id for rec in limited] == [rec.item_id for rec in full[:10]]
+
+    def test_limit_larger_than_input(self):
+        recs = generate_recommendations(['333', '666', '999'])
+        assert len(thompson_sampling(recs, {}, limit=10)) == 3
+        assert thompson_sampling(recs, {}, limit=0) == []
+
+    def test_candidate_columns_match_recommendations(self):
+        recs = generate_recommendations([str(i) for i in range(100)])
+        columns = CandidateColumns.from_candidates([Candidate(item_id=i, publisher='thedude.com') for i in range(100)])
+        metrics = {str(i): MetricsModel(
+            id=f'home/{i}',
+            trailing_1_day_opens=0,
+            trailing_1_day_impressions=0,
+            trailing_7_day_opens=0,
+            trailing_7_day_impressions=0,
+            trailing_14_day_opens=0,
+            trailing_14_day_impressions=0,
+            trailing_28_day_opens=i,
+            trailing_28_day_impressions=1000,
+        ) for i in range(0, 100, 2)}
+        metrics = with_posteriors(metrics)
+
+        ranked_recs = thompson_sampling(recs, metrics, limit=10, rng=np.random.default_rng(7))
+        ranked_columns = thompson_sampling(columns, metrics, limit=10, rng=np.random.default_rng(7))
+
+        assert ranked_columns.item_ids.tolist() == [rec.item_id for rec in ranked_recs]
+        assert len(thompson_sampling(columns, metrics, limit=0)) == 0
+
     # Moved from a previous thompson sampling test file
     def test_rank_by_ctr_over_n_trials(self, ntrials=99):
         """
@@ -241,6 +406,7 @@ class TestAlgorithmsThompsonSampling(unittest.TestCase):
                 expires_at=0
             )
         }
+        metrics = with_posteriors(metrics)
 
         # goal of test is to rank by CTR over ntrials
         # order should be 999999, 666666, 333333
@@ -268,6 +434,51 @@ class TestAlgorithmsThompsonSampling(unittest.TestCase):
         assert int(ranks['222222']) != ranks['222222']
 
 
+class TestAlgorithmsThompsonSamplingSampler(unittest.TestCase):
+    def test_exact_sampler_draws_from_beta(self):
+        alphas, betas = np.array([1.0, 2000.0]), np.array([20.0, 30000.0])
+        scores = app.rankers.algorithms._sample_posteriors(alphas, betas, 5, sampler='exact',
+                                                           rng=np.random.default_rng(3))
+
+        assert np.array_equal(scores, np.random.default_rng(3).beta(alphas, betas, size=(5, 2)))
+
+    def test_approximate_sampler_matches_beta_distribution(self):
+        for a, b in [(1000, 19000), (5000, 95000), (30000, 270000)]:
+            samples = app.rankers.algorithms._sample_posteriors(
+                np.array([a], dtype=float), np.array([b], dtype=float), 5000,
+                sampler='approximate', approximation_min_count=1000, rng=np.random.default_rng(a))[:, 0]
+
+            # The samples are indistinguishable from scipy's exact beta samples.
+            assert ks_2samp(samples, beta.rvs(a, b, size=5000, random_state=a)).pvalue > 0.01
+
+    def test_approximate_sampler_mean_and_variance_at_threshold(self):
+        n = 100000
+        for a, b in [(1000, 1000), (1000, 19000), (19000, 1000)]:
+            samples = app.rankers.algorithms._sample_posteriors(
+                np.array([a], dtype=float), np.array([b], dtype=float), n,
+                sampler='approximate', approximation_min_count=1000, rng=np.random.default_rng(a + b))[:, 0]
+
+            # Both parameters are at the threshold or above, so the item is sampled approximately.
+            assert not np.array_equal(samples, np.random.default_rng(a + b).beta(a, b, size=n))
+            # The mean and variance are within 5 standard errors of the beta distribution's.
+            assert abs(samples.mean() - beta.mean(a, b)) < 5 * beta.std(a, b) / np.sqrt(n)
+            assert abs(samples.var() / beta.var(a, b) - 1) < 5 * np.sqrt(2 / (n - 1))
+
+    def test_approximate_sampler_samples_low_counts_exactly(self):
+        alphas, betas = np.array([5.0, 2000.0, 20.0]), np.array([100.0, 30000.0, 3000.0])
+        scores = app.rankers.algorithms._sample_posteriors(
+            alphas, betas, 4, sampler='approximate', approximation_min_count=1000, rng=np.random.default_rng(3))
+
+        # Items with fewer than approximation_min_count opens are sampled from the beta distribution first.
+        rng = np.random.default_rng(3)
+        assert np.array_equal(scores[:, [0, 2]], rng.beta(alphas[[0, 2]], betas[[0, 2]], size=(4, 2)))
+        assert np.all((scores[:, 1] > 0.05) & (scores[:, 1] < 0.075))
+
+    def test_unknown_sampler(self):
+        with self.assertRaises(ValueError):
+            app.rankers.algorithms._sample_posteriors(np.array([1.0]), np.array([1.0]), 1, sampler='fast')
+
+
 class TestAlgorithmsPersonalizeTopics(unittest.TestCase):
 
     @staticmethod
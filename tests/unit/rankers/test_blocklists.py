@@ -0,0 +1,58 @@
+import json
+import os
+import tempfile
+import unittest
+
+from app.rankers.blocklists import BlocklistIndex
+
+
+class TestBlocklistIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, 'blocklists.json')
+        self._write_blocklists({
+            'items': {'111': 1, '222': 1},
+            'slates': {'slate-a': {'items': {'333': 1}}},
+        })
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_get_blocked_item_ids(self):
+        index = BlocklistIndex(self.path)
+        assert index.get_blocked_item_ids() == {'111', '222'}
+
+    def test_get_blocked_item_ids_for_slate(self):
+        index = BlocklistIndex(self.path)
+        assert index.get_blocked_item_ids('slate-a') == {'111', '222', '333'}
+        assert index.get_blocked_item_ids('slate-b') == {'111', '222'}
+
+    def test_reload_if_changed(self):
+        index = BlocklistIndex(self.path)
+        index.load()
+        assert not index.reload_if_changed()
+
+        self._write_blocklists({'items': {'444': 1}}, mtime_offset=10)
+
+        assert index.reload_if_changed()
+        assert index.get_blocked_item_ids() == {'444'}
+        assert index.get_blocked_item_ids('slate-a') == {'444'}
+
+    def test_reload_keeps_blocklists_when_file_is_invalid(self):
+        index = BlocklistIndex(self.path)
+        index.load()
+
+        with open(self.path, 'w') as fp:
+            fp.write('{"items": ')
+        os.utime(self.path, ns=(0, os.stat(self.path).st_mtime_ns + 10 ** 10))
+
+        assert not index.reload_if_changed()
+        assert index.get_blocked_item_ids() == {'111', '222'}
+
+    def _write_blocklists(self, blocklists: dict, mtime_offset: int = 0):
+        with open(self.path, 'w') as fp:
+            json.dump(blocklists, fp)
+        if mtime_offset:
+            # Ensure the modification time changes, regardless of the file system's timestamp resolution.
+            os.utime(self.path, ns=(0, os.stat(self.path).st_mtime_ns + mtime_offset * 10 ** 9))
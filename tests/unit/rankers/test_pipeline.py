@@ -0,0 +1,157 @@
+import asyncio
+import random
+import unittest
+
+import numpy as np
+
+from app.models.personalized_topic_list import PersonalizedTopicElement, PersonalizedTopicList
+from app.rankers import RankerInput
+from app.rankers.algorithms import spread_publishers
+from app.rankers.pipeline import RankerPipeline, RankerStage
+from tests.benchmarks.utils import generate_publishers
+from tests.unit.utils import generate_curated_configs, generate_recommendations
+
+
+class TestRankerPipelineCompile(unittest.TestCase):
+    def test_merges_truncation_into_thompson_sampling(self):
+        pipeline = RankerPipeline(['thompson-sampling', 'top15'])
+        assert pipeline.stages == [RankerStage('thompson-sampling', 15)]
+
+    def test_merges_consecutive_truncations(self):
+        pipeline = RankerPipeline(['top45', 'top15', 'top30'])
+        assert pipeline.stages == [RankerStage('top45', 15)]
+
+    def test_keeps_leading_truncation(self):
+        pipeline = RankerPipeline(['top30', 'thompson-sampling', 'pubspread'])
+        assert pipeline.stages == [
+            RankerStage('top30', 30),
+            RankerStage('thompson-sampling'),
+            RankerStage('pubspread'),
+        ]
+
+
+class TestRankerPipelinePlan(unittest.TestCase):
+    def test_plan_without_count(self):
+        pipeline = RankerPipeline(['top30', 'thompson-sampling', 'pubspread'])
+        assert pipeline.plan(None) == tuple(pipeline.stages)
+
+    def test_plan_stops_at_pubspread(self):
+        pipeline = RankerPipeline(['top30', 'thompson-sampling', 'pubspread'])
+        assert pipeline.plan(10) == (
+            RankerStage('top30', 30),
+            RankerStage('thompson-sampling'),
+            RankerStage('pubspread', 10),
+        )
+
+    def test_plan_pushes_count_through_truncation(self):
+        pipeline = RankerPipeline(['thompson-sampling', 'top15', 'pubspread'])
+        assert pipeline.plan(2) == (
+            RankerStage('thompson-sampling', 15),
+            RankerStage('pubspread', 2),
+        )
+
+    def test_plan_stops_at_rankers_that_need_all_items(self):
+        pipeline = RankerPipeline(['top45', 'thompson-sampling', 'top5'])
+        assert pipeline.plan(10) == (
+            RankerStage('top45', 45),
+            RankerStage('thompson-sampling', 5),
+        )
+
+    def test_plan_is_cached(self):
+        pipeline = RankerPipeline(['thompson-sampling', 'top15'])
+        assert pipeline.plan(10) is pipeline.plan(10)
+
+    def test_is_personalized_before(self):
+        assert RankerPipeline(['personalized-topics', 'thompson-sampling']).is_personalized_before('thompson-sampling')
+        assert not RankerPipeline(['thompson-sampling', 'personalized-topics']).is_personalized_before(
+            'thompson-sampling')
+        assert not RankerPipeline(['top15', 'thompson-sampling']).is_personalized_before('thompson-sampling')
+
+
+class TestRankerStage(unittest.TestCase):
+    def test_truncation_keeps_short_input(self):
+        recs = generate_recommendations([1, 2, 3])
+        assert RankerStage('top5', 5)(recs) is recs
+
+    def test_limits_output(self):
+        recs = generate_recommendations([1, 2, 3, 4, 5, 6, 7, 8])
+        assert [x.item.item_id for x in RankerStage('top5', 3)(recs)] == ['1', '2', '3']
+
+    def test_pubspread_limit_is_prefix_of_full_ranking(self):
+        rng = random.Random(1)
+        for _ in range(100):
+            n = rng.randint(1, 40)
+            recs = generate_recommendations(list(range(n)))
+            for rec, publisher in zip(recs, generate_publishers(n, publisher_count=rng.randint(1, 8), rng=rng)):
+                rec.publisher = publisher
+
+            limit = rng.randint(1, n)
+            expected = [x.item.item_id for x in spread_publishers(recs)][:limit]
+            assert [x.item.item_id for x in RankerStage('pubspread', limit)(recs)] == expected
+
+
+class TestRankerPipelineRun(unittest.IsolatedAsyncioTestCase):
+    def test_declared_inputs(self):
+        pipeline = RankerPipeline(['top15', 'personalized-topics', 'thompson-sampling', 'top5'])
+        assert pipeline.inputs == {RankerInput.METRICS, RankerInput.PERSONALIZED_TOPICS}
+        assert RankerPipeline(['top15', 'pubspread']).inputs == set()
+
+    async def test_fetches_inputs_concurrently(self):
+        started = set()
+
+        async def fetch(ranker_input, value):
+            started.add(ranker_input)
+            # Wait until the other fetch has started, which only happens if inputs are fetched concurrently.
+            while len(started) < 2:
+                await asyncio.sleep(0)
+            return value
+
+        slate_configs = generate_curated_configs()
+        topics = PersonalizedTopicList(curator_topics=[
+            PersonalizedTopicElement(curator_topic_label=slate_configs[-1].curator_topic_label, score=1.0)
+        ])
+        fetchers = {
+            RankerInput.METRICS: lambda configs: fetch(RankerInput.METRICS, {}),
+            RankerInput.PERSONALIZED_TOPICS: lambda configs: fetch(RankerInput.PERSONALIZED_TOPICS, topics),
+        }
+        pipeline = RankerPipeline(['thompson-sampling', 'personalized-topics'])
+
+        ranked = await asyncio.wait_for(pipeline.run(slate_configs, fetchers), timeout=1)
+        assert sorted(c.id for c in ranked) == sorted(c.id for c in slate_configs)
+
+    async def test_fetches_input_for_items_that_reach_ranker(self):
+        fetched_items = []
+
+        async def fetch_metrics(items):
+            fetched_items.extend(items)
+            return {}
+
+        recs = generate_recommendations(list(range(50)))
+        pipeline = RankerPipeline(['top30', 'top15', 'thompson-sampling', 'top5'])
+
+        ranked = await pipeline.run(recs, {RankerInput.METRICS: fetch_metrics}, count=3)
+        assert len(ranked) == 3
+        assert fetched_items == recs[:15]
+
+    async def test_missing_fetcher(self):
+        pipeline = RankerPipeline(['thompson-sampling'])
+        with self.assertRaises(ValueError):
+            await pipeline.run(generate_recommendations([1, 2]), {})
+
+    async def test_count_matches_full_ranking_with_dominating_publisher(self):
+        rng = random.Random(1)
+        for rankers in [['top45', 'pubspread'], ['top45', 'thompson-sampling', 'pubspread']]:
+            pipeline = RankerPipeline(rankers)
+            for seed in range(50):
+                recs = generate_recommendations(list(range(60)))
+                # Most items are from one publisher, such that pubspread pushes many of them back.
+                for rec in recs:
+                    rec.publisher = 'dominating.com' if rng.random() < 0.8 else f'publisher-{rng.randint(1, 4)}.com'
+
+                fetchers = {RankerInput.METRICS: lambda items: asyncio.sleep(0, result={})}
+                full = await pipeline.run(recs, fetchers, ranker_kwargs={
+                    'thompson-sampling': {'rng': np.random.default_rng(seed)}})
+                limited = await pipeline.run(recs, fetchers, count=10, ranker_kwargs={
+                    'thompson-sampling': {'rng': np.random.default_rng(seed)}})
+
+                assert [rec.item_id for rec in limited] == [rec.item_id for rec in full[:10]]
@@ -0,0 +1,123 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+import app.rankers.algorithms
+from app.models.metrics.metrics_model import MetricsModel
+from app.models.metrics.posterior import with_posteriors
+from app.rankers.algorithms import thompson_sampling
+from app.rankers.thompson_sampling_pool import ThompsonSamplingPool
+from tests.unit.utils import generate_recommendations
+
+
+def _metrics(item_id: str, opens: int, impressions: int) -> MetricsModel:
+    return MetricsModel(
+        id=f'home/{item_id}',
+        trailing_1_day_opens=0,
+        trailing_1_day_impressions=0,
+        trailing_7_day_opens=0,
+        trailing_7_day_impressions=0,
+        trailing_14_day_opens=0,
+        trailing_14_day_impressions=0,
+        trailing_28_day_opens=opens,
+        trailing_28_day_impressions=impressions,
+    )
+
+
+class TestThompsonSamplingPool(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+        # Number of times that the pool was filled
+        self.fill_count = 0
+
+    def sample_orders(self, size, rng):
+        if size > 1:
+            self.fill_count += 1
+        return np.array([[i, self.fill_count] for i in range(size)])
+
+    def test_picks_presampled_order(self):
+        pool = ThompsonSamplingPool(size=4)
+        orders = [pool.get_order('slate', self.sample_orders, self.rng).tolist() for _ in range(20)]
+
+        assert self.fill_count == 1
+        assert {order[0] for order in orders} == {0, 1, 2, 3}
+
+    async def test_fills_pool_after_request(self):
+        pool = ThompsonSamplingPool(size=4)
+        # Requests that don't find rankings sample their own, and the pool is filled once, after them.
+        assert pool.get_order('slate', self.sample_orders, self.rng).tolist() == [0, 0]
+        assert pool.get_order('slate', self.sample_orders, self.rng).tolist() == [0, 0]
+        assert self.fill_count == 0
+
+        await asyncio.sleep(0)
+        assert self.fill_count == 1
+        assert pool.get_order('slate', self.sample_orders, self.rng)[1] == 1
+
+    def test_evicts_least_recently_used_key(self):
+        pool = ThompsonSamplingPool(size=4, max_entries=2)
+        pool.get_order('a', self.sample_orders, self.rng)
+        pool.get_order('b', self.sample_orders, self.rng)
+        pool.get_order('a', self.sample_orders, self.rng)
+        pool.get_order('c', self.sample_orders, self.rng)
+        assert self.fill_count == 3
+
+        # 'a' was used more recently than 'b', so it's still in the pool
+        pool.get_order('a', self.sample_orders, self.rng)
+        assert self.fill_count == 3
+        pool.get_order('b', self.sample_orders, self.rng)
+        assert self.fill_count == 4
+
+    def test_disabled(self):
+        assert not ThompsonSamplingPool(size=0).enabled
+
+
+class TestThompsonSamplingWithPool(unittest.TestCase):
+    def setUp(self):
+        self.recs = generate_recommendations(['333', '666', '999'])
+        self.metrics = {
+            '333': _metrics('333', opens=10, impressions=100),
+            '666': _metrics('666', opens=30, impressions=100),
+            '999': _metrics('999', opens=20, impressions=100),
+        }
+        self.metrics = with_posteriors(self.metrics)
+
+    def test_pool_key_without_pool(self):
+        pool = ThompsonSamplingPool(size=0)
+        with patch.object(app.rankers.algorithms, 'thompson_sampling_pool', pool):
+            assert len(thompson_sampling(self.recs, self.metrics, pool_key='slate')) == 3
+
+    def test_pooled_rankings_match_live_rankings(self):
+        n = 2000
+        pool = ThompsonSamplingPool(size=n)
+        rng = np.random.default_rng(42)
+        with patch.object(app.rankers.algorithms, 'thompson_sampling_pool', pool):
+            live = [thompson_sampling(self.recs, self.metrics, limit=1, rng=rng)[0].item_id for _ in range(n)]
+            pooled = [thompson_sampling(self.recs, self.metrics, limit=1, pool_key='slate', rng=rng)[0].item_id
+                      for _ in range(n)]
+
+        # Both rank the item with the highest CTR first most of the time, with the same frequency.
+        for item_id in ['333', '666', '999']:
+            assert abs(live.count(item_id) - pooled.count(item_id)) / n < 0.05
+        assert pooled.count('666') > pooled.count('999') > pooled.count('333')
+
+    def test_resamples_when_items_change(self):
+        pool = ThompsonSamplingPool(size=10)
+        with patch.object(app.rankers.algorithms, 'thompson_sampling_pool', pool):
+            thompson_sampling(self.recs, self.metrics, pool_key='slate')
+            ranked = thompson_sampling(self.recs[:2], self.metrics, pool_key='slate')
+
+        assert sorted(rec.item_id for rec in ranked) == ['333', '666']
+
+    def test_resamples_when_metrics_change(self):
+        pool = ThompsonSamplingPool(size=100)
+        refreshed_metrics = with_posteriors({**self.metrics, '333': _metrics('333', opens=90, impressions=100)})
+        with patch.object(app.rankers.algorithms, 'thompson_sampling_pool', pool):
+            before = [thompson_sampling(self.recs, self.metrics, limit=1, pool_key='slate')[0].item_id
+                      for _ in range(100)]
+            after = [thompson_sampling(self.recs, refreshed_metrics, limit=1, pool_key='slate')[0].item_id
+                     for _ in range(100)]
+
+        assert before.count('333') < 10
+        assert after.count('333') > 90
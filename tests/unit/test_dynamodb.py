@@ -0,0 +1,71 @@
+import unittest
+from contextlib import asynccontextmanager
+from unittest.mock import patch
+
+import aioboto3
+
+from app.dynamodb import DynamoDBResourcePool
+
+
+class FakeResourceFactory:
+    """Replaces aioboto3.resource, and counts how many resources are created and closed."""
+
+    def __init__(self):
+        self.created = 0
+        self.closed = 0
+        self.configs = []
+
+    @asynccontextmanager
+    async def __call__(self, service_name, endpoint_url=None, config=None):
+        self.created += 1
+        self.configs.append(config)
+        try:
+            yield object()
+        finally:
+            self.closed += 1
+
+
+class TestDynamoDBResourcePool(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.factory = FakeResourceFactory()
+        patcher = patch.object(aioboto3, 'resource', self.factory, create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_reuses_resource_while_open(self):
+        pool = DynamoDBResourcePool(max_pool_connections=20, keepalive_timeout=30)
+        await pool.open()
+
+        async with pool.resource() as first:
+            pass
+        async with pool.resource() as second:
+            pass
+
+        assert first is second
+        assert self.factory.created == 1
+        assert self.factory.configs[0].max_pool_connections == 20
+        assert self.factory.configs[0].connector_args == {'keepalive_timeout': 30}
+
+        await pool.close()
+        assert self.factory.closed == 1
+        assert not pool.is_open
+
+    async def test_creates_resource_per_call_when_not_open(self):
+        pool = DynamoDBResourcePool()
+
+        async with pool.resource() as first:
+            pass
+        async with pool.resource() as second:
+            pass
+
+        assert first is not second
+        assert self.factory.created == self.factory.closed == 2
+
+    async def test_open_is_idempotent(self):
+        pool = DynamoDBResourcePool()
+        await pool.open()
+        await pool.open()
+        await pool.close()
+        await pool.close()
+
+        assert self.factory.created == self.factory.closed == 1
@@ -0,0 +1,172 @@
+import asyncio
+import unittest
+from collections import Counter
+
+from app.memcached import HashRing, ShardedMemcachedClient, ShardedMemcachedCache
+
+
+class FakeClient:
+    """Replaces aiomcache.Client for a single server, and records the commands it receives."""
+
+    def __init__(self, host, port, pool_size=2):
+        self.server = f'{host}:{port}'
+        self.data = {}
+        self.commands = []
+        self.down = False
+        # Accepts commands, but never responds to them.
+        self.hanging = False
+
+    async def _check(self, *command):
+        self.commands.append(command)
+        if self.down:
+            raise ConnectionRefusedError(self.server)
+        if self.hanging:
+            await asyncio.Event().wait()
+
+    async def get(self, key, default=None):
+        await self._check('get', key)
+        return self.data.get(key, default)
+
+    async def multi_get(self, *keys):
+        await self._check('multi_get', *keys)
+        return tuple(self.data.get(key) for key in keys)
+
+    async def set(self, key, value, exptime=0):
+        await self._check('set', key)
+        self.data[key] = value
+        return True
+
+    async def close(self):
+        await self._check('close')
+
+
+SERVERS = [('10.0.0.1', '11211'), ('10.0.0.2', '11211'), ('10.0.0.3', '11211')]
+
+
+class TestHashRing(unittest.TestCase):
+    def test_spreads_keys_over_nodes(self):
+        ring = HashRing(['a', 'b', 'c'])
+        counts = Counter(ring.get_node(f'key-{i}'.encode()) for i in range(3000))
+
+        assert set(counts) == {'a', 'b', 'c'}
+        assert all(700 < count < 1300 for count in counts.values())
+
+    def test_removing_node_only_moves_its_keys(self):
+        keys = [f'key-{i}'.encode() for i in range(1000)]
+        before = {key: HashRing(['a', 'b', 'c']).get_node(key) for key in keys}
+        after = {key: HashRing(['a', 'b']).get_node(key) for key in keys}
+
+        assert all(after[key] == node for key, node in before.items() if node != 'c')
+
+    def test_iter_nodes_yields_every_node_once(self):
+        ring = HashRing(['a', 'b', 'c'])
+        nodes = list(ring.iter_nodes(b'key'))
+
+        assert sorted(nodes) == ['a', 'b', 'c']
+        assert nodes[0] == ring.get_node(b'key')
+
+
+class TestShardedMemcachedClient(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.now = 0
+        self.servers = {}
+
+        def client_factory(host, port, pool_size):
+            client = FakeClient(host, port, pool_size)
+            self.servers[client.server] = client
+            return client
+
+        self.client = ShardedMemcachedClient(
+            SERVERS, retry_interval=30, server_timeout=0.01, clock=lambda: self.now, client_factory=client_factory)
+
+    async def test_routes_keys_to_servers(self):
+        keys = [f'key-{i}'.encode() for i in range(100)]
+        for key in keys:
+            await self.client.set(key, key)
+
+        for key in keys:
+            assert self.servers[self.client.get_server(key)].data[key] == key
+            assert await self.client.get(key) == key
+        assert all(server.data for server in self.servers.values())
+
+    async def test_multi_get_sends_one_request_per_server(self):
+        keys = [f'key-{i}'.encode() for i in range(100)]
+        for key in keys[::2]:
+            await self.client.set(key, key)
+
+        values = await self.client.multi_get(*keys)
+
+        assert values == tuple(key if i % 2 == 0 else None for i, key in enumerate(keys))
+        for server in self.servers.values():
+            assert [command[0] for command in server.commands].count('multi_get') == 1
+
+    async def test_fails_over_to_next_server(self):
+        key = b'key'
+        primary = self.client.get_server(key)
+        self.servers[primary].down = True
+
+        assert await self.client.set(key, b'value')
+        assert self.client.get_server(key) != primary
+        assert await self.client.get(key) == b'value'
+        assert await self.client.multi_get(key, b'other') == (b'value', None)
+        # The server that is down isn't tried again until the retry interval has passed.
+        assert len(self.servers[primary].commands) == 1
+
+    async def test_multi_get_fails_over_keys_of_server(self):
+        keys = [f'key-{i}'.encode() for i in range(30)]
+        for key in keys:
+            await self.client.set(key, key)
+        primary = self.client.get_server(keys[0])
+        self.servers[primary].down = True
+
+        values = await self.client.multi_get(*keys)
+
+        # Keys on the other servers are still found, and keys on the failed server are misses.
+        assert values == tuple(None if self.client._ring.get_node(key) == primary else key for key in keys)
+
+    async def test_fails_over_server_that_does_not_respond(self):
+        keys = [f'key-{i}'.encode() for i in range(30)]
+        for key in keys:
+            await self.client.set(key, key)
+        primary = self.client.get_server(keys[0])
+        self.servers[primary].hanging = True
+
+        values = await asyncio.wait_for(self.client.multi_get(*keys), timeout=1)
+
+        assert values == tuple(None if self.client._ring.get_node(key) == primary else key for key in keys)
+        assert self.client.get_server(keys[0]) != primary
+        assert await asyncio.wait_for(self.client.set(keys[0], b'value'), timeout=1)
+        assert await self.client.get(keys[0]) == b'value'
+
+    async def test_retries_server_after_interval(self):
+        key = b'key'
+        primary = self.client.get_server(key)
+        self.servers[primary].down = True
+        await self.client.get(key)
+
+        self.servers[primary].down = False
+        self.now = 29
+        assert self.client.get_server(key) != primary
+        self.now = 30
+        assert self.client.get_server(key) == primary
+
+    async def test_raises_when_all_servers_are_down(self):
+        for server in self.servers.values():
+            server.down = True
+
+        with self.assertRaises(ConnectionRefusedError):
+            await self.client.get(b'key')
+
+    async def test_close_closes_all_servers(self):
+        await self.client.close()
+
+        assert all(server.commands == [('close',)] for server in self.servers.values())
+
+
+class TestShardedMemcachedCache(unittest.IsolatedAsyncioTestCase):
+    async def test_uses_sharded_client(self):
+        cache = ShardedMemcachedCache(SERVERS, retry_interval=10, server_timeout=0.5)
+
+        assert isinstance(cache.client, ShardedMemcachedClient)
+        assert cache.client.retry_interval == 10
+        assert cache.client.server_timeout == 0.5
@@ -0,0 +1,61 @@
+import asyncio
+import unittest
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.recit import RecItClient
+
+
+class TestRecItClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.peers = []
+
+        async def profile(request):
+            self.peers.append(request.transport.get_extra_info('peername'))
+            return web.json_response({'user_id': request.query.get('user_id')})
+
+        async def slow(request):
+            await asyncio.sleep(1)
+            return web.json_response({})
+
+        app = web.Application()
+        app.router.add_get('/profile', profile)
+        app.router.add_get('/slow', slow)
+        self.server = TestServer(app)
+        await self.server.start_server()
+
+    async def asyncTearDown(self):
+        await self.server.close()
+
+    async def test_reuses_connection_while_open(self):
+        client = RecItClient()
+        await client.open()
+        try:
+            for user_id in ['1', '2']:
+                async with client.get(str(self.server.make_url('/profile')), params={'user_id': user_id}) as resp:
+                    assert (await resp.json()) == {'user_id': user_id}
+        finally:
+            await client.close()
+
+        # Both requests were sent over the same keep-alive connection.
+        assert len(self.peers) == 2 and self.peers[0] == self.peers[1]
+        assert not client.is_open
+
+    async def test_creates_session_per_call_when_not_open(self):
+        client = RecItClient()
+        for _ in range(2):
+            async with client.get(str(self.server.make_url('/profile'))) as resp:
+                assert resp.status == 200
+
+        assert len(self.peers) == 2 and self.peers[0] != self.peers[1]
+
+    async def test_timeout(self):
+        client = RecItClient(timeout=10)
+        await client.open()
+        try:
+            with self.assertRaises(asyncio.TimeoutError):
+                async with client.get(str(self.server.make_url('/slow')), timeout=0.05):
+                    pass
+        finally:
+            await client.close()
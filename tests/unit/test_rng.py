@@ -0,0 +1,93 @@
+import asyncio
+import contextvars
+import unittest
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from app.models.slate_experiment import SlateExperimentModel
+from app.rankers.algorithms import thompson_sampling
+from app.rng import REQUEST_ID_HEADER, SEED_HEADER, derive_rng, get_request_seed, get_rng, rng_middleware, seed_rng
+from tests.unit.utils import generate_recommendations
+
+
+def create_request(headers: dict) -> Request:
+    return Request({
+        'type': 'http',
+        'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers.items()],
+    })
+
+
+async def sample(request: Request) -> JSONResponse:
+    return JSONResponse({'sample': get_rng().random()})
+
+
+class TestRequestSeed(unittest.TestCase):
+    def test_seed_header(self):
+        assert get_request_seed({SEED_HEADER: '1234', REQUEST_ID_HEADER: 'abc'}) == 1234
+
+    def test_request_id(self):
+        seed = get_request_seed({REQUEST_ID_HEADER: 'abc'})
+        assert seed == get_request_seed({REQUEST_ID_HEADER: 'abc'})
+        assert seed != get_request_seed({REQUEST_ID_HEADER: 'abd'})
+
+    def test_invalid_seed_header(self):
+        seed = get_request_seed({SEED_HEADER: 'not a number', REQUEST_ID_HEADER: 'abc'})
+        assert seed == get_request_seed({REQUEST_ID_HEADER: 'abc'})
+
+    def test_negative_seed_header(self):
+        seed = get_request_seed({SEED_HEADER: '-1', REQUEST_ID_HEADER: 'abc'})
+        assert seed == get_request_seed({REQUEST_ID_HEADER: 'abc'})
+
+    def test_random_seed(self):
+        assert get_request_seed({}) != get_request_seed({})
+
+
+class TestSeededRng(unittest.TestCase):
+    def test_seed_is_scoped_to_context(self):
+        rng = contextvars.copy_context().run(seed_rng, 1)
+        assert get_rng() is not rng
+
+    def test_replays_experiment_choice_and_ranking(self):
+        experiments = [SlateExperimentModel(str(i), str(i), [], ['a'], 1.0) for i in range(10)]
+        recs = generate_recommendations([str(i) for i in range(100)])
+
+        def replay():
+            seed_rng(42)
+            experiment = SlateExperimentModel.choose_experiment(experiments)
+            return experiment.id, [rec.item_id for rec in thompson_sampling(recs, {})]
+
+        assert contextvars.copy_context().run(replay) == contextvars.copy_context().run(replay)
+
+
+class TestDeriveRng(unittest.IsolatedAsyncioTestCase):
+    async def test_replays_concurrent_tasks(self):
+        async def draw(key: str, delay: float) -> float:
+            derive_rng(key)
+            await asyncio.sleep(delay)
+            return get_rng().random()
+
+        async def replay(delays):
+            seed_rng(42)
+            return await asyncio.gather(draw('slate-a', delays[0]), draw('slate-b', delays[1]))
+
+        # Tasks draw the same numbers, regardless of the order in which they run.
+        samples = await asyncio.create_task(replay([0, 0.01]))
+        assert samples == await asyncio.create_task(replay([0.01, 0]))
+        assert samples[0] != samples[1]
+
+    def test_without_seed(self):
+        assert contextvars.Context().run(derive_rng, 'slate-a') is get_rng()
+
+
+class TestRngMiddleware(unittest.IsolatedAsyncioTestCase):
+    async def test_returns_seed(self):
+        response = await rng_middleware(create_request({REQUEST_ID_HEADER: 'abc'}), sample)
+        assert response.headers[SEED_HEADER] == str(get_request_seed({REQUEST_ID_HEADER: 'abc'}))
+
+    async def test_replays_request(self):
+        response = await rng_middleware(create_request({}), sample)
+        replayed = await rng_middleware(create_request({SEED_HEADER: response.headers[SEED_HEADER]}), sample)
+
+        assert replayed.headers[SEED_HEADER] == response.headers[SEED_HEADER]
+        assert replayed.body == response.body